@@ -0,0 +1,135 @@
+"""
+Dashboard payloads
+
+Each payload is built from one conditional-aggregate query per table and
+cached per user under the versions of the data it reads, so any committed
+write to those rows makes the next load rebuild it. Versions are read before
+the payload is built, so a payload is never cached under newer versions than
+the rows it was built from.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from inventory.models import BloodRequest, BloodType, StockSummary
+from inventory.services import roll_over_stock_summaries
+from notifications.counters import notification_counts
+from utils.constants import BLOOD_GROUPS, EXPIRY_WARNING_DAYS
+from utils.versioning import get_versions
+
+def dashboard_scopes(user):
+    """Version scopes covering everything on the user's dashboard"""
+    scopes = [f'notifications:{user.pk}', 'requests']
+    if user.user_type in ('BLOOD_BANK', 'HOSPITAL'):
+        scopes.append(f'inventory:{user.pk}')
+    elif user.user_type == 'DONOR':
+        scopes.append(f'donations:{user.pk}')
+    return scopes
+
+def _unread_notifications(user):
+    _, unread = notification_counts(user.pk)
+    return unread
+
+def _expiring_soon(user, today):
+    # Same window as ExpiryAlertView: usable stock that has not expired yet
+    return BloodType.objects.filter(
+        blood_bank=user,
+        status='AVAILABLE',
+        expiry_date__gte=today,
+        expiry_date__lte=today + timedelta(days=EXPIRY_WARNING_DAYS)
+    ).count()
+
+def _inventory_by_group(user):
+    # Every group's total from the per-bank stock summary in one pass
+    roll_over_stock_summaries()
+    totals = StockSummary.objects.filter(blood_bank=user).aggregate(
+        total=Sum('available_units'),
+        **{group: Sum('available_units', filter=Q(blood_group=group)) for group in BLOOD_GROUPS}
+    )
+    total = totals.pop('total') or 0
+    return total, {group: units or 0 for group, units in totals.items()}
+
+def _hospital_dashboard(user, today):
+    requests = BloodRequest.objects.filter(hospital=user).aggregate(
+        pending=Count('id', filter=Q(status='PENDING')),
+        fulfilled=Count('id', filter=Q(status='FULFILLED'))
+    )
+    
+    if user.has_blood_bank:
+        total_units, _ = _inventory_by_group(user)
+        expiring_soon = _expiring_soon(user, today)
+    else:
+        total_units = 0
+        expiring_soon = 0
+    
+    return {
+        'pending_requests': requests['pending'],
+        'fulfilled_requests': requests['fulfilled'],
+        'total_inventory_units': total_units,
+        'expiring_soon_count': expiring_soon,
+        'unread_notifications': _unread_notifications(user)
+    }
+
+def _blood_bank_dashboard(user, today):
+    total_units, inventory_by_group = _inventory_by_group(user)
+    
+    return {
+        'total_inventory_units': total_units,
+        'inventory_by_blood_group': inventory_by_group,
+        'pending_requests': BloodRequest.objects.filter(status='PENDING').count(),
+        'expiring_soon_count': _expiring_soon(user, today),
+        'unread_notifications': _unread_notifications(user)
+    }
+
+def _donor_dashboard(user, today):
+    donations = BloodType.objects.filter(donor=user).aggregate(
+        total=Count('id'),
+        last=Max('collection_date')
+    )
+    
+    upcoming_requests = BloodRequest.objects.filter(
+        blood_group=user.blood_group,
+        status='PENDING',
+        hospital__city=user.city
+    ).count()
+    
+    return {
+        'total_donations': donations['total'],
+        'last_donation_date': donations['last'],
+        'upcoming_requests': upcoming_requests,
+        'unread_notifications': _unread_notifications(user)
+    }
+
+DASHBOARD_BUILDERS = {
+    'HOSPITAL': _hospital_dashboard,
+    'BLOOD_BANK': _blood_bank_dashboard,
+    'DONOR': _donor_dashboard,
+}
+
+def build_dashboard(user, today=None):
+    """Dashboard payload for the user, straight from the database"""
+    builder = DASHBOARD_BUILDERS.get(user.user_type)
+    if builder is None:
+        return {}
+    return builder(user, today or timezone.localdate())
+
+def get_dashboard(user):
+    """Dashboard payload for the user, cached until its versions change"""
+    today = timezone.localdate()
+    raw = repr((
+        user.pk,
+        user.updated_at.isoformat() if getattr(user, 'updated_at', None) else None,
+        get_versions(*dashboard_scopes(user)),
+        # Expiring-soon counts change with the date
+        today.isoformat()
+    ))
+    key = f'dashboard:{user.pk}:{hashlib.md5(raw.encode()).hexdigest()}'
+    
+    data = cache.get(key)
+    if data is None:
+        data = build_dashboard(user, today)
+        cache.set(key, data, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300))
+    return data
\ No newline at end of file
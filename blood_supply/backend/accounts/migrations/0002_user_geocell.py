@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='geocell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=24, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='latitude_rad',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='longitude_rad',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['latitude_rad', 'longitude_rad'], name='accounts_us_latitud_2b7836_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Backfill User.geocell / latitude_rad / longitude_rad in bounded chunks
+
+from math import floor, radians
+
+from django.db import migrations, transaction
+
+CHUNK_SIZE = 1000
+# Frozen copy of utils.geo.GEOCELL_SIZE_DEGREES at the time of this migration
+GEOCELL_SIZE_DEGREES = 0.25
+
+
+def backfill_location_fields(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+
+    last_pk = 0
+    while True:
+        # Each chunk commits on its own so large user tables are never locked at once
+        with transaction.atomic():
+            users = list(
+                User.objects.filter(
+                    pk__gt=last_pk,
+                    latitude__isnull=False,
+                    longitude__isnull=False
+                ).order_by('pk').only('pk', 'latitude', 'longitude')[:CHUNK_SIZE]
+            )
+            if not users:
+                break
+
+            for user in users:
+                latitude, longitude = float(user.latitude), float(user.longitude)
+                user.geocell = f"{floor(latitude / GEOCELL_SIZE_DEGREES)}:{floor(longitude / GEOCELL_SIZE_DEGREES)}"
+                user.latitude_rad = radians(latitude)
+                user.longitude_rad = radians(longitude)
+
+            User.objects.bulk_update(users, ['geocell', 'latitude_rad', 'longitude_rad'])
+
+        last_pk = users[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0002_user_geocell'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_location_fields, migrations.RunPython.noop),
+    ]
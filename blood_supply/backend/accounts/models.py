@@ -1,8 +1,14 @@
 
 
 # Create your models here.
+from math import radians
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
+from utils.geo import geocell, geocells_around, bounding_box
+
+# Above this many cells the IN list stops paying off and the bounding box is used alone
+MAX_GEOCELLS = 400
 
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -34,6 +40,11 @@ class User(AbstractUser):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     
+    # Derived from latitude/longitude on save, used to prefilter geo queries in SQL
+    geocell = models.CharField(max_length=24, null=True, blank=True, db_index=True, editable=False)
+    latitude_rad = models.FloatField(null=True, blank=True, editable=False)
+    longitude_rad = models.FloatField(null=True, blank=True, editable=False)
+    
     # Hospital specific fields
     hospital_name = models.CharField(max_length=255, blank=True, null=True)
     license_number = models.CharField(max_length=100, blank=True, null=True)
@@ -55,8 +66,51 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['latitude_rad', 'longitude_rad']),
+        ]
+    
     def __str__(self):
         return f"{self.username} - {self.get_user_type_display()}"
+    
+    def save(self, *args, **kwargs):
+        self.update_location_fields()
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geocell', 'latitude_rad', 'longitude_rad'}
+        
+        super().save(*args, **kwargs)
+    
+    def update_location_fields(self):
+        """Recompute geocell and radian coordinates from latitude/longitude"""
+        if self.latitude is None or self.longitude is None:
+            self.geocell = self.latitude_rad = self.longitude_rad = None
+        else:
+            self.geocell = geocell(self.latitude, self.longitude)
+            self.latitude_rad = radians(float(self.latitude))
+            self.longitude_rad = radians(float(self.longitude))
+
+def location_filter(latitude, longitude, radius_km, prefix=''):
+    """
+    Q object limiting users to the neighbourhood of a point.
+
+    Combines the indexed geocell column with a bounding box on the radian
+    columns; use prefix (e.g. 'blood_bank__') to filter through a relation.
+    Python-side scoring still has to apply the exact distance.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    query = Q(**{
+        f'{prefix}latitude_rad__range': (radians(min_lat), radians(max_lat)),
+        f'{prefix}longitude_rad__range': (radians(min_lon), radians(max_lon)),
+    })
+    
+    cells = geocells_around(latitude, longitude, radius_km)
+    if len(cells) <= MAX_GEOCELLS:
+        query &= Q(**{f'{prefix}geocell__in': cells})
+    
+    return query
 
 class DonorHealthInfo(models.Model):
     donor = models.OneToOneField(User, on_delete=models.CASCADE, related_name='health_info')
@@ -108,6 +108,46 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
 
+class UserReferenceSerializer(serializers.ModelSerializer):
+    """Compact user shown where another object refers to it"""
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'user_type', 'hospital_name', 'blood_bank_name', 'city']
+        read_only_fields = fields
+
+def requested_expansions(context):
+    """Field names listed in ?expand=a,b (or 'all') of the request in a serializer context"""
+    request = context.get('request')
+    if request is None:
+        return set()
+    value = getattr(request, 'query_params', request.GET).get('expand', '')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+class UserReferenceField(serializers.Field):
+    """
+    Read-only related user, compact unless expanded with ?expand=<field>.
+    
+    Representations are memoized in the serializer context, so a list that
+    refers to the same bank 500 times serializes it once.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def expanded(self):
+        expansions = requested_expansions(self.context)
+        return bool(expansions & {'all', self.field_name, self.source})
+    
+    def to_representation(self, user):
+        expanded = self.expanded()
+        memo = self.context.setdefault('_user_representations', {})
+        key = (user.pk, expanded)
+        
+        if key not in memo:
+            serializer_class = UserProfileSerializer if expanded else UserReferenceSerializer
+            memo[key] = serializer_class(user).data
+        return memo[key]
+
 class DonorHealthInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = DonorHealthInfo
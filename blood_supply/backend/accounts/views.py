@@ -1,6 +1,8 @@
 from django.shortcuts import render
 from django.db import IntegrityError
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from datetime import timedelta
 from django.db import models
 
@@ -16,9 +18,9 @@ from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer,
     UserProfileSerializer, DonorHealthInfoSerializer
 )
+from .dashboard import dashboard_scopes, get_dashboard
 from .models import DonorHealthInfo
-from inventory.models import BloodRequest, BloodType
-from notifications.models import Notification
+from utils.versioning import scoped_etag
 
 User = get_user_model()
 
@@ -87,91 +89,17 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
+def dashboard_etag(request, *args, **kwargs):
+    # Expiring-soon counts change with the date
+    return scoped_etag(request, dashboard_scopes(request.user), timezone.localdate().isoformat())
+
 class DashboardView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @method_decorator(condition(etag_func=dashboard_etag))
     def get(self, request):
-        user = request.user
-        data = {}
-        
-        if user.user_type == 'HOSPITAL':
-            # Hospital dashboard data
-            pending_requests = BloodRequest.objects.filter(
-                hospital=user,
-                status='PENDING'
-            ).count()
-            
-            fulfilled_requests = BloodRequest.objects.filter(
-                hospital=user,
-                status='FULFILLED'
-            ).count()
-            
-            if user.has_blood_bank:
-                inventory = BloodType.objects.filter(blood_bank=user)
-                total_units = inventory.aggregate(models.Sum('quantity'))['quantity__sum'] or 0
-                expiring_soon = inventory.filter(expiry_date__lte=timezone.now() + timedelta(days=7)).count()
-            else:
-                total_units = 0
-                expiring_soon = 0
-            
-            data = {
-                'pending_requests': pending_requests,
-                'fulfilled_requests': fulfilled_requests,
-                'total_inventory_units': total_units,
-                'expiring_soon_count': expiring_soon,
-                'unread_notifications': Notification.objects.filter(user=user, is_read=False).count()
-            }
-            
-        elif user.user_type == 'BLOOD_BANK':
-            # Blood bank dashboard data
-            inventory = BloodType.objects.filter(blood_bank=user)
-            total_units = inventory.aggregate(models.Sum('quantity'))['quantity__sum'] or 0
-            
-            blood_groups = ['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']
-            inventory_by_group = {}
-            
-            for bg in blood_groups:
-                units = inventory.filter(blood_group=bg).aggregate(
-                    models.Sum('quantity')
-                )['quantity__sum'] or 0
-                inventory_by_group[bg] = units
-            
-            pending_requests = BloodRequest.objects.filter(
-                status='PENDING'
-            ).count()
-            
-            expiring_soon = inventory.filter(
-                expiry_date__lte=timezone.now() + timedelta(days=7)
-            ).count()
-            
-            data = {
-                'total_inventory_units': total_units,
-                'inventory_by_blood_group': inventory_by_group,
-                'pending_requests': pending_requests,
-                'expiring_soon_count': expiring_soon,
-                'unread_notifications': Notification.objects.filter(user=user, is_read=False).count()
-            }
-            
-        elif user.user_type == 'DONOR':
-            # Donor dashboard data
-            donations = BloodType.objects.filter(donor=user)
-            total_donations = donations.count()
-            last_donation = donations.order_by('-collection_date').first()
-            
-            upcoming_requests = BloodRequest.objects.filter(
-                blood_group=user.blood_group,
-                status='PENDING',
-                hospital__city=user.city
-            ).count()
-            
-            data = {
-                'total_donations': total_donations,
-                'last_donation_date': last_donation.collection_date if last_donation else None,
-                'upcoming_requests': upcoming_requests,
-                'unread_notifications': Notification.objects.filter(user=user, is_read=False).count()
-            }
-        
-        return Response(data)
+        # One aggregate query per table, cached until the user's data changes
+        return Response(get_dashboard(request.user))
 
 class DonorHealthInfoView(generics.RetrieveUpdateAPIView):
     serializer_class = DonorHealthInfoSerializer
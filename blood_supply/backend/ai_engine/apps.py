@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class AiEngineConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'ai_engine'
\ No newline at end of file
+    name = 'ai_engine'
+    
+    def ready(self):
+        import ai_engine.signals
\ No newline at end of file
@@ -2,10 +2,18 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from django.db import models
-from accounts.models import User
-from inventory.models import BloodType, BloodRequest
-from sklearn.neighbors import NearestNeighbors
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+from accounts.models import User, location_filter
+from inventory.models import BloodType, BloodRequest, StockSummary
+from inventory.services import roll_over_stock_summaries
 from sklearn.preprocessing import StandardScaler
+from utils.constants import (
+    DONOR_SEARCH_RADIUS_KM, EXPIRY_RISK_ACTIONS, EXPIRY_RISK_DEFAULT, EXPIRY_RISK_LEVELS
+)
+from utils.geo import EARTH_RADIUS_KM, haversine_radians
+from utils.helpers import compatible_blood_groups
+from .spatial_index import get_blood_bank_index
 
 class AIPredictiveModel(models.Model):
     MODEL_TYPES = (
@@ -70,103 +78,181 @@ class BloodSupplyChainAI:
             print(f"Error in demand prediction: {e}")
             return self._get_default_prediction()
     
-    def find_nearest_blood_banks(self, request_location, blood_group, component_type, quantity=1):
-        """Find nearest blood banks with required blood type"""
+    def find_nearest_blood_banks(self, request_location, blood_group, component_type, quantity=1, limit=5,
+                                 radius_km=None, compatible=True):
+        """Find nearest blood banks with required (or ABO/Rh compatible) blood type"""
         try:
-            # Get all blood banks with required blood type in stock
-            available_blood = BloodType.objects.filter(
-                blood_group=blood_group,
-                component_type=component_type,
-                quantity__gte=quantity,
-                status='AVAILABLE',
-                expiry_date__gt=datetime.now().date()
-            ).select_related('blood_bank')
-            
-            if not available_blood.exists():
-                return []
-            
-            # Prepare location data
-            locations = []
-            blood_data = []
-            
-            for blood in available_blood:
-                if blood.blood_bank.latitude and blood.blood_bank.longitude:
-                    locations.append([
-                        float(blood.blood_bank.latitude),
-                        float(blood.blood_bank.longitude)
-                    ])
-                    blood_data.append({
-                        'blood_id': blood.id,
-                        'blood_bank_id': blood.blood_bank.id,
-                        'blood_bank_name': blood.blood_bank.blood_bank_name or blood.blood_bank.username,
-                        'quantity': blood.quantity,
-                        'expiry_days': blood.days_until_expiry,
-                        'address': blood.blood_bank.address,
-                        'city': blood.blood_bank.city,
-                        'distance': self._calculate_distance(
-                            request_location,
-                            (blood.blood_bank.latitude, blood.blood_bank.longitude)
-                        )
-                    })
-            
-            if not locations:
-                return []
-            
-            # Find nearest neighbors
-            locations_array = np.array(locations)
-            request_location_array = np.array([[
-                float(request_location['latitude']),
-                float(request_location['longitude'])
-            ]])
+            summaries = StockSummary.objects.all()
+            if radius_km is not None:
+                # Only banks in the neighbouring geocells can be within the radius
+                summaries = summaries.filter(location_filter(
+                    request_location['latitude'],
+                    request_location['longitude'],
+                    radius_km,
+                    prefix='blood_bank__'
+                ))
             
-            # Use KNN to find nearest
-            n_neighbors = min(5, len(locations_array))
-            knn = NearestNeighbors(n_neighbors=n_neighbors, metric='haversine')
-            knn.fit(locations_array)
+            stock = self._load_stock(summaries, [(blood_group, component_type)], compatible)
+            return self._rank_blood_banks(
+                stock, request_location, blood_group, component_type,
+                quantity, limit, radius_km, compatible, banks={}
+            )
             
-            distances, indices = knn.kneighbors(request_location_array)
+        except Exception as e:
+            print(f"Error finding nearest blood banks: {e}")
+            return []
+    
+    def find_nearest_blood_banks_batch(self, items, limit=5, compatible=True, fail_silently=True):
+        """
+        Run many blood bank searches against one shared candidate set.
+        
+        Each item is a dict with request_location, blood_group, component_type
+        and optional quantity/radius_km. Stock for every item is loaded in one
+        query, all items share the process-level spatial index and bank
+        details are fetched once per distinct bank. Returns one suggestion
+        list per item, in order; errors give empty lists unless fail_silently
+        is False.
+        """
+        try:
+            stock = self._load_stock(
+                StockSummary.objects.all(),
+                [(item['blood_group'], item['component_type']) for item in items],
+                compatible
+            )
+            banks = {}
             
-            # Prepare results
-            results = []
-            for idx, distance in zip(indices[0], distances[0]):
-                blood_info = blood_data[idx]
-                blood_info['distance_km'] = round(distance * 111, 2)  # Convert to km
-                blood_info['priority_score'] = self._calculate_priority_score(
-                    blood_info['distance_km'],
-                    blood_info['expiry_days'],
-                    blood_info['quantity']
+            return [
+                self._rank_blood_banks(
+                    stock,
+                    item['request_location'],
+                    item['blood_group'],
+                    item['component_type'],
+                    item.get('quantity', 1),
+                    limit,
+                    item.get('radius_km'),
+                    compatible,
+                    banks=banks
                 )
-                results.append(blood_info)
-            
-            return sorted(results, key=lambda x: x['priority_score'], reverse=True)
+                for item in items
+            ]
             
         except Exception as e:
-            print(f"Error finding nearest blood banks: {e}")
+            if not fail_silently:
+                raise
+            print(f"Error in batch blood bank search: {e}")
+            return [[] for item in items]
+    
+    def _load_stock(self, summaries, searches, compatible):
+        """Load {(component_type, blood_group): {bank_id: summary}} for every usable group of the searches"""
+        roll_over_stock_summaries()
+        
+        wanted = {}
+        for blood_group, component_type in searches:
+            wanted.setdefault(component_type, set()).update(
+                compatible_blood_groups(blood_group, component_type, exact_only=not compatible)
+            )
+        
+        query = Q()
+        for component_type, blood_groups in wanted.items():
+            query |= Q(component_type=component_type, blood_group__in=blood_groups)
+        
+        stock = {}
+        for row in summaries.filter(query, available_units__gt=0).values(
+            'blood_bank_id', 'blood_group', 'component_type', 'available_units', 'earliest_expiry'
+        ):
+            stock.setdefault((row['component_type'], row['blood_group']), {})[row['blood_bank_id']] = row
+        return stock
+    
+    def _rank_blood_banks(self, stock, request_location, blood_group, component_type, quantity, limit,
+                          radius_km, compatible, banks):
+        """Rank banks holding enough usable stock for one search; banks caches bank details by id"""
+        blood_groups = compatible_blood_groups(blood_group, component_type, exact_only=not compatible)
+        
+        candidates = {}
+        for group in blood_groups:
+            for bank_id, row in stock.get((component_type, group), {}).items():
+                bank = candidates.setdefault(bank_id, {
+                    'available_units': 0,
+                    'exact_units': 0,
+                    'earliest_expiry': None,
+                    'blood_groups': [],
+                })
+                bank['available_units'] += row['available_units']
+                bank['blood_groups'].append(group)
+                if group == blood_group:
+                    bank['exact_units'] = row['available_units']
+                if row['earliest_expiry'] and (
+                    bank['earliest_expiry'] is None or row['earliest_expiry'] < bank['earliest_expiry']
+                ):
+                    bank['earliest_expiry'] = row['earliest_expiry']
+        
+        # One candidate per bank holding enough usable stock
+        candidates = {
+            bank_id: bank for bank_id, bank in candidates.items()
+            if bank['available_units'] >= quantity
+        }
+        
+        if not candidates:
+            return []
+        
+        # Query the process-level spatial index instead of fitting a KNN per call
+        nearest = get_blood_bank_index().query(
+            request_location['latitude'],
+            request_location['longitude'],
+            k=limit,
+            radius_km=radius_km,
+            candidates=candidates.keys()
+        )
+        
+        if not nearest:
             return []
+        
+        missing = [bank_id for bank_id, _ in nearest if bank_id not in banks]
+        if missing:
+            banks.update(User.objects.only(
+                'id', 'username', 'blood_bank_name', 'address', 'city'
+            ).in_bulk(missing))
+        today = datetime.now().date()
+        
+        # Prepare results
+        results = []
+        for bank_id, distance_km in nearest:
+            blood_bank = banks.get(bank_id)
+            if blood_bank is None:
+                continue
+            
+            summary = candidates[bank_id]
+            blood_info = {
+                'blood_bank_id': bank_id,
+                'blood_bank_name': blood_bank.blood_bank_name or blood_bank.username,
+                'quantity': summary['available_units'],
+                'expiry_days': (summary['earliest_expiry'] - today).days if summary['earliest_expiry'] else 0,
+                'address': blood_bank.address,
+                'city': blood_bank.city,
+                'distance_km': round(distance_km, 2),
+                'exact_units': summary['exact_units'],
+                'exact_match': summary['exact_units'] >= quantity,
+                'blood_groups': summary['blood_groups']
+            }
+            blood_info['priority_score'] = self._calculate_priority_score(
+                blood_info['distance_km'],
+                blood_info['expiry_days'],
+                blood_info['quantity']
+            )
+            results.append(blood_info)
+        
+        # Exact group matches rank ahead of compatible substitutes
+        return sorted(results, key=lambda x: (x['exact_match'], x['priority_score']), reverse=True)
     
     def predict_expiry_risk(self, blood_inventory):
         """Predict expiry risk for blood inventory"""
         try:
             expiry_days = blood_inventory.days_until_expiry
-            
-            if expiry_days <= 0:
-                risk = 'EXPIRED'
-                confidence = 1.0
-            elif expiry_days <= 3:
-                risk = 'CRITICAL'
-                confidence = 0.95
-            elif expiry_days <= 7:
-                risk = 'HIGH'
-                confidence = 0.85
-            elif expiry_days <= 14:
-                risk = 'MEDIUM'
-                confidence = 0.70
-            elif expiry_days <= 30:
-                risk = 'LOW'
-                confidence = 0.50
-            else:
-                risk = 'SAFE'
-                confidence = 0.30
+            risk, confidence = EXPIRY_RISK_DEFAULT
+            for max_days, level, level_confidence in EXPIRY_RISK_LEVELS:
+                if expiry_days <= max_days:
+                    risk, confidence = level, level_confidence
+                    break
             
             return {
                 'risk_level': risk,
@@ -179,36 +265,114 @@ class BloodSupplyChainAI:
             print(f"Error predicting expiry risk: {e}")
             return {'risk_level': 'UNKNOWN', 'confidence': 0.0}
     
-    def match_donors_for_request(self, blood_request):
-        """Find matching donors for a blood request"""
+    def annotate_expiry_risk(self, queryset, today=None):
+        """
+        Annotate risk_level, risk_confidence and risk_action in SQL.
+        
+        Same buckets as predict_expiry_risk, evaluated by the database as one
+        CASE over expiry_date instead of once per row in Python.
+        """
+        today = today or timezone.localdate()
+        
+        def bucket(values, default, output_field):
+            return Case(
+                *[
+                    When(expiry_date__lte=today + timedelta(days=max_days), then=Value(value))
+                    for (max_days, _, _), value in zip(EXPIRY_RISK_LEVELS, values)
+                ],
+                default=Value(default),
+                output_field=output_field
+            )
+        
+        levels = [level for _, level, _ in EXPIRY_RISK_LEVELS]
+        default_level, default_confidence = EXPIRY_RISK_DEFAULT
+        return queryset.annotate(
+            risk_level=bucket(levels, default_level, models.CharField()),
+            risk_confidence=bucket(
+                [confidence for _, _, confidence in EXPIRY_RISK_LEVELS],
+                default_confidence,
+                models.FloatField()
+            ),
+            risk_action=bucket(
+                [self._get_expiry_action(level) for level in levels],
+                self._get_expiry_action(default_level),
+                models.CharField()
+            )
+        )
+    
+    def predict_expiry_risk_batch(self, queryset, today=None):
+        """predict_expiry_risk for every row of a BloodType queryset, in one query"""
+        today = today or timezone.localdate()
+        rows = self.annotate_expiry_risk(queryset, today).values(
+            'id', 'blood_group', 'component_type', 'quantity', 'expiry_date',
+            'risk_level', 'risk_confidence', 'risk_action'
+        )
+        
+        predictions = []
+        for row in rows:
+            days = (row['expiry_date'] - today).days
+            predictions.append({
+                'blood_id': row['id'],
+                'blood_group': row['blood_group'],
+                'component_type': row['component_type'],
+                'quantity': row['quantity'],
+                'expiry_date': row['expiry_date'],
+                'days_until_expiry': days,
+                'risk_analysis': {
+                    'risk_level': row['risk_level'],
+                    'confidence': row['risk_confidence'],
+                    'days_until_expiry': days,
+                    'suggested_action': row['risk_action']
+                }
+            })
+        return predictions
+    
+    def match_donors_for_request(self, blood_request, compatible=True):
+        """Find matching (or ABO/Rh compatible) donors for a blood request"""
         try:
+            hospital = blood_request.hospital
+            hospital.update_location_fields()
+            blood_groups = compatible_blood_groups(
+                blood_request.blood_group, blood_request.component_type, exact_only=not compatible
+            )
+            
             donors = User.objects.filter(
                 user_type='DONOR',
-                blood_group=blood_request.blood_group,
+                blood_group__in=blood_groups,
                 is_available=True,
-                is_verified=True,
-                city=blood_request.hospital.city
+                is_verified=True
             )
+            if hospital.latitude_rad is not None:
+                # Prefilter to neighbouring geocells in SQL instead of scanning the whole city;
+                # donors without a location are still matched by city
+                donors = donors.filter(
+                    location_filter(hospital.latitude, hospital.longitude, DONOR_SEARCH_RADIUS_KM) |
+                    Q(city=hospital.city, latitude_rad__isnull=True)
+                )
+            else:
+                donors = donors.filter(city=hospital.city)
+            
+            today = datetime.now().date()
+            eligible_donors = [
+                donor for donor in donors
+                # Calculate eligibility based on last donation (8 weeks gap required)
+                if not donor.last_donation_date or (today - donor.last_donation_date).days >= 56
+            ]
+            
+            # Distances to every eligible donor in one vectorized pass (NaN when unknown)
+            if eligible_donors and hospital.latitude_rad is not None:
+                distances = EARTH_RADIUS_KM * haversine_radians(
+                    hospital.latitude_rad,
+                    hospital.longitude_rad,
+                    np.array([donor.latitude_rad for donor in eligible_donors], dtype=float),
+                    np.array([donor.longitude_rad for donor in eligible_donors], dtype=float)
+                )
+            else:
+                distances = np.full(len(eligible_donors), np.nan)
             
             matched_donors = []
-            for donor in donors:
-                # Calculate eligibility based on last donation
-                if donor.last_donation_date:
-                    days_since_last_donation = (datetime.now().date() - donor.last_donation_date).days
-                    if days_since_last_donation < 56:  # 8 weeks gap required
-                        continue
-                
-                # Calculate distance
-                if (donor.latitude and donor.longitude and 
-                    blood_request.hospital.latitude and blood_request.hospital.longitude):
-                    distance = self._calculate_distance(
-                        {'latitude': donor.latitude, 'longitude': donor.longitude},
-                        {'latitude': blood_request.hospital.latitude, 
-                         'longitude': blood_request.hospital.longitude}
-                    )
-                    distance_km = round(distance * 111, 2)
-                else:
-                    distance_km = None
+            for donor, distance in zip(eligible_donors, distances):
+                distance_km = None if np.isnan(distance) else round(float(distance), 2)
                 
                 donor_score = self._calculate_donor_score(donor, distance_km)
                 
@@ -218,32 +382,22 @@ class BloodSupplyChainAI:
                         'name': f"{donor.first_name} {donor.last_name}",
                         'phone': donor.phone,
                         'email': donor.email,
+                        'blood_group': donor.blood_group,
+                        'exact_match': donor.blood_group == blood_request.blood_group,
                         'distance_km': distance_km,
                         'last_donation': donor.last_donation_date,
                         'availability_score': donor_score
                     })
             
-            return sorted(matched_donors, key=lambda x: x['availability_score'], reverse=True)[:10]
+            # Exact group matches rank ahead of compatible donors
+            return sorted(
+                matched_donors, key=lambda x: (x['exact_match'], x['availability_score']), reverse=True
+            )[:10]
             
         except Exception as e:
             print(f"Error matching donors: {e}")
             return []
     
-    def _calculate_distance(self, loc1, loc2):
-        """Calculate haversine distance between two points"""
-        from math import radians, sin, cos, sqrt, atan2
-        
-        lat1, lon1 = radians(float(loc1['latitude'])), radians(float(loc1['longitude']))
-        lat2, lon2 = radians(float(loc2[0])), radians(float(loc2[1]))
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        
-        return c
-    
     def _calculate_priority_score(self, distance_km, expiry_days, quantity):
         """Calculate priority score for blood availability"""
         distance_score = max(0, 1 - (distance_km / 100))  # 100km max distance
@@ -278,15 +432,7 @@ class BloodSupplyChainAI:
         return min(1.0, score)
     
     def _get_expiry_action(self, risk_level):
-        actions = {
-            'EXPIRED': 'Immediate disposal required',
-            'CRITICAL': 'Use immediately or transfer to nearby facilities',
-            'HIGH': 'Prioritize usage in next 3 days',
-            'MEDIUM': 'Schedule for upcoming requests',
-            'LOW': 'Monitor regularly',
-            'SAFE': 'Standard inventory'
-        }
-        return actions.get(risk_level, 'Monitor inventory')
+        return EXPIRY_RISK_ACTIONS.get(risk_level, 'Monitor inventory')
     
     def _get_default_prediction(self):
         return {
@@ -0,0 +1,246 @@
+"""
+Cache over BloodSupplyChainAI.find_nearest_blood_banks
+
+Searches are keyed by blood group, component, a power-of-two quantity bucket
+and a fixed-size location cell; the search runs from the cell centre so that
+nearby requesters share one entry. Entries keep the bank coordinates, and
+distances, radius and ranking are recomputed for the actual requester
+before an entry is served. Every (component_type, blood_group) pair
+has a generation counter that is part of the key of every search able to
+use that stock, so bumping it invalidates exactly those entries. Counters
+live in the default cache, so invalidation only reaches other processes
+through a shared backend.
+"""
+import hashlib
+import time
+from math import floor, sqrt
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from utils.geo import EARTH_RADIUS_KM, KM_PER_DEGREE_LATITUDE, haversine_radians, to_radians
+from inventory.services import roll_over_stock_summaries
+from utils.helpers import compatible_blood_groups
+from .models import BloodSupplyChainAI
+from .spatial_index import get_blood_bank_index
+
+HITS_KEY = 'search-cache:hits'
+MISSES_KEY = 'search-cache:misses'
+
+def _timeout():
+    return getattr(settings, 'SEARCH_CACHE_TIMEOUT', 300)
+
+def quantity_bucket(quantity):
+    """Largest power of two not above quantity"""
+    return 1 << (max(int(quantity), 1).bit_length() - 1)
+
+def _cell_size():
+    return getattr(settings, 'SEARCH_CACHE_CELL_DEGREES', 0.01)
+
+def location_cell(location):
+    """Return ((row, col), centre) of the cache cell holding a location"""
+    size = _cell_size()
+    row = floor(float(location['latitude']) / size)
+    col = floor(float(location['longitude']) / size)
+    return (row, col), {'latitude': (row + 0.5) * size, 'longitude': (col + 0.5) * size}
+
+def _generation_key(component_type, blood_group):
+    return f'search-cache:gen:{component_type}:{blood_group}'
+
+def _generations(keys):
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # Seed from the clock so an evicted counter never reuses an old generation
+            cache.add(key, time.time_ns(), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+def _invalidate_now(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+def invalidate(*pairs):
+    """
+    Drop every cached search that can use stock of the (component_type, blood_group) pairs.
+    
+    Runs once the current transaction commits, so a search racing the write
+    cannot cache the old stock under the new generation.
+    """
+    keys = {_generation_key(component_type, blood_group) for component_type, blood_group in pairs}
+    transaction.on_commit(lambda: _invalidate_now(keys))
+
+def _count(key, amount):
+    if not amount:
+        return
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+
+def stats():
+    """Hit/miss counters since the cache was last cleared"""
+    values = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0
+    }
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+def _entry(item, limit, compatible):
+    """Return (cache_key, cell search item) for one search"""
+    blood_group = item['blood_group']
+    component_type = item['component_type']
+    groups = sorted(compatible_blood_groups(blood_group, component_type, exact_only=not compatible))
+    generations = _generations([_generation_key(component_type, group) for group in groups])
+    cell, centre = location_cell(item['request_location'])
+    bucket = quantity_bucket(item.get('quantity', 1))
+    radius_km = item.get('radius_km')
+    
+    raw = repr((
+        blood_group, component_type, bucket, cell, radius_km, limit, compatible,
+        tuple(zip(groups, generations))
+    ))
+    key = 'search-cache:cell:' + hashlib.md5(raw.encode()).hexdigest()
+    if radius_km is not None:
+        # Widen by the half-diagonal of the cell so that no bank within the radius
+        # of a requester anywhere in the cell is missed; _serve applies the exact radius
+        radius_km = radius_km + _cell_size() * KM_PER_DEGREE_LATITUDE * sqrt(2) / 2
+    return key, {
+        'request_location': centre,
+        'blood_group': blood_group,
+        'component_type': component_type,
+        'quantity': bucket,
+        'radius_km': radius_km
+    }
+
+def _cell_entry(results):
+    """Cache value for a cell search: the results plus the coordinates of their banks"""
+    return {
+        'results': results,
+        'locations': get_blood_bank_index().locations([result['blood_bank_id'] for result in results])
+    }
+
+def _serve(entry, item, limit, ai_engine):
+    """
+    Narrow a cell-level entry to one search.
+    
+    Distances and priority scores are recomputed from the requester location,
+    then the exact radius and quantity are applied. Returns None when the
+    filtered list may be missing banks, i.e. the cached list was cut at limit
+    and some of its banks were dropped.
+    """
+    results = entry['results']
+    quantity = item.get('quantity', 1)
+    radius_km = item.get('radius_km')
+    located = [result for result in results if result['blood_bank_id'] in entry['locations']]
+    
+    if located:
+        coords = np.array([entry['locations'][result['blood_bank_id']] for result in located])
+        latitude, longitude = to_radians([item['request_location']['latitude'], item['request_location']['longitude']])
+        distances = EARTH_RADIUS_KM * haversine_radians(latitude, longitude, coords[:, 0], coords[:, 1])
+    else:
+        distances = []
+    
+    served = []
+    for result, distance_km in zip(located, distances):
+        if result['quantity'] < quantity or (radius_km is not None and distance_km > radius_km):
+            continue
+        
+        result = dict(result)
+        result['distance_km'] = round(float(distance_km), 2)
+        result['exact_match'] = result['exact_units'] >= quantity
+        result['priority_score'] = ai_engine._calculate_priority_score(
+            result['distance_km'],
+            result['expiry_days'],
+            result['quantity']
+        )
+        served.append(result)
+    
+    if len(served) < len(results) and len(results) >= limit:
+        return None
+    
+    return sorted(served, key=lambda x: (x['exact_match'], x['priority_score']), reverse=True)
+
+def search_blood_banks(request_location, blood_group, component_type, quantity=1, limit=5,
+                       radius_km=None, compatible=True, fail_silently=True):
+    """Cached find_nearest_blood_banks"""
+    return search_blood_banks_batch([{
+        'request_location': request_location,
+        'blood_group': blood_group,
+        'component_type': component_type,
+        'quantity': quantity,
+        'radius_km': radius_km
+    }], limit=limit, compatible=compatible, fail_silently=fail_silently)[0]
+
+def search_blood_banks_batch(items, limit=5, compatible=True, fail_silently=True):
+    """
+    Cached find_nearest_blood_banks_batch; misses are resolved in one batch.
+    
+    Errors give empty lists, which are never cached, unless fail_silently is False.
+    """
+    try:
+        return _search_batch(items, limit, compatible)
+    except Exception as e:
+        if not fail_silently:
+            raise
+        print(f"Error in cached blood bank search: {e}")
+        return [[] for item in items]
+
+def _search_batch(items, limit, compatible):
+    # Expiring stock invalidates its entries through the refreshed summaries
+    roll_over_stock_summaries()
+    entries = [_entry(item, limit, compatible) for item in items]
+    cached = cache.get_many({key for key, _ in entries})
+    
+    ai_engine = BloodSupplyChainAI()
+    results = [None] * len(items)
+    misses = {}
+    uncacheable = []
+    for index, (item, (key, cell_item)) in enumerate(zip(items, entries)):
+        if key in cached:
+            results[index] = _serve(cached[key], item, limit, ai_engine)
+            if results[index] is None:
+                uncacheable.append(index)
+        else:
+            misses.setdefault(key, (cell_item, []))[1].append(index)
+    
+    _count(HITS_KEY, len(items) - len(uncacheable) - sum(len(indexes) for _, indexes in misses.values()))
+    _count(MISSES_KEY, len(uncacheable) + sum(len(indexes) for _, indexes in misses.values()))
+    
+    if misses:
+        keys = list(misses)
+        computed = [
+            _cell_entry(cell_results)
+            for cell_results in ai_engine.find_nearest_blood_banks_batch(
+                [misses[key][0] for key in keys], limit=limit, compatible=compatible, fail_silently=False
+            )
+        ]
+        cache.set_many(dict(zip(keys, computed)), timeout=_timeout())
+        
+        for key, entry in zip(keys, computed):
+            for index in misses[key][1]:
+                results[index] = _serve(entry, items[index], limit, ai_engine)
+                if results[index] is None:
+                    uncacheable.append(index)
+    
+    if uncacheable:
+        # The cell list was truncated and dropped banks for this search, search exactly
+        exact = ai_engine.find_nearest_blood_banks_batch(
+            [items[index] for index in uncacheable], limit=limit, compatible=compatible, fail_silently=False
+        )
+        for index, exact_results in zip(uncacheable, exact):
+            results[index] = exact_results
+    
+    return results
\ No newline at end of file
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from inventory.models import BloodType
+from inventory.serializers import BatchSearchItemSerializer
 from .models import AIPredictiveModel
 
 class AIPredictiveModelSerializer(serializers.ModelSerializer):
@@ -14,4 +16,18 @@ class DemandPredictionSerializer(serializers.Serializer):
     days_ahead = serializers.IntegerField(default=7, min_value=1, max_value=30)
 
 class ExpiryPredictionSerializer(serializers.Serializer):
-    blood_inventory_id = serializers.IntegerField()
\ No newline at end of file
+    blood_inventory_id = serializers.IntegerField(required=False)
+    blood_inventory_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False, max_length=500
+    )
+    
+    def validate(self, attrs):
+        if 'blood_inventory_id' not in attrs and 'blood_inventory_ids' not in attrs:
+            raise serializers.ValidationError('Provide blood_inventory_id or blood_inventory_ids.')
+        return attrs
+
+class NearestBloodBanksSerializer(BatchSearchItemSerializer):
+    component_type = serializers.ChoiceField(choices=BloodType.BLOOD_COMPONENT_CHOICES, default='WHOLE_BLOOD')
+    location = serializers.JSONField()
+    limit = serializers.IntegerField(default=5, min_value=1, max_value=50)
+    compatible = serializers.BooleanField(default=True)
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""
+Signals for ai_engine app
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import User
+from inventory.services import stock_summary_refreshed, stock_summaries_rebuilt
+from .search_cache import invalidate
+from .spatial_index import get_blood_bank_index, is_blood_bank_site
+
+@receiver(post_save, sender=User)
+def sync_blood_bank_location(sender, instance, **kwargs):
+    """Keep the spatial index in step with blood bank location changes"""
+    index = get_blood_bank_index()
+    if not index.is_built:
+        return
+    
+    if is_blood_bank_site(instance) and instance.latitude is not None and instance.longitude is not None:
+        index.upsert(instance.pk, instance.latitude, instance.longitude)
+    else:
+        index.remove(instance.pk)
+
+@receiver(post_delete, sender=User)
+def drop_blood_bank_location(sender, instance, **kwargs):
+    index = get_blood_bank_index()
+    if index.is_built:
+        index.remove(instance.pk)
+
+@receiver(stock_summary_refreshed)
+def invalidate_searches_on_stock_change(sender, blood_group, component_type, changed=True, **kwargs):
+    """Cached searches only read the stock summary, so only a changed total invalidates them"""
+    if changed:
+        invalidate((component_type, blood_group))
+
+@receiver(stock_summaries_rebuilt)
+def invalidate_searches_on_rebuild(sender, keys, **kwargs):
+    invalidate(*{(key[2], key[1]) for key in keys})
\ No newline at end of file
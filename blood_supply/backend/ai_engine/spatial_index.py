@@ -0,0 +1,214 @@
+"""
+Process-level spatial index over blood bank locations
+"""
+import threading
+import time
+from math import radians
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from sklearn.neighbors import BallTree
+from utils.geo import EARTH_RADIUS_KM, haversine_radians
+
+# Users that hold inventory: blood banks and hospitals running their own blood bank
+BLOOD_BANK_SITE_FILTER = Q(user_type='BLOOD_BANK') | Q(user_type='HOSPITAL', has_blood_bank=True)
+
+def is_blood_bank_site(user):
+    """Return True if the user can hold blood inventory"""
+    return user.user_type == 'BLOOD_BANK' or (user.user_type == 'HOSPITAL' and user.has_blood_bank)
+
+def _to_radians(latitude, longitude):
+    # Same conversion as User.update_location_fields so unchanged locations compare equal
+    return (radians(float(latitude)), radians(float(longitude)))
+
+class BloodBankSpatialIndex:
+    """
+    BallTree (haversine metric) over blood bank coordinates in radians.
+
+    The tree is built once from the database. Location changes are applied
+    incrementally: moved or new banks go to a small overlay that is searched
+    by brute force, and stale tree entries are masked out, until enough
+    changes pile up to justify rebuilding the tree from memory.
+    """
+
+    def __init__(self, rebuild_threshold=256, max_age=None):
+        self.rebuild_threshold = rebuild_threshold
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._locations = {}
+        self._tree = None
+        self._tree_ids = np.empty(0, dtype=np.int64)
+        self._tree_members = set()
+        self._overlay = {}
+        self._stale = set()
+        self._built_at = None
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def __len__(self):
+        return len(self._locations)
+
+    def build(self):
+        """Load every located blood bank from the database and build the tree"""
+        from accounts.models import User
+
+        # Radians are precomputed on User.save, no per-row Decimal conversion needed
+        rows = User.objects.filter(
+            BLOOD_BANK_SITE_FILTER,
+            latitude_rad__isnull=False,
+            longitude_rad__isnull=False
+        ).values_list('id', 'latitude_rad', 'longitude_rad')
+
+        with self._lock:
+            self._locations = {
+                bank_id: (latitude_rad, longitude_rad)
+                for bank_id, latitude_rad, longitude_rad in rows
+            }
+            self._rebuild_tree()
+            self._built_at = time.monotonic()
+
+    def ensure_built(self):
+        if not self.is_built or (
+            self.max_age is not None and time.monotonic() - self._built_at > self.max_age
+        ):
+            self.build()
+
+    def invalidate(self):
+        """Drop the index so that the next query rebuilds it from the database"""
+        with self._lock:
+            self._built_at = None
+
+    def upsert(self, bank_id, latitude, longitude):
+        """Add a bank or move it to a new location"""
+        location = _to_radians(latitude, longitude)
+
+        with self._lock:
+            if self._locations.get(bank_id) == location:
+                return
+
+            self._locations[bank_id] = location
+            if bank_id in self._tree_members:
+                self._stale.add(bank_id)
+            self._overlay[bank_id] = location
+            self._maybe_rebuild()
+
+    def remove(self, bank_id):
+        """Remove a bank from the index"""
+        with self._lock:
+            if self._locations.pop(bank_id, None) is None:
+                return
+
+            self._overlay.pop(bank_id, None)
+            if bank_id in self._tree_members:
+                self._stale.add(bank_id)
+            self._maybe_rebuild()
+
+    def locations(self, bank_ids):
+        """Return {bank_id: (latitude_rad, longitude_rad)} for the indexed banks among bank_ids"""
+        self.ensure_built()
+
+        with self._lock:
+            return {bank_id: self._locations[bank_id] for bank_id in bank_ids if bank_id in self._locations}
+
+    def query(self, latitude, longitude, k=None, radius_km=None, candidates=None):
+        """
+        Return [(bank_id, distance_km), ...] nearest first.
+
+        k limits the number of banks, radius_km the search distance and
+        candidates restricts results to a set of bank ids (e.g. banks that
+        hold the requested stock).
+        """
+        self.ensure_built()
+        point = np.array([_to_radians(latitude, longitude)])
+
+        with self._lock:
+            if candidates is not None and not candidates:
+                return []
+
+            matches = self._query_tree(point, k, radius_km, candidates)
+            matches.extend(self._query_overlay(point, radius_km, candidates))
+
+        matches.sort(key=lambda match: match[1])
+        if k is not None:
+            matches = matches[:k]
+
+        return [(bank_id, distance * EARTH_RADIUS_KM) for bank_id, distance in matches]
+
+    def _accepts(self, bank_id, candidates):
+        return bank_id not in self._stale and (candidates is None or bank_id in candidates)
+
+    def _query_tree(self, point, k, radius_km, candidates):
+        if self._tree is None:
+            return []
+
+        if radius_km is not None:
+            indices, distances = self._tree.query_radius(
+                point, r=radius_km / EARTH_RADIUS_KM, return_distance=True, sort_results=True
+            )
+            return [
+                (int(self._tree_ids[idx]), float(distance))
+                for idx, distance in zip(indices[0], distances[0])
+                if self._accepts(int(self._tree_ids[idx]), candidates)
+            ][:k]
+
+        size = len(self._tree_ids)
+        wanted = size if k is None else min(size, k + len(self._stale))
+        while True:
+            distances, indices = self._tree.query(point, k=wanted)
+            matches = [
+                (int(self._tree_ids[idx]), float(distance))
+                for idx, distance in zip(indices[0], distances[0])
+                if self._accepts(int(self._tree_ids[idx]), candidates)
+            ]
+            # Masked entries may crowd out valid ones, widen the search until k are found
+            if k is None or len(matches) >= k or wanted == size:
+                return matches[:k]
+            wanted = min(size, wanted * 2)
+
+    def _query_overlay(self, point, radius_km, candidates):
+        bank_ids = [bank_id for bank_id in self._overlay if candidates is None or bank_id in candidates]
+        if not bank_ids:
+            return []
+
+        coords = np.array([self._overlay[bank_id] for bank_id in bank_ids])
+        distances = haversine_radians(point[0, 0], point[0, 1], coords[:, 0], coords[:, 1])
+
+        return [
+            (bank_id, float(distance))
+            for bank_id, distance in zip(bank_ids, distances)
+            if radius_km is None or distance * EARTH_RADIUS_KM <= radius_km
+        ]
+
+    def _maybe_rebuild(self):
+        if len(self._overlay) + len(self._stale) > self.rebuild_threshold:
+            self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        self._tree_ids = np.fromiter(self._locations.keys(), dtype=np.int64, count=len(self._locations))
+        if len(self._tree_ids):
+            coords = np.array([self._locations[bank_id] for bank_id in self._tree_ids.tolist()])
+            self._tree = BallTree(coords, metric='haversine')
+        else:
+            self._tree = None
+        self._tree_members = set(self._tree_ids.tolist())
+        self._overlay = {}
+        self._stale = set()
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_blood_bank_index():
+    """Return the process-wide blood bank index (built lazily on first query)"""
+    global _index
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BloodBankSpatialIndex(
+                    rebuild_threshold=getattr(settings, 'BLOOD_BANK_INDEX_REBUILD_THRESHOLD', 256),
+                    max_age=getattr(settings, 'BLOOD_BANK_INDEX_MAX_AGE', 300)
+                )
+    return _index
\ No newline at end of file
@@ -1,3 +1,56 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from accounts.models import User
+from inventory.models import BloodType
+from .search_cache import reset_stats, search_blood_banks, stats
 
-# Create your tests here.
+class SearchCacheInvalidationTest(TestCase):
+    # Generations live in the default cache, so this holds within one process;
+    # other processes only see the bump through a shared cache backend
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+        self.bank = User.objects.create(
+            username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune',
+            latitude=18.52, longitude=73.85
+        )
+        self.donor = User.objects.create(username='donor', phone='9000000001', user_type='DONOR', city='Pune')
+        self.add_batch('O+', 'RBC', 4)
+    
+    def add_batch(self, blood_group, component_type, quantity, donor=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            BloodType.objects.create(
+                blood_bank=self.bank,
+                donor=donor,
+                blood_group=blood_group,
+                component_type=component_type,
+                quantity=quantity,
+                collection_date=date.today(),
+                expiry_date=date.today() + timedelta(days=20),
+                storage_temperature=4,
+                batch_number=f'{blood_group}-{component_type}-{BloodType.objects.count()}'
+            )
+    
+    def search(self):
+        [result] = search_blood_banks({'latitude': 18.53, 'longitude': 73.86}, 'O+', 'RBC', fail_silently=False)
+        return result['quantity']
+    
+    def test_donation_of_matching_stock_invalidates_the_search(self):
+        self.assertEqual(self.search(), 4)
+        self.assertEqual(self.search(), 4)
+        self.assertEqual((stats()['hits'], stats()['misses']), (1, 1))
+        
+        self.add_batch('O+', 'RBC', 3, donor=self.donor)
+        
+        self.assertEqual(self.search(), 7)
+        self.assertEqual((stats()['hits'], stats()['misses']), (1, 2))
+    
+    def test_unrelated_stock_keeps_the_search_cached(self):
+        self.search()
+        
+        self.add_batch('AB+', 'PLASMA', 3)
+        
+        self.search()
+        self.assertEqual((stats()['hits'], stats()['misses']), (1, 1))
\ No newline at end of file
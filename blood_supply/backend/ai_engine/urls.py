@@ -4,7 +4,8 @@ from .views import (
     DemandPredictionView,
     ExpiryPredictionView,
     DonorMatchingView,
-    NearestBloodBanksView
+    NearestBloodBanksView,
+    SearchCacheStatsView
 )
 
 urlpatterns = [
@@ -13,4 +14,5 @@ urlpatterns = [
     path('predict-expiry/', ExpiryPredictionView.as_view(), name='predict-expiry'),
     path('match-donors/', DonorMatchingView.as_view(), name='match-donors'),
     path('nearest-banks/', NearestBloodBanksView.as_view(), name='nearest-banks'),
+    path('nearest-banks/cache-stats/', SearchCacheStatsView.as_view(), name='search-cache-stats'),
 ]
\ No newline at end of file
@@ -7,10 +7,13 @@ from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from .models import AIPredictiveModel, BloodSupplyChainAI
 from inventory.models import BloodType
+from utils.helpers import parse_bool
+from .search_cache import search_blood_banks, stats as search_cache_stats
 from .serializers import (
     AIPredictiveModelSerializer,
     DemandPredictionSerializer,
-    ExpiryPredictionSerializer
+    ExpiryPredictionSerializer,
+    NearestBloodBanksSerializer
 )
 
 class AIPredictiveModelListView(generics.ListAPIView):
@@ -40,13 +43,27 @@ class ExpiryPredictionView(APIView):
     def post(self, request):
         serializer = ExpiryPredictionSerializer(data=request.data)
         if serializer.is_valid():
+            ai_engine = BloodSupplyChainAI()
+            ids = serializer.validated_data.get('blood_inventory_ids')
+            
+            if ids is not None:
+                # Batch variant, one query for every requested unit
+                predictions = ai_engine.predict_expiry_risk_batch(
+                    BloodType.objects.filter(id__in=ids, blood_bank=request.user).order_by('expiry_date', 'id')
+                )
+                found = {prediction['blood_id'] for prediction in predictions}
+                return Response({
+                    'success': True,
+                    'predictions': predictions,
+                    'not_found': [blood_id for blood_id in dict.fromkeys(ids) if blood_id not in found]
+                })
+            
             blood_inventory = get_object_or_404(
                 BloodType, 
                 id=serializer.validated_data['blood_inventory_id'],
                 blood_bank=request.user
             )
             
-            ai_engine = BloodSupplyChainAI()
             prediction = ai_engine.predict_expiry_risk(blood_inventory)
             
             return Response({
@@ -62,6 +79,7 @@ class DonorMatchingView(APIView):
     def post(self, request):
         blood_group = request.data.get('blood_group')
         location = request.data.get('location')
+        compatible = parse_bool(request.data.get('compatible'), default=True)
         
         if not blood_group or not location:
             return Response(
@@ -84,7 +102,7 @@ class DonorMatchingView(APIView):
             temp_request.hospital.latitude = location['latitude']
             temp_request.hospital.longitude = location['longitude']
         
-        matches = ai_engine.match_donors_for_request(temp_request)
+        matches = ai_engine.match_donors_for_request(temp_request, compatible=compatible)
         
         return Response({
             'success': True,
@@ -96,27 +114,30 @@ class NearestBloodBanksView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        blood_group = request.data.get('blood_group')
-        component_type = request.data.get('component_type', 'WHOLE_BLOOD')
-        quantity = int(request.data.get('quantity', 1))
-        location = request.data.get('location')
-        
-        if not all([blood_group, location]):
-            return Response(
-                {'error': 'Blood group and location are required'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        serializer = NearestBloodBanksSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        ai_engine = BloodSupplyChainAI()
-        suggestions = ai_engine.find_nearest_blood_banks(
-            request_location=location,
-            blood_group=blood_group,
-            component_type=component_type,
-            quantity=quantity
+        data = serializer.validated_data
+        suggestions = search_blood_banks(
+            request_location=data['location'],
+            blood_group=data['blood_group'],
+            component_type=data['component_type'],
+            quantity=data['quantity'],
+            limit=data['limit'],
+            radius_km=data.get('radius_km') or None,
+            compatible=data['compatible']
         )
         
         return Response({
             'success': True,
             'total_suggestions': len(suggestions),
             'suggestions': suggestions
-        })
\ No newline at end of file
+        })
+
+class SearchCacheStatsView(APIView):
+    """Hit/miss counters of the blood bank search cache"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        return Response(search_cache_stats())
\ No newline at end of file
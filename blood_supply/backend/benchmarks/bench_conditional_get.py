@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Benchmark polling with and without conditional GET (If-None-Match)
+
+Seeds a throwaway test database with one blood bank, its inventory and
+notifications, then polls the inventory list, dashboard and notification
+stats endpoints the way the dashboards do.
+
+Usage:
+    python benchmarks/bench_conditional_get.py [polls] [inventory_units]
+"""
+
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodchain.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from accounts.models import User
+from inventory.models import BloodType
+from notifications.services import fan_out
+
+ENDPOINTS = [
+    '/api/inventory/blood/?page_size=200',
+    '/api/accounts/dashboard/',
+    '/api/notifications/stats/',
+]
+
+def seed(units):
+    bank = User.objects.create(username='bench-bank', phone='9000000001', user_type='BLOOD_BANK', city='Pune',
+                               blood_bank_name='Bench Bank')
+    groups = ['A+', 'A-', 'B+', 'B-', 'O+', 'O-', 'AB+', 'AB-']
+    for index in range(units):
+        BloodType.objects.create(
+            blood_bank=bank, blood_group=groups[index % 8], component_type='RBC', quantity=1 + index % 5,
+            collection_date=date.today(), expiry_date=date.today() + timedelta(days=3 + index % 40),
+            storage_temperature=4, batch_number=f'BENCH-{index}'
+        )
+    for _ in range(20):
+        fan_out([bank.id], 'SYSTEM_ALERT', 'Benchmark', 'Seeded notification')
+    return bank
+
+def poll(client, url, polls, conditional):
+    etag = client.get(url)['ETag']
+    headers = {'HTTP_IF_NONE_MATCH': etag} if conditional else {}
+    
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(polls):
+            response = client.get(url, **headers)
+    elapsed = time.perf_counter() - started
+    return response.status_code, elapsed * 1000 / polls, len(queries.captured_queries) / polls, len(response.content)
+
+def main():
+    polls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    units = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    settings.DEBUG = False
+    
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        bank = seed(units)
+        client = APIClient()
+        client.force_authenticate(bank)
+        
+        print(f"{polls} polls per endpoint, blood bank with {units} inventory rows ({connection.vendor})")
+        for url in ENDPOINTS:
+            full = poll(client, url, polls, conditional=False)
+            cached = poll(client, url, polls, conditional=True)
+            print(f"  {url}")
+            for label, (status, ms, queries, size) in (('full', full), ('If-None-Match', cached)):
+                print(f"    {label:<14} {status} {ms:8.2f} ms/poll {queries:5.1f} queries {size:8} bytes")
+            print(f"    server time saved per poll: {100 * (1 - cached[1] / full[1]):.0f}%")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Benchmark concurrent request fulfilment with inventory.allocation.fulfil_request
+
+Runs in a throwaway test database (SQLite by default, or whatever
+DATABASE_URL points at) and checks that no units are double-allocated.
+
+Usage:
+    python benchmarks/bench_fulfilment.py [fulfilers] [requests] [units_per_request]
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bloodchain.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from accounts.models import User
+from inventory.allocation import fulfil_request, AllocationError
+from inventory.models import BloodType, BloodRequest, StockSummary
+
+def seed(requests, units_per_request):
+    hospital = User.objects.create(username='bench-hospital', phone='9000000000', user_type='HOSPITAL', city='Pune')
+    bank = User.objects.create(username='bench-bank', phone='9000000001', user_type='BLOOD_BANK', city='Pune',
+                               blood_bank_name='Bench Bank')
+    
+    # Stock for about two thirds of the demand, spread over many batches
+    stock = requests * units_per_request * 2 // 3
+    batches = max(stock // 10, 1)
+    for index in range(batches):
+        BloodType.objects.create(
+            blood_bank=bank, blood_group='O+', component_type='RBC',
+            quantity=stock // batches + (1 if index < stock % batches else 0),
+            collection_date=date.today(), expiry_date=date.today() + timedelta(days=5 + index % 30),
+            storage_temperature=4, batch_number=f'BENCH-{index}'
+        )
+    
+    BloodRequest.objects.bulk_create([
+        BloodRequest(
+            hospital=hospital, blood_group='O+', component_type='RBC',
+            quantity_required=units_per_request, required_by=timezone.now() + timedelta(days=1)
+        )
+        for _ in range(requests)
+    ])
+    return bank, stock
+
+def run(fulfilers, bank, request_ids):
+    queue = list(request_ids)
+    lock = threading.Lock()
+    outcomes = {'fulfilled': 0, 'conflict': 0}
+    barrier = threading.Barrier(fulfilers)
+    
+    def fulfiler():
+        barrier.wait()
+        try:
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    request_id = queue.pop()
+                try:
+                    fulfil_request(BloodRequest.objects.get(pk=request_id), bank)
+                    result = 'fulfilled'
+                except AllocationError:
+                    result = 'conflict'
+                with lock:
+                    outcomes[result] += 1
+        finally:
+            connection.close()
+    
+    threads = [threading.Thread(target=fulfiler) for _ in range(fulfilers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes, time.perf_counter() - started
+
+def main():
+    fulfilers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    units_per_request = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        bank, stock = seed(requests, units_per_request)
+        request_ids = list(BloodRequest.objects.values_list('id', flat=True))
+        
+        outcomes, elapsed = run(fulfilers, bank, request_ids)
+        
+        remaining = BloodType.objects.aggregate(total=Sum('quantity'))['total']
+        fulfilled = BloodRequest.objects.filter(status='FULFILLED').count()
+        summary = StockSummary.objects.filter(blood_bank=bank).values_list('available_units', flat=True).first() or 0
+        consistent = (
+            fulfilled == outcomes['fulfilled']
+            and remaining == stock - fulfilled * units_per_request
+            and remaining >= 0
+            and summary == remaining
+            and not BloodType.objects.filter(quantity__lt=0).exists()
+        )
+        
+        print(f"{requests:,} requests x {units_per_request} units, {stock:,} units in stock, "
+              f"{fulfilers} concurrent fulfilers ({connection.vendor})")
+        print(f"  fulfilled:              {fulfilled:8,}")
+        print(f"  rejected:               {outcomes['conflict']:8,}")
+        print(f"  units left:             {remaining:8,}  (stock summary {summary:,})")
+        print(f"  elapsed:                {elapsed:8.2f} s")
+        print(f"  throughput:             {requests / elapsed:8.1f} attempts/s, "
+              f"{fulfilled / elapsed:.1f} fulfilments/s")
+        print(f"  totals consistent:      {'yes' if consistent else 'NO'}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+    
+    sys.exit(0 if consistent else 1)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
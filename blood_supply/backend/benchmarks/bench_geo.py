@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Benchmark one-to-N great-circle distance with utils.geo
+
+Usage:
+    python benchmarks/bench_geo.py [points] [repeats]
+"""
+
+import os
+import sys
+import timeit
+from math import radians, sin, cos, sqrt, atan2
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.geo import distances_from, to_radians, haversine_radians, EARTH_RADIUS_KM
+
+def scalar_haversine(lat1, lon1, lat2, lon2):
+    """The per-pair pure Python formula that utils.geo replaces"""
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+def best_ms(func, repeats):
+    return min(timeit.repeat(func, number=1, repeat=repeats)) * 1000
+
+def main():
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    
+    rng = np.random.default_rng(42)
+    # Points scattered over India
+    latitudes = rng.uniform(8.0, 35.0, points)
+    longitudes = rng.uniform(68.0, 97.0, points)
+    origin = (19.0760, 72.8777)
+    
+    lat_rad, lon_rad = to_radians(latitudes), to_radians(longitudes)
+    origin_rad = to_radians(origin)
+    
+    vectorized = best_ms(lambda: distances_from(origin[0], origin[1], latitudes, longitudes), repeats)
+    precomputed = best_ms(lambda: haversine_radians(origin_rad[0], origin_rad[1], lat_rad, lon_rad), repeats)
+    
+    sample = min(points, 10_000)
+    scalar = best_ms(lambda: [
+        scalar_haversine(origin[0], origin[1], lat, lon)
+        for lat, lon in zip(latitudes[:sample].tolist(), longitudes[:sample].tolist())
+    ], 3) * points / sample
+    
+    expected = np.array([
+        scalar_haversine(origin[0], origin[1], lat, lon)
+        for lat, lon in zip(latitudes[:1000].tolist(), longitudes[:1000].tolist())
+    ])
+    error = np.abs(distances_from(origin[0], origin[1], latitudes[:1000], longitudes[:1000]) - expected).max()
+    
+    print(f"One-to-N haversine over {points:,} points (best of {repeats})")
+    print(f"  utils.geo.distances_from (degrees in):  {vectorized:8.2f} ms")
+    print(f"  utils.geo.haversine_radians (radians):  {precomputed:8.2f} ms")
+    print(f"  pure Python per pair (extrapolated):    {scalar:8.2f} ms")
+    print(f"  max abs difference vs scalar formula:   {error:.2e} km")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import IdempotencyKey
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'method', 'path', 'status', 'response_status', 'created_at', 'expires_at')
+    list_filter = ('status', 'method')
+    search_fields = ('key', 'path', 'user__username')
+    readonly_fields = ('created_at',)
+    exclude = ('response_body',)
\ No newline at end of file
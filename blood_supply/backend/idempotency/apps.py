@@ -0,0 +1,5 @@
+from django.apps import AppConfig
+
+class IdempotencyConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'idempotency'
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Idempotency-Key support for unsafe HTTP methods
+
+A client that sends an Idempotency-Key header gets the stored response of
+the first execution replayed on every retry with the same key (per user)
+until the key expires, instead of running the view again. A retry that
+arrives while the first execution is still running gets 409, and reusing
+a key for a different request gets 422. Only definitive outcomes are stored:
+server errors and statuses that can change on retry (conflicts, rate limits,
+an expired token) release the key so the retry runs the view again.
+
+Requests are told apart by method, path and body. Multipart and oversized
+bodies are not read (that would load uploads into memory or raise
+RequestDataTooBig); their content type and length stand in for the body.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import JsonResponse, HttpResponse
+from django.utils import timezone
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# 4xx responses the same request may not get again
+TRANSIENT_STATUSES = (401, 408, 409, 423, 425, 429)
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+def _lock_timeout():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+def _resolve_user(request):
+    """The user the view will see; DRF authenticates JWT inside the view, so do it here too"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except Exception:
+        return None
+    return result[0] if result else None
+
+def _max_body_size():
+    return getattr(settings, 'IDEMPOTENCY_MAX_BODY_SIZE', settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+
+def _body_is_bounded(request):
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return False
+    max_size = _max_body_size()
+    return (
+        not request.content_type.startswith('multipart/')
+        and (max_size is None or length <= max_size)
+    )
+
+def _fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.get_full_path().encode())
+    if _body_is_bounded(request):
+        digest.update(request.body)
+    else:
+        digest.update(request.META.get('CONTENT_TYPE', '').encode())
+        digest.update(request.META.get('CONTENT_LENGTH', '').encode())
+    return digest.hexdigest()
+
+def _error(message, status, **headers):
+    response = JsonResponse({'error': message}, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+class IdempotencyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        key = request.META.get(HEADER)
+        if not key or request.method not in UNSAFE_METHODS:
+            return self.get_response(request)
+        
+        if len(key) > 255:
+            return _error('Idempotency-Key must be at most 255 characters', 400)
+        
+        user = _resolve_user(request)
+        fingerprint = _fingerprint(request)
+        record, owned = self._acquire(key, user, request, fingerprint)
+        
+        if not owned:
+            if record.fingerprint != fingerprint:
+                return _error('Idempotency-Key was already used for a different request', 422)
+            if record.status == 'IN_PROGRESS':
+                return _error('A request with this Idempotency-Key is still being processed', 409,
+                              **{'Retry-After': '1'})
+            return self._replay(record)
+        
+        try:
+            response = self.get_response(request)
+        except Exception:
+            record.delete()
+            raise
+        
+        if response.status_code >= 500 or response.status_code in TRANSIENT_STATUSES or response.streaming:
+            # Not a definitive outcome, let the client retry for real
+            record.delete()
+            return response
+        
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status='COMPLETED',
+            locked_until=None,
+            response_status=response.status_code,
+            response_headers=dict(response.items()),
+            response_body=response.content
+        )
+        return response
+    
+    def _acquire(self, key, user, request, fingerprint):
+        """Return (record, owned); owned is True when this request must run the view"""
+        now = timezone.now()
+        lookup = {'key': key, 'user': user}
+        IdempotencyKey.objects.filter(expires_at__lte=now, **lookup).delete()
+        
+        try:
+            # Savepoint so a duplicate key leaves an enclosing transaction usable
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    method=request.method,
+                    path=request.path[:255],
+                    fingerprint=fingerprint,
+                    locked_until=now + _lock_timeout(),
+                    expires_at=now + _ttl(),
+                    **lookup
+                )
+            return record, True
+        except IntegrityError:
+            pass
+        
+        # A first attempt that crashed mid-request leaves a stale lock, take it over
+        taken = IdempotencyKey.objects.filter(
+            Q(locked_until__lt=now), status='IN_PROGRESS', fingerprint=fingerprint, **lookup
+        ).update(locked_until=now + _lock_timeout())
+        record = IdempotencyKey.objects.get(**lookup)
+        return record, bool(taken)
+    
+    def _replay(self, record):
+        response = HttpResponse(bytes(record.response_body or b''), status=record.response_status)
+        for name, value in record.response_headers.items():
+            response[name] = value
+        response['Idempotent-Replayed'] = 'true'
+        return response
\ No newline at end of file
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+def copy_content_types(apps, schema_editor):
+    IdempotencyKey = apps.get_model('idempotency', 'IdempotencyKey')
+
+    keys = list(IdempotencyKey.objects.exclude(response_content_type='').only('id', 'response_content_type'))
+    for key in keys:
+        key.response_headers = {'Content-Type': key.response_content_type}
+    IdempotencyKey.objects.bulk_update(keys, ['response_headers'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('idempotency', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='response_headers',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(copy_content_types, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='idempotencykey',
+            name='response_content_type',
+        ),
+    ]
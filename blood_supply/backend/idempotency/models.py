@@ -0,0 +1,38 @@
+from django.db import models
+from accounts.models import User
+
+class IdempotencyKey(models.Model):
+    STATUS_CHOICES = (
+        ('IN_PROGRESS', 'In Progress'),
+        ('COMPLETED', 'Completed'),
+    )
+    
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='idempotency_keys')
+    
+    # What the key was first used for; reusing it for another request is an error
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='IN_PROGRESS')
+    locked_until = models.DateTimeField(null=True, blank=True)
+    
+    # Stored response, replayed on retries
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_headers = models.JSONField(default=dict, blank=True)
+    response_body = models.BinaryField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(user__isnull=True), name='unique_anonymous_idempotency_key'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} ({self.status})"
\ No newline at end of file
@@ -0,0 +1,103 @@
+import json
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+from .middleware import _fingerprint
+from .models import IdempotencyKey
+
+calls = []
+
+def create_thing(request):
+    calls.append(request.POST.get('name') or json.loads(request.body or b'{}').get('name'))
+    response = JsonResponse({'id': len(calls)}, status=201)
+    response['Location'] = f'/things/{len(calls)}/'
+    response['ETag'] = f'"{len(calls)}"'
+    return response
+
+def reserve_thing(request):
+    # Loses a race on its first call, like a fulfilment that finds the request locked
+    calls.append('reserve')
+    if len(calls) == 1:
+        return JsonResponse({'error': 'Request is being fulfilled'}, status=409)
+    return JsonResponse({'id': len(calls)}, status=201)
+
+urlpatterns = [
+    path('things/', create_thing),
+    path('reservations/', reserve_thing),
+]
+
+@override_settings(ROOT_URLCONF='idempotency.tests')
+class IdempotencyMiddlewareTest(TestCase):
+    def setUp(self):
+        calls.clear()
+    
+    def post(self, key, data):
+        return self.client.post('/things/', data, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+    
+    def test_retry_replays_the_stored_response_with_its_headers(self):
+        first = self.post('k1', {'name': 'a'})
+        second = self.post('k1', {'name': 'a'})
+        
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.content, first.content)
+        for header in ('Content-Type', 'Location', 'ETag'):
+            self.assertEqual(second[header], first[header])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+    
+    def test_key_reused_for_a_different_body_is_rejected(self):
+        self.post('k1', {'name': 'a'})
+        
+        response = self.post('k1', {'name': 'b'})
+        
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(calls, ['a'])
+    
+    def test_retry_while_the_first_request_runs_gets_409(self):
+        request = RequestFactory().post('/things/', {'name': 'a'}, content_type='application/json')
+        now = timezone.now()
+        IdempotencyKey.objects.create(
+            key='k1', method='POST', path='/things/', fingerprint=_fingerprint(request),
+            locked_until=now + timedelta(minutes=1), expires_at=now + timedelta(days=1)
+        )
+        
+        response = self.post('k1', {'name': 'a'})
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(calls, [])
+    
+    def test_retry_after_a_conflict_runs_the_view_again(self):
+        first = self.client.post('/reservations/', {}, content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+        second = self.client.post('/reservations/', {}, content_type='application/json', HTTP_IDEMPOTENCY_KEY='k1')
+        
+        self.assertEqual(first.status_code, 409)
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertEqual(calls, ['reserve', 'reserve'])
+    
+    def test_expired_key_runs_the_request_again(self):
+        self.post('k1', {'name': 'a'})
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        
+        response = self.post('k1', {'name': 'a'})
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(calls, ['a', 'a'])
+    
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_uploads_are_not_read_into_memory(self):
+        upload = {'name': 'a', 'file': SimpleUploadedFile('scan.bin', b'x' * 4096)}
+        
+        first = self.client.post('/things/', upload, HTTP_IDEMPOTENCY_KEY='k1')
+        upload['file'].seek(0)
+        second = self.client.post('/things/', upload, HTTP_IDEMPOTENCY_KEY='k1')
+        
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(calls, ['a'])
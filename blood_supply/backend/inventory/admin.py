@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import BloodType, BloodRequest
+from django.db import transaction
+from django.utils import timezone
+from .audit import audited_update
+from .models import BloodType, BloodRequest, StockSummary, ExpirySweepRun, InventoryAuditLog, InventorySnapshot
+from .services import refresh_stock_summaries
 
 @admin.register(BloodType)
 class BloodTypeAdmin(admin.ModelAdmin):
@@ -11,7 +15,10 @@ class BloodTypeAdmin(admin.ModelAdmin):
     actions = ['mark_as_tested']
     
     def mark_as_tested(self, request, queryset):
-        queryset.update(is_tested=True, status='AVAILABLE')
+        stock_keys = list(queryset.values_list('blood_bank_id', 'blood_group', 'component_type').distinct())
+        with transaction.atomic():
+            audited_update(queryset, 'admin', is_tested=True, status='AVAILABLE')
+            refresh_stock_summaries(stock_keys)
         self.message_user(request, f"{queryset.count()} blood units marked as tested.")
     mark_as_tested.short_description = "Mark selected as tested"
 
@@ -25,11 +32,49 @@ class BloodRequestAdmin(admin.ModelAdmin):
     actions = ['approve_requests', 'reject_requests']
     
     def approve_requests(self, request, queryset):
-        queryset.update(status='APPROVED')
+        queryset.update(status='APPROVED', updated_at=timezone.now())
         self.message_user(request, f"{queryset.count()} requests approved.")
     approve_requests.short_description = "Approve selected requests"
     
     def reject_requests(self, request, queryset):
-        queryset.update(status='REJECTED')
+        queryset.update(status='REJECTED', updated_at=timezone.now())
         self.message_user(request, f"{queryset.count()} requests rejected.")
-    reject_requests.short_description = "Reject selected requests"
\ No newline at end of file
+    reject_requests.short_description = "Reject selected requests"
+
+@admin.register(StockSummary)
+class StockSummaryAdmin(admin.ModelAdmin):
+    list_display = ('blood_bank', 'blood_group', 'component_type', 'available_units',
+                    'earliest_expiry', 'version', 'updated_at')
+    list_filter = ('blood_group', 'component_type', 'blood_bank__city')
+    search_fields = ('blood_bank__username', 'blood_bank__blood_bank_name')
+    readonly_fields = ('version', 'updated_at')
+
+@admin.register(ExpirySweepRun)
+class ExpirySweepRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'swept_through', 'batches', 'rows_expired', 'units_expired',
+                    'banks_notified', 'duration_ms')
+    readonly_fields = ('started_at', 'finished_at', 'swept_through', 'batches', 'rows_expired',
+                       'units_expired', 'banks_notified', 'duration_ms')
+
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'blood_bank', 'blood_group', 'component_type', 'available_units',
+                    'expiring_units', 'wasted_units')
+    list_filter = ('date', 'blood_group', 'component_type')
+    search_fields = ('blood_bank__username', 'blood_bank__blood_bank_name')
+
+@admin.register(InventoryAuditLog)
+class InventoryAuditLogAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'blood_inventory_id', 'blood_bank', 'action', 'source')
+    list_filter = ('action', 'source')
+    search_fields = ('blood_bank__username',)
+    
+    # Append-only
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
\ No newline at end of file
@@ -0,0 +1,240 @@
+"""
+First-expiry-first-out (FEFO) allocation of blood stock across batches and banks
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from accounts.models import location_filter
+from utils.geo import EARTH_RADIUS_KM, to_radians, haversine_radians
+from .audit import record_change
+from .models import BloodType, BloodRequest
+from .services import available_stock, refresh_stock_summaries
+
+class AllocationError(Exception):
+    """Raised when a planned batch no longer holds the units it was planned with"""
+
+class InsufficientStock(AllocationError):
+    """Raised when the bank does not hold enough usable units for a request"""
+
+class RequestNotPending(AllocationError):
+    """Raised when a request was fulfilled or cancelled by someone else first"""
+
+def plan_allocation(blood_group, component_type, quantity, blood_bank_ids=None,
+                    location=None, radius_km=None, max_banks=3, blood_groups=None):
+    """
+    Plan which batches should serve a request, in one query.
+    
+    Stock is summed across each bank's batches and consumed earliest expiry
+    first. blood_groups lists usable donor groups in order of preference
+    (default: the exact group only); preferred groups are used up before
+    substitutes. With several candidate banks the nearest ones (or, without
+    a location, the best stocked ones) are used until the quantity is
+    covered, splitting across at most max_banks banks.
+    """
+    blood_groups = blood_groups or [blood_group]
+    preference = {group: rank for rank, group in enumerate(blood_groups)}
+    
+    batches = available_stock(blood_group__in=blood_groups, component_type=component_type)
+    if blood_bank_ids is not None:
+        batches = batches.filter(blood_bank_id__in=blood_bank_ids)
+    if location and radius_km is not None:
+        batches = batches.filter(location_filter(
+            location['latitude'], location['longitude'], radius_km, prefix='blood_bank__'
+        ))
+    
+    banks = {}
+    rows = batches.values(
+        'id', 'blood_bank_id', 'blood_group', 'batch_number', 'quantity', 'expiry_date',
+        'blood_bank__latitude_rad', 'blood_bank__longitude_rad'
+    ).order_by('blood_bank_id', 'expiry_date', 'id')
+    
+    for batch in sorted(rows, key=lambda row: (row['blood_bank_id'], preference[row['blood_group']])):
+        bank = banks.setdefault(batch['blood_bank_id'], {
+            'blood_bank_id': batch['blood_bank_id'],
+            'latitude_rad': batch['blood_bank__latitude_rad'],
+            'longitude_rad': batch['blood_bank__longitude_rad'],
+            'available': 0,
+            'batches': [],
+        })
+        bank['available'] += batch['quantity']
+        bank['batches'].append(batch)
+    
+    candidates = list(banks.values())
+    _rank_candidates(candidates, location)
+    if location and radius_km is not None:
+        candidates = [bank for bank in candidates if bank['distance_km'] <= radius_km]
+    
+    plan = {
+        'blood_group': blood_group,
+        'component_type': component_type,
+        'requested': quantity,
+        'allocated': 0,
+        'fulfillable': False,
+        'banks': [],
+    }
+    
+    remaining = quantity
+    for bank in candidates[:max_banks]:
+        if remaining <= 0:
+            break
+        
+        allocation = {
+            'blood_bank_id': bank['blood_bank_id'],
+            'distance_km': _round_distance(bank.get('distance_km')),
+            'quantity': 0,
+            'batches': [],
+        }
+        for batch in bank['batches']:
+            if remaining <= 0:
+                break
+            take = min(batch['quantity'], remaining)
+            allocation['batches'].append({
+                'blood_id': batch['id'],
+                'batch_number': batch['batch_number'],
+                'blood_group': batch['blood_group'],
+                'quantity': take,
+                'expiry_date': batch['expiry_date'],
+            })
+            allocation['quantity'] += take
+            remaining -= take
+        
+        plan['banks'].append(allocation)
+        plan['allocated'] += allocation['quantity']
+    
+    plan['fulfillable'] = remaining <= 0
+    return plan
+
+def _round_distance(distance_km):
+    if distance_km is None or not np.isfinite(distance_km):
+        return None
+    return round(distance_km, 2)
+
+def _rank_candidates(candidates, location):
+    """Sort candidate banks in place, nearest first (vectorized over all banks)"""
+    if not candidates:
+        return
+    
+    if not location:
+        # Fewest splits first, then the stock that expires soonest
+        candidates.sort(key=lambda bank: (-bank['available'], bank['batches'][0]['expiry_date']))
+        return
+    
+    origin = to_radians([float(location['latitude']), float(location['longitude'])])
+    distances = EARTH_RADIUS_KM * haversine_radians(
+        origin[0],
+        origin[1],
+        np.array([bank['latitude_rad'] for bank in candidates], dtype=float),
+        np.array([bank['longitude_rad'] for bank in candidates], dtype=float)
+    )
+    # Banks without a location rank last
+    distances = np.where(np.isnan(distances), np.inf, distances)
+    
+    for bank, distance in zip(candidates, distances):
+        bank['distance_km'] = float(distance)
+    candidates[:] = [candidates[idx] for idx in np.argsort(distances, kind='stable')]
+
+def consume_allocation(plan):
+    """
+    Atomically take the planned units out of inventory.
+    
+    Each batch is decremented with a conditional UPDATE, so a batch that was
+    consumed concurrently makes the whole allocation roll back with an
+    AllocationError instead of going negative.
+    """
+    now = timezone.now()
+    batch_ids = []
+    
+    with transaction.atomic():
+        for bank in plan['banks']:
+            for batch in bank['batches']:
+                updated = BloodType.objects.filter(
+                    pk=batch['blood_id'],
+                    status='AVAILABLE',
+                    quantity__gte=batch['quantity']
+                ).update(quantity=F('quantity') - batch['quantity'], updated_at=now)
+                
+                if not updated:
+                    raise AllocationError(f"Batch {batch['batch_number']} no longer has {batch['quantity']} units")
+                batch_ids.append(batch['blood_id'])
+        
+        BloodType.objects.filter(pk__in=batch_ids, quantity=0, status='AVAILABLE').update(
+            status='USED', updated_at=now
+        )
+        _audit_consumed(plan, batch_ids)
+        
+        refresh_stock_summaries([
+            (bank['blood_bank_id'], batch['blood_group'], plan['component_type'])
+            for bank in plan['banks']
+            for batch in bank['batches']
+        ])
+    
+    return batch_ids
+
+def _audit_consumed(plan, batch_ids):
+    # One read of the new values; the conditional UPDATEs pin down the old ones
+    taken = {
+        batch['blood_id']: batch['quantity']
+        for bank in plan['banks']
+        for batch in bank['batches']
+    }
+    for row in BloodType.objects.filter(pk__in=batch_ids).values('id', 'blood_bank_id', 'quantity', 'status'):
+        changes = {'quantity': (row['quantity'] + taken[row['id']], row['quantity'])}
+        if row['status'] == 'USED' and row['quantity'] == 0:
+            changes['status'] = ('AVAILABLE', 'USED')
+        record_change(row['id'], row['blood_bank_id'], 'UPDATED', changes, 'allocation')
+
+def fulfil_request(blood_request, blood_bank, max_attempts=3):
+    """
+    Fulfil a pending request from one bank's stock, FEFO, in one transaction.
+    
+    The request leaves PENDING through a compare-and-set UPDATE, so only one
+    of several racing banks can win it, and batches are consumed with
+    conditional UPDATEs, so racing requests cannot take the same units twice.
+    A plan invalidated by a concurrent fulfilment is re-planned up to
+    max_attempts times. Returns the executed plan.
+    """
+    from notifications.services import notify_request_fulfilled
+    
+    for attempt in range(max_attempts):
+        plan = plan_allocation(
+            blood_request.blood_group,
+            blood_request.component_type,
+            blood_request.quantity_required,
+            blood_bank_ids=[blood_bank.id]
+        )
+        if not plan['fulfillable']:
+            raise InsufficientStock(
+                f'{blood_bank.username} holds fewer than {blood_request.quantity_required} usable units'
+            )
+        
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                claimed = BloodRequest.objects.filter(pk=blood_request.pk, status='PENDING').update(
+                    status='FULFILLED',
+                    fulfilled_by=blood_bank,
+                    fulfilled_quantity=blood_request.quantity_required,
+                    fulfilled_at=now,
+                    updated_at=now
+                )
+                if not claimed:
+                    raise RequestNotPending(f'Request {blood_request.pk} is no longer pending')
+                
+                consume_allocation(plan)
+                
+                blood_request.status = 'FULFILLED'
+                blood_request.fulfilled_by = blood_bank
+                blood_request.fulfilled_quantity = blood_request.quantity_required
+                blood_request.fulfilled_at = now
+                blood_request.updated_at = now
+                notify_request_fulfilled(blood_request)
+        except RequestNotPending:
+            raise
+        except AllocationError:
+            # Another request took some of the planned units, plan again
+            if attempt == max_attempts - 1:
+                raise
+            continue
+        
+        return plan
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Inventory audit trail.
+
+Entries are buffered per transaction and written with one bulk INSERT after it
+commits. Single saves are diffed against the values the instance was loaded
+with (BloodType.from_db); bulk updates record their changes through
+audited_update or record_change.
+"""
+from django.utils import timezone
+from utils.commit_buffer import CommitBuffer
+from .models import BloodType, InventoryAuditLog
+
+# Rows per INSERT when writing the audit log
+AUDIT_BATCH_SIZE = 500
+
+def _write_entries(entries):
+    InventoryAuditLog.objects.bulk_create(entries, batch_size=AUDIT_BATCH_SIZE)
+
+_pending_entries = CommitBuffer(_write_entries)
+
+def record_change(blood_inventory_id, blood_bank_id, action, changes, source):
+    """Queue one audit entry, changes is {field: (old, new)}"""
+    _pending_entries.append(InventoryAuditLog(
+        blood_inventory_id=blood_inventory_id,
+        blood_bank_id=blood_bank_id,
+        action=action,
+        changes={field: list(values) for field, values in changes.items()},
+        source=source
+    ))
+
+def audited_update(queryset, source, **values):
+    """
+    queryset.update(**values) with an audit entry per changed row.
+    
+    values must be plain values, not expressions. Costs one SELECT of the
+    updated fields before the UPDATE. Returns the number of rows updated.
+    """
+    fields = [field for field in values if field in BloodType.AUDITED_FIELDS]
+    rows = list(queryset.values('id', 'blood_bank_id', *fields))
+    updated = BloodType.objects.filter(id__in=[row['id'] for row in rows]).update(
+        **{'updated_at': timezone.now(), **values}
+    )
+    
+    for row in rows:
+        changes = {
+            field: (row[field], values[field])
+            for field in fields
+            if row[field] != values[field]
+        }
+        if changes:
+            record_change(row['id'], row['blood_bank_id'], 'UPDATED', changes, source)
+    return updated
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Expiry sweeper: moves expired AVAILABLE stock to EXPIRED
+"""
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from notifications.alerts import check_expiry_windows
+from notifications.services import notify
+from .audit import record_change
+from .models import BloodType, ExpirySweepRun
+from .services import refresh_stock_summaries
+
+def _expired_batch(today, batch_size):
+    # SKIP LOCKED lets concurrent sweepers take disjoint batches (ignored on SQLite,
+    # where IMMEDIATE transactions serialize the sweepers instead)
+    return list(
+        BloodType.objects.select_for_update(skip_locked=True).filter(
+            status='AVAILABLE',
+            expiry_date__lte=today
+        ).order_by('expiry_date', 'id').values(
+            'id', 'blood_bank_id', 'blood_group', 'component_type', 'quantity'
+        )[:batch_size]
+    )
+
+def _notify_bank(blood_bank_id, expired):
+    rows = sum(entry['rows'] for entry in expired.values())
+    units = sum(entry['units'] for entry in expired.values())
+    breakdown = ', '.join(
+        f"{entry['units']} units of {blood_group} {component_type}"
+        for (blood_group, component_type), entry in sorted(expired.items())
+    )
+    notify(
+        blood_bank_id,
+        notification_type='EXPIRY_ALERT',
+        title=f'{rows} Blood Batches Expired',
+        message=f'{units} units were marked as expired: {breakdown}.'
+    )
+
+def sweep_expired(batch_size=500, today=None):
+    """
+    Mark every AVAILABLE batch expiring on or before today as EXPIRED.
+    
+    Works in transactions of at most batch_size rows, refreshing the stock
+    summaries each batch touches, then sends every affected bank one summary
+    notification. Safe to run concurrently. Returns the ExpirySweepRun.
+    """
+    today = today or timezone.localdate()
+    started = time.monotonic()
+    run = ExpirySweepRun.objects.create(started_at=timezone.now(), swept_through=today)
+    
+    # {blood_bank_id: {(blood_group, component_type): {'rows': n, 'units': n}}}
+    expired = defaultdict(lambda: defaultdict(lambda: {'rows': 0, 'units': 0}))
+    
+    while True:
+        with transaction.atomic():
+            batch = _expired_batch(today, batch_size)
+            if not batch:
+                break
+            
+            # Conditional on status so rows changed since the read are left alone
+            BloodType.objects.filter(
+                id__in=[row['id'] for row in batch],
+                status='AVAILABLE'
+            ).update(status='EXPIRED', updated_at=timezone.now())
+            for row in batch:
+                record_change(row['id'], row['blood_bank_id'], 'UPDATED',
+                              {'status': ('AVAILABLE', 'EXPIRED')}, 'expiry_sweep')
+            
+            refresh_stock_summaries({
+                (row['blood_bank_id'], row['blood_group'], row['component_type']) for row in batch
+            })
+        
+        run.batches += 1
+        for row in batch:
+            entry = expired[row['blood_bank_id']][(row['blood_group'], row['component_type'])]
+            entry['rows'] += 1
+            entry['units'] += row['quantity']
+            run.rows_expired += 1
+            run.units_expired += row['quantity']
+    
+    for blood_bank_id, bank_expired in expired.items():
+        _notify_bank(blood_bank_id, bank_expired)
+    
+    check_expiry_windows(today)
+    
+    run.banks_notified = len(expired)
+    run.finished_at = timezone.now()
+    run.duration_ms = int((time.monotonic() - started) * 1000)
+    run.save()
+    return run
\ No newline at end of file
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from inventory.services import rebuild_stock_summaries
+
+class Command(BaseCommand):
+    help = 'Reconcile the StockSummary table with current blood inventory'
+    
+    def handle(self, *args, **options):
+        updated, created = rebuild_stock_summaries()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stock summary rebuilt: {updated} rows updated, {created} rows created'
+        ))
\ No newline at end of file
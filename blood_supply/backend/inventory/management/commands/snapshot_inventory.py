@@ -0,0 +1,15 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from inventory.snapshots import snapshot_inventory
+
+class Command(BaseCommand):
+    help = "Record today's stock levels per blood bank, blood group and component"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help='Day to record (YYYY-MM-DD), defaults to today')
+    
+    def handle(self, *args, **options):
+        rows = snapshot_inventory(options['date'])
+        self.stdout.write(self.style.SUCCESS(f'Inventory snapshot written: {rows} rows'))
\ No newline at end of file
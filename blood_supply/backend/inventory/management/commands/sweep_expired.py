@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from inventory.expiry import sweep_expired
+
+class Command(BaseCommand):
+    help = 'Mark expired blood inventory as EXPIRED and notify the affected blood banks'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows updated per transaction')
+    
+    def handle(self, *args, **options):
+        run = sweep_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Expired {run.rows_expired} batches ({run.units_expired} units) in {run.batches} '
+            f'transactions, notified {run.banks_notified} blood banks in {run.duration_ms} ms'
+        ))
\ No newline at end of file
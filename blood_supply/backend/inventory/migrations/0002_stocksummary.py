@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+
+def backfill_stock_summary(apps, schema_editor):
+    BloodType = apps.get_model('inventory', 'BloodType')
+    StockSummary = apps.get_model('inventory', 'StockSummary')
+
+    rows = BloodType.objects.filter(
+        status='AVAILABLE',
+        quantity__gt=0,
+        expiry_date__gt=timezone.now().date()
+    ).values('blood_bank_id', 'blood_group', 'component_type').annotate(
+        units=Sum('quantity'), earliest=Min('expiry_date')
+    ).order_by()
+
+    StockSummary.objects.bulk_create([
+        StockSummary(
+            blood_bank_id=row['blood_bank_id'],
+            blood_group=row['blood_group'],
+            component_type=row['component_type'],
+            available_units=row['units'],
+            earliest_expiry=row['earliest'],
+            version=1
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('O+', 'O+'), ('O-', 'O-'), ('AB+', 'AB+'), ('AB-', 'AB-')], max_length=5)),
+                ('component_type', models.CharField(choices=[('WHOLE_BLOOD', 'Whole Blood'), ('RBC', 'Red Blood Cells'), ('PLASMA', 'Plasma'), ('PLATELETS', 'Platelets'), ('CRYOPRECIPITATE', 'Cryoprecipitate')], max_length=20)),
+                ('available_units', models.IntegerField(default=0)),
+                ('earliest_expiry', models.DateField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('blood_bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stock Summary',
+                'verbose_name_plural': 'Stock Summaries',
+                'indexes': [models.Index(fields=['blood_group', 'component_type', 'available_units'], name='inventory_s_blood_g_808845_idx')],
+                'constraints': [models.UniqueConstraint(fields=('blood_bank', 'blood_group', 'component_type'), name='unique_stock_summary')],
+            },
+        ),
+        migrations.RunPython(backfill_stock_summary, migrations.RunPython.noop),
+    ]
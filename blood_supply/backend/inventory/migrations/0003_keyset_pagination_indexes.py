@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_stocksummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['hospital', '-created_at', 'id'], name='inventory_b_hospita_5ef751_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodtype',
+            index=models.Index(fields=['blood_bank', 'expiry_date', 'id'], name='inventory_b_blood_b_a19235_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodtype',
+            index=models.Index(fields=['blood_bank', 'status', 'expiry_date'], name='inventory_b_blood_b_b45f45_idx'),
+        ),
+    ]
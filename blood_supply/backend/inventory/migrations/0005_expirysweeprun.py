@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_expiry_window_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirySweepRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('swept_through', models.DateField(help_text='Units expiring on or before this date were swept')),
+                ('batches', models.IntegerField(default=0)),
+                ('rows_expired', models.IntegerField(default=0)),
+                ('units_expired', models.IntegerField(default=0)),
+                ('banks_notified', models.IntegerField(default=0)),
+                ('duration_ms', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bloodtype',
+            index=models.Index(fields=['status', 'expiry_date'], name='inventory_b_status_e2ea88_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:15
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_expirysweeprun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryAuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('CREATED', 'Created'), ('UPDATED', 'Updated'), ('DELETED', 'Deleted')], max_length=20)),
+                ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='{field: [old, new]}')),
+                ('source', models.CharField(help_text='Code path that made the change', max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('blood_bank', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('blood_inventory', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='audit_log', to='inventory.bloodtype')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['blood_inventory', 'created_at'], name='inventory_i_blood_i_f8f65c_idx'), models.Index(fields=['blood_bank', 'created_at'], name='inventory_i_blood_b_9567d2_idx')],
+            },
+        ),
+    ]
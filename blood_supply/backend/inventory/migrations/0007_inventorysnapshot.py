@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_inventoryauditlog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('O+', 'O+'), ('O-', 'O-'), ('AB+', 'AB+'), ('AB-', 'AB-')], max_length=5)),
+                ('component_type', models.CharField(choices=[('WHOLE_BLOOD', 'Whole Blood'), ('RBC', 'Red Blood Cells'), ('PLASMA', 'Plasma'), ('PLATELETS', 'Platelets'), ('CRYOPRECIPITATE', 'Cryoprecipitate')], max_length=20)),
+                ('date', models.DateField()),
+                ('available_units', models.IntegerField(default=0)),
+                ('expiring_units', models.IntegerField(default=0, help_text='Available units expiring within the warning window')),
+                ('wasted_units', models.IntegerField(default=0, help_text='Units that expired unused on this day')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('blood_bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date', 'blood_group', 'component_type'],
+                'indexes': [models.Index(fields=['blood_bank', 'date', 'blood_group', 'component_type', 'available_units', 'expiring_units', 'wasted_units'], name='inventory_snapshot_history')],
+                'constraints': [models.UniqueConstraint(fields=('blood_bank', 'date', 'blood_group', 'component_type'), name='unique_inventory_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_inventorysnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['updated_at'], name='inventory_b_updated_55a82a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodtype',
+            index=models.Index(fields=['blood_bank', 'updated_at'], name='inventory_b_blood_b_2cfbdc_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 
 
 # Create your models here.
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from accounts.models import User
 
@@ -63,10 +64,50 @@ class BloodType(models.Model):
         verbose_name = "Blood Inventory"
         verbose_name_plural = "Blood Inventory"
         ordering = ['expiry_date', 'blood_group']
+        indexes = [
+            # Keyset pagination of a bank's inventory
+            models.Index(fields=['blood_bank', 'expiry_date', 'id']),
+            # Expiry alert window of a bank's usable stock
+            models.Index(fields=['blood_bank', 'status', 'expiry_date']),
+            # Expiry sweeper
+            models.Index(fields=['status', 'expiry_date']),
+            # Version of a bank's inventory (utils.versioning)
+            models.Index(fields=['blood_bank', 'updated_at']),
+        ]
+    
+    # Fields whose changes are written to the InventoryAuditLog
+    AUDITED_FIELDS = (
+        'blood_group', 'component_type', 'quantity', 'unit_volume', 'blood_bank_id', 'donor_id',
+        'collection_date', 'expiry_date', 'storage_temperature', 'status', 'batch_number',
+        'is_tested', 'test_date', 'storage_location',
+    )
     
     def __str__(self):
         return f"{self.blood_group} - {self.component_type} - {self.quantity} units"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Snapshot of the loaded values, diffed on save without another query
+        instance._loaded_values = instance.audited_values()
+        return instance
+    
+    def audited_values(self):
+        # Deferred fields are left out
+        return {field: self.__dict__[field] for field in self.AUDITED_FIELDS if field in self.__dict__}
+    
+    def changed_fields(self):
+        """{field: (old, new)} since the instance was loaded or last saved, None without a snapshot"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        current = self.audited_values()
+        return {
+            field: (old, current[field])
+            for field, old in loaded.items()
+            if field in current and current[field] != old
+        }
+    
     def is_expiring_soon(self):
         from datetime import date, timedelta
         return self.expiry_date <= date.today() + timedelta(days=7)
@@ -118,6 +159,124 @@ class BloodRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a hospital's requests
+            models.Index(fields=['hospital', '-created_at', 'id']),
+            # Version of the request list (utils.versioning)
+            models.Index(fields=['updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"Request #{self.id} - {self.hospital.username} - {self.blood_group}"
+
+class StockSummary(models.Model):
+    """Available units per (blood bank, blood group, component), maintained by inventory.services"""
+    blood_bank = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_summaries')
+    blood_group = models.CharField(max_length=5, choices=BloodType.BLOOD_GROUP_CHOICES)
+    component_type = models.CharField(max_length=20, choices=BloodType.BLOOD_COMPONENT_CHOICES)
+    available_units = models.IntegerField(default=0)
+    earliest_expiry = models.DateField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Stock Summary"
+        verbose_name_plural = "Stock Summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['blood_bank', 'blood_group', 'component_type'],
+                name='unique_stock_summary'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['blood_group', 'component_type', 'available_units']),
+        ]
+    
+    def __str__(self):
+        return f"{self.blood_bank.username} - {self.blood_group} {self.component_type}: {self.available_units} units"
+
+class ExpirySweepRun(models.Model):
+    """Metrics of one sweep_expired run"""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    swept_through = models.DateField(help_text="Units expiring on or before this date were swept")
+    
+    batches = models.IntegerField(default=0)
+    rows_expired = models.IntegerField(default=0)
+    units_expired = models.IntegerField(default=0)
+    banks_notified = models.IntegerField(default=0)
+    duration_ms = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Expiry sweep {self.started_at:%Y-%m-%d %H:%M} - {self.rows_expired} rows"
+
+class InventoryAuditLog(models.Model):
+    """Append-only record of changes to blood inventory"""
+    ACTION_CHOICES = (
+        ('CREATED', 'Created'),
+        ('UPDATED', 'Updated'),
+        ('DELETED', 'Deleted'),
+    )
+    
+    # No database constraints, entries outlive the rows they describe
+    blood_inventory = models.ForeignKey(BloodType, on_delete=models.DO_NOTHING, db_constraint=False, related_name='audit_log')
+    blood_bank = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder, help_text="{field: [old, new]}")
+    source = models.CharField(max_length=50, help_text="Code path that made the change")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['blood_inventory', 'created_at']),
+            models.Index(fields=['blood_bank', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.action} blood inventory {self.blood_inventory_id} ({self.source})"
+    
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("Audit log entries cannot be changed")
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError("Audit log entries cannot be deleted")
+
+class InventorySnapshot(models.Model):
+    """Daily stock levels of one bank, blood group and component, written by snapshot_inventory"""
+    blood_bank = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    blood_group = models.CharField(max_length=5, choices=BloodType.BLOOD_GROUP_CHOICES)
+    component_type = models.CharField(max_length=20, choices=BloodType.BLOOD_COMPONENT_CHOICES)
+    date = models.DateField()
+    
+    available_units = models.IntegerField(default=0)
+    expiring_units = models.IntegerField(default=0, help_text="Available units expiring within the warning window")
+    wasted_units = models.IntegerField(default=0, help_text="Units that expired unused on this day")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['date', 'blood_group', 'component_type']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['blood_bank', 'date', 'blood_group', 'component_type'],
+                name='unique_inventory_snapshot'
+            )
+        ]
+        indexes = [
+            # Covering index: stock history range scans never touch the table
+            models.Index(
+                fields=['blood_bank', 'date', 'blood_group', 'component_type',
+                        'available_units', 'expiring_units', 'wasted_units'],
+                name='inventory_snapshot_history'
+            ),
+        ]
     
     def __str__(self):
-        return f"Request #{self.id} - {self.hospital.username} - {self.blood_group}"
\ No newline at end of file
+        return f"{self.blood_bank.username} {self.date} - {self.blood_group} {self.component_type}: {self.available_units} units"
\ No newline at end of file
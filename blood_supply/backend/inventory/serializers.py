@@ -1,12 +1,13 @@
 from rest_framework import serializers
 from .models import BloodType, BloodRequest
-from accounts.serializers import UserProfileSerializer
+from accounts.serializers import UserReferenceField
+from utils.fieldsets import SparseFieldsetsMixin
 from datetime import datetime, timedelta
 import uuid
 
-class BloodTypeSerializer(serializers.ModelSerializer):
-    blood_bank_details = UserProfileSerializer(source='blood_bank', read_only=True)
-    donor_details = UserProfileSerializer(source='donor', read_only=True)
+class BloodTypeSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    blood_bank_details = UserReferenceField(source='blood_bank')
+    donor_details = UserReferenceField(source='donor')
     is_expiring_soon = serializers.BooleanField(read_only=True)
     days_until_expiry = serializers.IntegerField(read_only=True)
     
@@ -28,6 +29,10 @@ class BloodTypeSerializer(serializers.ModelSerializer):
             'test_results': {'required': False, 'allow_null': True},
             'donor': {'required': False, 'allow_null': True},
         }
+        field_dependencies = {
+            'is_expiring_soon': ['expiry_date'],
+            'days_until_expiry': ['expiry_date'],
+        }
     
     def create(self, validated_data):
         # Auto-generate batch number if not provided
@@ -49,9 +54,9 @@ class BloodTypeSerializer(serializers.ModelSerializer):
         print(f"DEBUG: Creating BloodType with data: {validated_data}")
         return super().create(validated_data)
 
-class BloodRequestSerializer(serializers.ModelSerializer):
-    hospital_details = UserProfileSerializer(source='hospital', read_only=True)
-    fulfilled_by_details = UserProfileSerializer(source='fulfilled_by', read_only=True)
+class BloodRequestSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    hospital_details = UserReferenceField(source='hospital')
+    fulfilled_by_details = UserReferenceField(source='fulfilled_by')
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     urgency_display = serializers.CharField(source='get_urgency_display', read_only=True)
     
@@ -70,4 +75,34 @@ class BloodRequestCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data['hospital'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class BatchSearchItemSerializer(serializers.Serializer):
+    blood_group = serializers.ChoiceField(choices=BloodType.BLOOD_GROUP_CHOICES)
+    component_type = serializers.ChoiceField(choices=BloodType.BLOOD_COMPONENT_CHOICES)
+    quantity = serializers.IntegerField(default=1, min_value=1)
+    location = serializers.JSONField(required=False)
+    radius_km = serializers.FloatField(required=False, allow_null=True, min_value=0, max_value=20000)
+    
+    def validate_location(self, value):
+        if not isinstance(value, dict) or value.get('latitude') is None or value.get('longitude') is None:
+            raise serializers.ValidationError('Location must include latitude and longitude.')
+        try:
+            latitude, longitude = float(value['latitude']), float(value['longitude'])
+        except (TypeError, ValueError):
+            raise serializers.ValidationError('Latitude and longitude must be numbers.')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise serializers.ValidationError('Latitude must be within -90..90 and longitude within -180..180.')
+        return {'latitude': latitude, 'longitude': longitude}
+
+class BloodSearchSerializer(BatchSearchItemSerializer):
+    # Searches run from the requesting user's location
+    location = None
+    limit = serializers.IntegerField(default=5, min_value=1, max_value=50)
+    compatible = serializers.BooleanField(default=True)
+    plan = serializers.BooleanField(default=False)
+
+class BatchSearchSerializer(serializers.Serializer):
+    items = BatchSearchItemSerializer(many=True, allow_empty=False, max_length=100)
+    limit = serializers.IntegerField(default=5, min_value=1, max_value=50)
+    compatible = serializers.BooleanField(default=True)
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+Inventory services
+"""
+from django.core.cache import cache
+from django.db import transaction, IntegrityError
+from django.db.models import Sum, Min, F
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import BloodType, StockSummary
+
+# Sent after a StockSummary row is recomputed, with blood_bank_id, blood_group,
+# component_type, available_units, earliest_expiry and changed
+stock_summary_refreshed = Signal()
+
+# Sent after rebuild_stock_summaries, with keys: the (blood_bank_id, blood_group,
+# component_type) rows whose totals changed
+stock_summaries_rebuilt = Signal()
+
+def available_stock(**filters):
+    """Batches that count towards available stock"""
+    return BloodType.objects.filter(
+        status='AVAILABLE',
+        quantity__gt=0,
+        expiry_date__gt=timezone.now().date(),
+        **filters
+    )
+
+def refresh_stock_summary(blood_bank_id, blood_group, component_type):
+    """Recompute one StockSummary row from its BloodType batches"""
+    key = {
+        'blood_bank_id': blood_bank_id,
+        'blood_group': blood_group,
+        'component_type': component_type,
+    }
+    
+    with transaction.atomic():
+        # Lock the summary row first so concurrent refreshes of one key serialize
+        current = StockSummary.objects.select_for_update().filter(**key).values(
+            'available_units', 'earliest_expiry'
+        ).first()
+        totals = available_stock(**key).aggregate(units=Sum('quantity'), earliest=Min('expiry_date'))
+        changed = (current or {'available_units': 0, 'earliest_expiry': None}) != {
+            'available_units': totals['units'] or 0,
+            'earliest_expiry': totals['earliest'],
+        }
+        
+        created = False
+        if current is None and totals['units']:
+            try:
+                with transaction.atomic():
+                    StockSummary.objects.create(
+                        available_units=totals['units'],
+                        earliest_expiry=totals['earliest'],
+                        version=1,
+                        **key
+                    )
+                created = True
+            except IntegrityError:
+                pass  # Created concurrently, fall through to update
+        
+        if not created:
+            StockSummary.objects.filter(**key).update(
+                available_units=totals['units'] or 0,
+                earliest_expiry=totals['earliest'],
+                version=F('version') + 1,
+                updated_at=timezone.now()
+            )
+        
+        stock_summary_refreshed.send(
+            sender=StockSummary,
+            available_units=totals['units'] or 0,
+            earliest_expiry=totals['earliest'],
+            changed=changed,
+            **key
+        )
+
+def refresh_stock_summaries(keys):
+    """Refresh several (blood_bank_id, blood_group, component_type) keys"""
+    for key in set(keys):
+        refresh_stock_summary(*key)
+
+def refresh_expired_summaries(today=None):
+    """Refresh the summaries still counting batches that expired by today; returns how many"""
+    today = today or timezone.now().date()
+    keys = set(StockSummary.objects.filter(
+        available_units__gt=0,
+        earliest_expiry__lte=today
+    ).values_list('blood_bank_id', 'blood_group', 'component_type'))
+    refresh_stock_summaries(keys)
+    return len(keys)
+
+def roll_over_stock_summaries():
+    """
+    Drop batches that expired since the last rollover from the summaries.
+    
+    Summaries only change when their batches do, so stock expiring overnight
+    stays counted until the expiry sweep runs. Readers call this first; it
+    refreshes the affected rows once per day (per cache) and is a single
+    cache read afterwards.
+    """
+    today = timezone.now().date()
+    key = f'stock-summary:rolled-over:{today.isoformat()}'
+    if cache.get(key):
+        return
+    
+    refresh_expired_summaries(today)
+    cache.set(key, True, timeout=24 * 60 * 60)
+
+def rebuild_stock_summaries():
+    """Reconcile the whole StockSummary table with BloodType; returns (updated, created)"""
+    totals = {
+        (row['blood_bank_id'], row['blood_group'], row['component_type']): (row['units'], row['earliest'])
+        for row in available_stock().values(
+            'blood_bank_id', 'blood_group', 'component_type'
+        ).annotate(units=Sum('quantity'), earliest=Min('expiry_date')).order_by()
+    }
+    
+    updated = 0
+    now = timezone.now()
+    
+    with transaction.atomic():
+        existing = StockSummary.objects.select_for_update().only(
+            'id', 'blood_bank_id', 'blood_group', 'component_type',
+            'available_units', 'earliest_expiry', 'version'
+        )
+        
+        stale = []
+        for summary in existing:
+            key = (summary.blood_bank_id, summary.blood_group, summary.component_type)
+            units, earliest = totals.pop(key, (0, None))
+            
+            if summary.available_units != units or summary.earliest_expiry != earliest:
+                summary.available_units = units
+                summary.earliest_expiry = earliest
+                summary.version += 1
+                summary.updated_at = now
+                stale.append(summary)
+        
+        StockSummary.objects.bulk_update(
+            stale, ['available_units', 'earliest_expiry', 'version', 'updated_at'], batch_size=500
+        )
+        updated = len(stale)
+        changed_keys = [
+            (summary.blood_bank_id, summary.blood_group, summary.component_type)
+            for summary in stale
+        ] + list(totals)
+        
+        StockSummary.objects.bulk_create([
+            StockSummary(
+                blood_bank_id=blood_bank_id,
+                blood_group=blood_group,
+                component_type=component_type,
+                available_units=units,
+                earliest_expiry=earliest,
+                version=1
+            )
+            for (blood_bank_id, blood_group, component_type), (units, earliest) in totals.items()
+        ], batch_size=500)
+    
+    stock_summaries_rebuilt.send(sender=StockSummary, keys=changed_keys)
+    return updated, len(totals)
\ No newline at end of file
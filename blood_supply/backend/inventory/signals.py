@@ -1,21 +1,61 @@
 """
 Signals for inventory app
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from .models import BloodType, BloodRequest
+from .audit import record_change
+from .models import BloodType
+from .services import refresh_stock_summaries
 
-# Example: Update stock levels when blood is added
+def _stock_key(instance):
+    return (instance.blood_bank_id, instance.blood_group, instance.component_type)
+
+# Keep the per-bank stock summary in step with inventory writes
 @receiver(post_save, sender=BloodType)
-def update_stock_on_blood_add(sender, instance, created, **kwargs):
-    if created:
-        # Update stock logic here
-        pass
+def update_stock_on_blood_change(sender, instance, created, **kwargs):
+    keys = [_stock_key(instance)]
+    previous_key = getattr(instance, '_previous_stock_key', None)
+    if previous_key:
+        keys.append(previous_key)
+    refresh_stock_summaries(keys)
 
-# Example: Log inventory changes
+@receiver(post_delete, sender=BloodType)
+def update_stock_on_blood_delete(sender, instance, origin=None, **kwargs):
+    # Cascades from a deleted blood bank remove its summary rows as well
+    if origin is not None and getattr(origin, 'model', type(origin)) is not BloodType:
+        return
+    refresh_stock_summaries([_stock_key(instance)])
+
+# Diff against the values the instance was loaded with, no query needed
 @receiver(pre_save, sender=BloodType)
 def log_blood_changes(sender, instance, **kwargs):
-    if instance.pk:  # Only for updates, not creations
-        old_instance = BloodType.objects.get(pk=instance.pk)
-        # Compare and log changes
-        pass
\ No newline at end of file
+    if not instance.pk or instance._state.adding:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        # Built by hand rather than loaded, fall back to reading the stored row
+        loaded = BloodType.objects.filter(pk=instance.pk).values(*BloodType.AUDITED_FIELDS).first()
+        instance._loaded_values = loaded
+    if loaded:
+        # Remember the old stock key so a moved batch also refreshes its old summary row
+        instance._previous_stock_key = (
+            loaded.get('blood_bank_id', instance.blood_bank_id),
+            loaded.get('blood_group', instance.blood_group),
+            loaded.get('component_type', instance.component_type),
+        )
+
+@receiver(post_save, sender=BloodType)
+def audit_blood_save(sender, instance, created, **kwargs):
+    if created:
+        changes = {field: (None, value) for field, value in instance.audited_values().items()}
+    else:
+        changes = instance.changed_fields() or {}
+    if changes:
+        record_change(instance.pk, instance.blood_bank_id, 'CREATED' if created else 'UPDATED', changes, 'save')
+    # Later saves of this instance are diffed against what was just written
+    instance._loaded_values = instance.audited_values()
+    instance._previous_stock_key = None
+
+@receiver(post_delete, sender=BloodType)
+def audit_blood_delete(sender, instance, **kwargs):
+    record_change(instance.pk, instance.blood_bank_id, 'DELETED', {}, 'delete')
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""
+Daily inventory snapshots for stock history charts
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+from utils.constants import EXPIRY_WARNING_DAYS
+from .models import BloodType, InventorySnapshot
+
+def snapshot_inventory(day=None):
+    """
+    Write one InventorySnapshot row per (bank, group, component) for day,
+    replacing any rows already taken that day.
+    
+    Runs as one grouped INSERT ... SELECT over BloodType. Stock levels are read
+    as they are now, so take the snapshot on the day it describes. Returns the
+    number of rows written.
+    """
+    day = day or timezone.localdate()
+    qn = connection.ops.quote_name
+    snapshot_table = qn(InventorySnapshot._meta.db_table)
+    
+    # Same rules as available_stock and the expiry sweeper: a batch expires on its expiry date
+    sql = f"""
+        INSERT INTO {snapshot_table}
+            ({qn('blood_bank_id')}, {qn('blood_group')}, {qn('component_type')}, {qn('date')},
+             {qn('available_units')}, {qn('expiring_units')}, {qn('wasted_units')}, {qn('created_at')})
+        SELECT
+            {qn('blood_bank_id')}, {qn('blood_group')}, {qn('component_type')}, %s,
+            SUM(CASE WHEN {qn('status')} = 'AVAILABLE' AND {qn('expiry_date')} > %s
+                     THEN {qn('quantity')} ELSE 0 END),
+            SUM(CASE WHEN {qn('status')} = 'AVAILABLE' AND {qn('expiry_date')} > %s
+                          AND {qn('expiry_date')} <= %s
+                     THEN {qn('quantity')} ELSE 0 END),
+            SUM(CASE WHEN {qn('expiry_date')} = %s THEN {qn('quantity')} ELSE 0 END),
+            %s
+        FROM {qn(BloodType._meta.db_table)}
+        WHERE {qn('quantity')} > 0
+          AND (({qn('status')} = 'AVAILABLE' AND {qn('expiry_date')} >= %s)
+               OR ({qn('status')} = 'EXPIRED' AND {qn('expiry_date')} = %s))
+        GROUP BY {qn('blood_bank_id')}, {qn('blood_group')}, {qn('component_type')}
+    """
+    params = [
+        day,
+        day,
+        day, day + timedelta(days=EXPIRY_WARNING_DAYS),
+        day,
+        timezone.now(),
+        day, day,
+    ]
+    
+    with transaction.atomic():
+        InventorySnapshot.objects.filter(date=day).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Background tasks for inventory, run by the taskqueue workers
+"""
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from ai_engine.search_cache import search_blood_banks
+from notifications.services import fan_out
+from taskqueue.queue import task
+from .models import BloodRequest
+
+User = get_user_model()
+
+@task
+def notify_blood_banks_of_request(request_id):
+    """Notify verified blood banks in the hospital's city about a new request"""
+    request_obj = BloodRequest.objects.select_related('hospital').filter(id=request_id).first()
+    if request_obj is None:
+        return
+    
+    blood_banks = User.objects.filter(
+        user_type='BLOOD_BANK',
+        city=request_obj.hospital.city,
+        is_verified=True
+    )
+    
+    fan_out(
+        blood_banks,
+        notification_type='EMERGENCY_REQUEST',
+        title=f'New Blood Request - {request_obj.blood_group}',
+        message=f'Hospital {request_obj.hospital.hospital_name} needs {request_obj.quantity_required} units of {request_obj.blood_group} {request_obj.component_type}',
+        blood_request=request_obj
+    )
+
+@task
+def suggest_blood_banks_for_request(request_id):
+    """Fill BloodRequest.suggested_blood_banks"""
+    request_obj = BloodRequest.objects.select_related('hospital').filter(id=request_id).first()
+    if request_obj is None:
+        return
+    
+    suggestions = search_blood_banks(
+        request_location={
+            'latitude': request_obj.hospital.latitude or 0,
+            'longitude': request_obj.hospital.longitude or 0
+        },
+        blood_group=request_obj.blood_group,
+        component_type=request_obj.component_type,
+        quantity=request_obj.quantity_required,
+        # Let errors reach the task runner so the task is retried
+        fail_silently=False
+    )
+    
+    # update() rather than save() so request status signals do not fire again
+    BloodRequest.objects.filter(id=request_id).update(
+        suggested_blood_banks=suggestions, updated_at=timezone.now()
+    )
\ No newline at end of file
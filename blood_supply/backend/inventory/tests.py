@@ -1,3 +1,355 @@
-from django.test import TestCase
+import threading
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from notifications.models import Notification
+from .audit import record_change
+from .expiry import sweep_expired
+from .allocation import fulfil_request, AllocationError, InsufficientStock, RequestNotPending
+from .models import BloodType, BloodRequest, InventoryAuditLog, StockSummary
+from .services import roll_over_stock_summaries
+
+def run_concurrently(func, args_list):
+    """Run func(*args) for every args in its own thread, all released at once"""
+    barrier = threading.Barrier(len(args_list))
+    outcomes = [None] * len(args_list)
+    
+    def worker(index, args):
+        try:
+            barrier.wait()
+            func(*args)
+            outcomes[index] = 'ok'
+        except Exception as e:
+            outcomes[index] = e
+        finally:
+            connection.close()
+    
+    threads = [threading.Thread(target=worker, args=(index, args)) for index, args in enumerate(args_list)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+class ConcurrentFulfilmentTest(TransactionTestCase):
+    def make_user(self, username, user_type, **fields):
+        return User.objects.create(
+            username=username,
+            phone=f'9{User.objects.count():09d}',
+            user_type=user_type,
+            city='Pune',
+            **fields
+        )
+    
+    def add_batch(self, blood_bank, quantity, days, batch_number):
+        return BloodType.objects.create(
+            blood_bank=blood_bank,
+            blood_group='O+',
+            component_type='RBC',
+            quantity=quantity,
+            collection_date=date.today(),
+            expiry_date=date.today() + timedelta(days=days),
+            storage_temperature=4,
+            batch_number=batch_number
+        )
+    
+    def make_request(self, hospital, quantity):
+        return BloodRequest.objects.create(
+            hospital=hospital,
+            blood_group='O+',
+            component_type='RBC',
+            quantity_required=quantity,
+            urgency='HIGH',
+            required_by=timezone.now() + timedelta(days=1)
+        )
+    
+    def setUp(self):
+        self.hospital = self.make_user('hospital', 'HOSPITAL', hospital_name='City Hospital')
+        self.bank = self.make_user('bank', 'BLOOD_BANK', blood_bank_name='Central Bank')
+    
+    def test_racing_requests_never_double_allocate(self):
+        for index, days in enumerate([5, 10, 20]):
+            self.add_batch(self.bank, 20, days, f'B{index}')
+        requests = [self.make_request(self.hospital, 2) for _ in range(50)]
+        
+        outcomes = run_concurrently(fulfil_request, [(request, self.bank) for request in requests])
+        
+        fulfilled = outcomes.count('ok')
+        self.assertTrue(all(o == 'ok' or isinstance(o, AllocationError) for o in outcomes), outcomes)
+        self.assertEqual(fulfilled, 30)
+        self.assertEqual(BloodRequest.objects.filter(status='FULFILLED').count(), fulfilled)
+        self.assertEqual(BloodType.objects.filter(quantity__lt=0).count(), 0)
+        self.assertEqual(BloodType.objects.aggregate(total=Sum('quantity'))['total'], 60 - 2 * fulfilled)
+        self.assertEqual(BloodType.objects.filter(status='USED').count(), 3)
+        self.assertEqual(StockSummary.objects.get(blood_bank=self.bank).available_units, 0)
+    
+    def test_racing_banks_fulfil_a_request_once(self):
+        banks = [self.bank] + [
+            self.make_user(f'bank{index}', 'BLOOD_BANK', blood_bank_name=f'Bank {index}')
+            for index in range(9)
+        ]
+        for index, bank in enumerate(banks):
+            self.add_batch(bank, 5, 10, f'B{index}')
+        request = self.make_request(self.hospital, 3)
+        
+        outcomes = run_concurrently(
+            fulfil_request,
+            [(BloodRequest.objects.get(pk=request.pk), bank) for bank in banks]
+        )
+        
+        self.assertEqual(outcomes.count('ok'), 1)
+        self.assertTrue(all(o == 'ok' or isinstance(o, RequestNotPending) for o in outcomes), outcomes)
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'FULFILLED')
+        self.assertEqual(BloodType.objects.aggregate(total=Sum('quantity'))['total'], 5 * len(banks) - 3)
+        self.assertEqual(BloodType.objects.get(blood_bank=request.fulfilled_by).quantity, 2)
+    
+    def test_insufficient_stock_leaves_request_pending(self):
+        self.add_batch(self.bank, 1, 10, 'B0')
+        request = self.make_request(self.hospital, 2)
+        
+        with self.assertRaises(InsufficientStock):
+            fulfil_request(request, self.bank)
+        
+        request.refresh_from_db()
+        self.assertEqual(request.status, 'PENDING')
+
+class StockSummaryRolloverTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bank = User.objects.create(
+            username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune'
+        )
+        for index, days in enumerate([1, 10]):
+            BloodType.objects.create(
+                blood_bank=self.bank,
+                blood_group='O+',
+                component_type='RBC',
+                quantity=4,
+                collection_date=date.today(),
+                expiry_date=date.today() + timedelta(days=days),
+                storage_temperature=4,
+                batch_number=f'B{index}'
+            )
+    
+    def test_rollover_drops_batches_expired_since_the_last_refresh(self):
+        # Summary as refreshed yesterday, when the first batch still had a day left
+        today = timezone.now().date()
+        BloodType.objects.filter(batch_number='B0').update(expiry_date=today)
+        StockSummary.objects.filter(blood_bank=self.bank).update(earliest_expiry=today)
+        self.assertEqual(StockSummary.objects.get(blood_bank=self.bank).available_units, 8)
+        
+        roll_over_stock_summaries()
+        
+        summary = StockSummary.objects.get(blood_bank=self.bank)
+        self.assertEqual(summary.available_units, 4)
+        self.assertEqual(summary.earliest_expiry, date.today() + timedelta(days=10))
+
+
+class AuditBufferTest(TestCase):
+    def record(self, source):
+        # Audit rows carry no constraints, any ids will do
+        record_change(1, 1, 'UPDATED', {'quantity': (2, 1)}, source)
+    
+    def test_rolled_back_savepoint_drops_only_its_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.record('outer')
+                try:
+                    with transaction.atomic():
+                        self.record('inner')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                self.record('after')
+                with transaction.atomic():
+                    self.record('released')
+        
+        self.assertEqual(
+            sorted(InventoryAuditLog.objects.values_list('source', flat=True)),
+            ['after', 'outer', 'released']
+        )
+    
+    def test_rolled_back_transaction_leaves_nothing_for_the_next(self):
+        try:
+            with transaction.atomic():
+                self.record('discarded')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.record('kept')
+        
+        self.assertEqual(list(InventoryAuditLog.objects.values_list('source', flat=True)), ['kept'])
+
+
+class ExpirySweepTest(TestCase):
+    def setUp(self):
+        self.bank = User.objects.create(
+            username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune'
+        )
+        # (blood group, units, days until expiry)
+        for index, (blood_group, quantity, days) in enumerate([
+            ('O+', 3, -1), ('O+', 2, 0), ('O+', 4, 10), ('A+', 1, -2),
+        ]):
+            BloodType.objects.create(
+                blood_bank=self.bank,
+                blood_group=blood_group,
+                component_type='RBC',
+                quantity=quantity,
+                collection_date=date.today() - timedelta(days=40),
+                expiry_date=date.today() + timedelta(days=days),
+                storage_temperature=4,
+                batch_number=f'B{index}'
+            )
+    
+    def sweep(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return sweep_expired(batch_size=2, today=date.today())
+    
+    def summaries(self):
+        return sorted(StockSummary.objects.filter(blood_bank=self.bank).values_list(
+            'blood_group', 'available_units', 'earliest_expiry'
+        ))
+    
+    def test_expired_units_leave_stock_and_summaries(self):
+        run = self.sweep()
+        
+        self.assertEqual((run.batches, run.rows_expired, run.units_expired, run.banks_notified), (2, 3, 6, 1))
+        self.assertEqual(
+            sorted(BloodType.objects.filter(status='EXPIRED').values_list('batch_number', flat=True)),
+            ['B0', 'B1', 'B3']
+        )
+        available = BloodType.objects.filter(blood_bank=self.bank, status='AVAILABLE').aggregate(units=Sum('quantity'))
+        self.assertEqual(available['units'], 4)
+        self.assertEqual(sum(units for _, units, _ in self.summaries()), 4)
+        self.assertIn(('O+', 4, date.today() + timedelta(days=10)), self.summaries())
+        self.assertEqual(Notification.objects.filter(user=self.bank, notification_type='EXPIRY_ALERT').count(), 1)
+    
+    def test_second_run_changes_nothing(self):
+        self.sweep()
+        summaries = self.summaries()
+        audit_entries = InventoryAuditLog.objects.count()
+        notifications = Notification.objects.count()
+        
+        run = self.sweep()
+        
+        self.assertEqual((run.rows_expired, run.units_expired, run.banks_notified), (0, 0, 0))
+        self.assertEqual(self.summaries(), summaries)
+        self.assertEqual(InventoryAuditLog.objects.count(), audit_entries)
+        self.assertEqual(Notification.objects.count(), notifications)
+
+class InventoryPaginationTest(TestCase):
+    def setUp(self):
+        self.bank = User.objects.create(
+            username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.bank)
+        # Seven batches sharing one expiry date, so only the id breaks the ties
+        self.ids = [self.add_batch(10, f'T{index}') for index in range(7)]
+    
+    def add_batch(self, days, batch_number):
+        return BloodType.objects.create(
+            blood_bank=self.bank,
+            blood_group='O+',
+            component_type='RBC',
+            quantity=1,
+            collection_date=date.today(),
+            expiry_date=date.today() + timedelta(days=days),
+            storage_temperature=4,
+            batch_number=batch_number
+        ).id
+    
+    def page(self, cursor=None):
+        params = {'page_size': 3}
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get('/api/inventory/blood/', params).data
+    
+    def walk(self, page):
+        seen = [row['id'] for row in page['results']]
+        while page['has_more']:
+            page = self.page(page['next_cursor'])
+            seen += [row['id'] for row in page['results']]
+        return seen
+    
+    def test_ties_are_split_across_pages_without_gaps_or_repeats(self):
+        first = self.page()
+        
+        self.assertEqual(len(first['results']), 3)
+        self.assertEqual(self.walk(first), sorted(self.ids))
+    
+    def test_rows_inserted_between_pages_do_not_shift_the_cursor(self):
+        first = self.page()
+        before = self.add_batch(5, 'EARLY')
+        after = self.add_batch(20, 'LATE')
+        
+        seen = self.walk(first)
+        
+        self.assertNotIn(before, seen)
+        self.assertEqual(seen, sorted(self.ids) + [after])
+    
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/inventory/blood/', {'cursor': 'not-a-cursor'})
+        
+        self.assertEqual(response.status_code, 404)
+    
+    def test_lists_without_keyset_pagination_keep_their_shape(self):
+        response = self.client.get('/api/ai/models/')
+        
+        self.assertIsInstance(response.data, list)
+
+
+
+def process_cache(name):
+    """Settings giving this thread the private cache of one server process"""
+    return override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name}
+    })
+
+class InventoryEtagTest(TestCase):
+    def setUp(self):
+        self.bank = User.objects.create(
+            username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.bank)
+        BloodType.objects.create(
+            blood_bank=self.bank,
+            blood_group='O+',
+            component_type='RBC',
+            quantity=4,
+            collection_date=date.today() - timedelta(days=40),
+            expiry_date=date.today(),
+            storage_temperature=4,
+            batch_number='OLD'
+        )
+    
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+    
+    def test_sweeps_by_another_process_change_the_etags(self):
+        urls = ['/api/inventory/blood/', '/api/accounts/dashboard/']
+        with process_cache('web'):
+            etags = [self.get(url)['ETag'] for url in urls]
+            for url, etag in zip(urls, etags):
+                self.assertEqual(self.get(url, etag).status_code, 304)
+        
+        # The sweeper runs in its own process, with its own cache
+        with process_cache('worker'), self.captureOnCommitCallbacks(execute=True):
+            sweep_expired(today=date.today())
+        
+        with process_cache('web'):
+            for url, etag in zip(urls, etags):
+                response = self.get(url, etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
\ No newline at end of file
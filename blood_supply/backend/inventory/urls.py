@@ -2,15 +2,19 @@ from django.urls import path
 from .views import (
     BloodInventoryView,
     BloodSearchView,
+    BatchBloodSearchView,
     BloodRequestView,
     FulfillRequestView,
-    ExpiryAlertView
+    ExpiryAlertView,
+    StockHistoryView
 )
 
 urlpatterns = [
     path('blood/', BloodInventoryView.as_view(), name='blood-inventory'),
     path('search/', BloodSearchView.as_view(), name='blood-search'),
+    path('search/batch/', BatchBloodSearchView.as_view(), name='blood-search-batch'),
     path('requests/', BloodRequestView.as_view(), name='blood-requests'),
     path('requests/<int:request_id>/fulfill/', FulfillRequestView.as_view(), name='fulfill-request'),
     path('expiry-alerts/', ExpiryAlertView.as_view(), name='expiry-alerts'),
+    path('stock-history/', StockHistoryView.as_view(), name='stock-history'),
 ]
\ No newline at end of file
@@ -7,30 +7,55 @@ from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Q
 from django.contrib.auth import get_user_model
-from .models import BloodType, BloodRequest
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from datetime import date, timedelta
+from .models import BloodType, BloodRequest, InventorySnapshot
+from .allocation import (
+    plan_allocation, fulfil_request, AllocationError, InsufficientStock, RequestNotPending
+)
+from .tasks import notify_blood_banks_of_request, suggest_blood_banks_for_request
 from .serializers import (
-    BloodTypeSerializer, BloodRequestSerializer, BloodRequestCreateSerializer
+    BloodTypeSerializer, BloodRequestSerializer, BloodRequestCreateSerializer,
+    BatchSearchSerializer, BloodSearchSerializer
 )
 from ai_engine.models import BloodSupplyChainAI
-from notifications.models import Notification
+from ai_engine.search_cache import search_blood_banks, search_blood_banks_batch
+from utils.fieldsets import SparseFieldsetsViewMixin
+from utils.pagination import KeysetPagination
+from utils.constants import EXPIRY_WARNING_DAYS
+from utils.helpers import compatible_blood_groups, parse_bool
+from utils.versioning import scoped_etag
 
 User = get_user_model()
 
-class BloodInventoryView(generics.ListCreateAPIView):
+def inventory_etag(request, *args, **kwargs):
+    # days_until_expiry and is_expiring_soon change with the date
+    return scoped_etag(request, [f'inventory:{request.user.pk}'], timezone.localdate().isoformat())
+
+@method_decorator(condition(etag_func=inventory_etag), name='get')
+class BloodInventoryView(SparseFieldsetsViewMixin, generics.ListCreateAPIView):
     serializer_class = BloodTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['blood_group', 'component_type', 'status']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('expiry_date', 'id')
     
     def get_queryset(self):
         user = self.request.user
         
+        # Detail fields read the related users, fetch them in the same query
+        inventory = BloodType.objects.select_related('blood_bank', 'donor')
+        
         if user.user_type == 'BLOOD_BANK':
-            return BloodType.objects.filter(blood_bank=user)
+            return inventory.filter(blood_bank=user)
         elif user.user_type == 'HOSPITAL' and user.has_blood_bank:
-            return BloodType.objects.filter(blood_bank=user)
+            return inventory.filter(blood_bank=user)
         else:
             # For hospitals without blood bank and donors, show empty
             return BloodType.objects.none()
@@ -57,30 +82,51 @@ class BloodSearchView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        blood_group = request.data.get('blood_group')
-        component_type = request.data.get('component_type')
-        quantity = int(request.data.get('quantity', 1))
+        serializer = BloodSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if not all([blood_group, component_type]):
-            return Response(
-                {'error': 'Blood group and component type are required'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        data = serializer.validated_data
+        blood_group = data['blood_group']
+        component_type = data['component_type']
+        quantity = data['quantity']
+        limit = data['limit']
+        radius_km = data.get('radius_km') or None
+        # Include ABO/Rh compatible groups unless the caller asks for exact matches only
+        compatible = data['compatible']
+        # The FEFO plan reads every usable batch in range, only build it on request
+        plan = data['plan'] or parse_bool(request.query_params.get('plan'))
         
         user = request.user
         ai_engine = BloodSupplyChainAI()
         
         # Get AI suggestions for nearest blood banks
-        suggestions = ai_engine.find_nearest_blood_banks(
-            request_location={
-                'latitude': user.latitude or 0,
-                'longitude': user.longitude or 0
-            },
+        request_location = {
+            'latitude': user.latitude or 0,
+            'longitude': user.longitude or 0
+        }
+        suggestions = search_blood_banks(
+            request_location=request_location,
             blood_group=blood_group,
             component_type=component_type,
-            quantity=quantity
+            quantity=quantity,
+            limit=limit,
+            radius_km=radius_km,
+            compatible=compatible
         )
         
+        # FEFO plan splitting the quantity across the nearest stocked banks
+        allocation_plan = None
+        if plan:
+            allocation_plan = plan_allocation(
+                blood_group,
+                component_type,
+                quantity,
+                location=request_location,
+                radius_km=radius_km,
+                blood_groups=compatible_blood_groups(blood_group, component_type, exact_only=not compatible)
+            )
+        
         # Get donor matches if no blood banks found
         donor_matches = []
         if not suggestions:
@@ -91,20 +137,73 @@ class BloodSearchView(APIView):
                 component_type=component_type,
                 quantity_required=quantity
             )
-            donor_matches = ai_engine.match_donors_for_request(temp_request)
+            donor_matches = ai_engine.match_donors_for_request(temp_request, compatible=compatible)
         
         return Response({
             'blood_bank_suggestions': suggestions,
+            'allocation_plan': allocation_plan,
             'donor_matches': donor_matches,
             'search_parameters': {
                 'blood_group': blood_group,
                 'component_type': component_type,
-                'quantity': quantity
+                'quantity': quantity,
+                'limit': limit,
+                'radius_km': radius_km,
+                'compatible': compatible,
+                'plan': plan
             }
         })
 
-class BloodRequestView(generics.ListCreateAPIView):
+class BatchBloodSearchView(APIView):
+    """Resolve many blood searches in one call against one shared candidate set"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        serializer = BatchSearchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        user = request.user
+        data = serializer.validated_data
+        items = [
+            {
+                'request_location': item.get('location') or {
+                    'latitude': user.latitude or 0,
+                    'longitude': user.longitude or 0
+                },
+                'blood_group': item['blood_group'],
+                'component_type': item['component_type'],
+                'quantity': item['quantity'],
+                'radius_km': item.get('radius_km')
+            }
+            for item in data['items']
+        ]
+        
+        results = search_blood_banks_batch(
+            items, limit=data['limit'], compatible=data['compatible']
+        )
+        
+        return Response({
+            'total_items': len(items),
+            'results': [
+                {
+                    'index': index,
+                    'search_parameters': {
+                        'blood_group': item['blood_group'],
+                        'component_type': item['component_type'],
+                        'quantity': item['quantity'],
+                        'radius_km': item['radius_km']
+                    },
+                    'blood_bank_suggestions': suggestions
+                }
+                for index, (item, suggestions) in enumerate(zip(items, results))
+            ]
+        })
+
+class BloodRequestView(SparseFieldsetsViewMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', 'id')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -114,11 +213,13 @@ class BloodRequestView(generics.ListCreateAPIView):
     def get_queryset(self):
         user = self.request.user
         
+        requests = BloodRequest.objects.select_related('hospital', 'fulfilled_by')
+        
         if user.user_type == 'HOSPITAL':
-            return BloodRequest.objects.filter(hospital=user)
+            return requests.filter(hospital=user)
         elif user.user_type == 'BLOOD_BANK':
             # Blood banks can see requests in their city
-            return BloodRequest.objects.filter(
+            return requests.filter(
                 Q(status='PENDING') | Q(fulfilled_by=user),
                 hospital__city=user.city
             )
@@ -126,38 +227,13 @@ class BloodRequestView(generics.ListCreateAPIView):
             return BloodRequest.objects.none()
     
     def perform_create(self, serializer):
-        request_obj = serializer.save()
-        
-        # Create notification for blood banks in the same city
-        blood_banks = User.objects.filter(
-            user_type='BLOOD_BANK',
-            city=request_obj.hospital.city,
-            is_verified=True
-        )
-        
-        for blood_bank in blood_banks:
-            Notification.objects.create(
-                user=blood_bank,
-                notification_type='EMERGENCY_REQUEST',
-                title=f'New Blood Request - {request_obj.blood_group}',
-                message=f'Hospital {request_obj.hospital.hospital_name} needs {request_obj.quantity_required} units of {request_obj.blood_group} {request_obj.component_type}',
-                blood_request=request_obj
-            )
-        
-        # Use AI to find suggestions
-        ai_engine = BloodSupplyChainAI()
-        suggestions = ai_engine.find_nearest_blood_banks(
-            request_location={
-                'latitude': request_obj.hospital.latitude or 0,
-                'longitude': request_obj.hospital.longitude or 0
-            },
-            blood_group=request_obj.blood_group,
-            component_type=request_obj.component_type,
-            quantity=request_obj.quantity_required
-        )
-        
-        request_obj.suggested_blood_banks = suggestions
-        request_obj.save()
+        with transaction.atomic():
+            request_obj = serializer.save()
+            
+            # Notifications and AI suggestions run in the task workers, the
+            # hospital gets its 201 without waiting for them
+            notify_blood_banks_of_request.enqueue(request_id=request_obj.id)
+            suggest_blood_banks_for_request.enqueue(request_id=request_obj.id)
 
 class FulfillRequestView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -173,53 +249,35 @@ class FulfillRequestView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            # Check if blood bank has required blood
-            required_blood = BloodType.objects.filter(
-                blood_bank=user,
-                blood_group=blood_request.blood_group,
-                component_type=blood_request.component_type,
-                quantity__gte=blood_request.quantity_required,
-                status='AVAILABLE'
-            ).first()
-            
-            if not required_blood:
-                return Response(
-                    {'error': 'Insufficient inventory'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Update inventory
-            required_blood.quantity -= blood_request.quantity_required
-            if required_blood.quantity == 0:
-                required_blood.status = 'USED'
-            required_blood.save()
-            
-            # Update request
-            blood_request.status = 'FULFILLED'
-            blood_request.fulfilled_by = user
-            blood_request.fulfilled_quantity = blood_request.quantity_required
-            blood_request.fulfilled_at = timezone.now()
-            blood_request.save()
-            
-            # Create notifications
-            Notification.objects.create(
-                user=blood_request.hospital,
-                notification_type='REQUEST_UPDATE',
-                title='Request Fulfilled',
-                message=f'Your blood request has been fulfilled by {user.blood_bank_name}',
-                blood_request=blood_request
-            )
+            # Compare-and-set on the request and conditional batch updates, in one transaction
+            plan = fulfil_request(blood_request, user)
             
             return Response({
                 'message': 'Request fulfilled successfully',
-                'request_id': blood_request.id
+                'request_id': blood_request.id,
+                'allocation': plan['banks'][0]['batches']
             })
-            
+        
         except BloodRequest.DoesNotExist:
             return Response(
                 {'error': 'Request not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except InsufficientStock:
+            return Response(
+                {'error': 'Insufficient inventory'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except RequestNotPending:
+            return Response(
+                {'error': 'Request was already fulfilled or cancelled'},
+                status=status.HTTP_409_CONFLICT
+            )
+        except AllocationError:
+            return Response(
+                {'error': 'Inventory changed while fulfilling the request, please retry'},
+                status=status.HTTP_409_CONFLICT
+            )
 
 class ExpiryAlertView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -233,28 +291,83 @@ class ExpiryAlertView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        # Served by the (blood_bank, status, expiry_date) index
+        today = timezone.localdate()
         expiring_blood = BloodType.objects.filter(
             blood_bank=user,
-            expiry_date__lte=timezone.now() + timedelta(days=7),
-            expiry_date__gte=timezone.now()
-        )
+            status='AVAILABLE',
+            expiry_date__lte=today + timedelta(days=EXPIRY_WARNING_DAYS),
+            expiry_date__gte=today
+        ).order_by('expiry_date', 'id')
         
-        ai_engine = BloodSupplyChainAI()
-        alerts = []
-        
-        for blood in expiring_blood:
-            risk_analysis = ai_engine.predict_expiry_risk(blood)
-            alerts.append({
-                'blood_id': blood.id,
-                'blood_group': blood.blood_group,
-                'component_type': blood.component_type,
-                'quantity': blood.quantity,
-                'expiry_date': blood.expiry_date,
-                'days_until_expiry': blood.days_until_expiry,
-                'risk_analysis': risk_analysis
-            })
+        # Risk buckets are computed by the database in the same query
+        alerts = BloodSupplyChainAI().predict_expiry_risk_batch(expiring_blood, today)
         
         return Response({
             'total_expiring': len(alerts),
             'alerts': alerts
+        })
+
+class StockHistoryView(APIView):
+    """Daily stock levels of the user's blood bank, one series per blood group and component"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    # Longest range served in one call
+    MAX_DAYS = 366
+    
+    def get(self, request):
+        user = request.user
+        
+        if not (user.user_type == 'BLOOD_BANK' or (user.user_type == 'HOSPITAL' and user.has_blood_bank)):
+            return Response(
+                {'error': 'Only blood banks can view stock history'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        try:
+            date_to = date.fromisoformat(request.query_params['to']) if request.query_params.get('to') else timezone.localdate()
+            date_from = date.fromisoformat(request.query_params['from']) if request.query_params.get('from') else date_to - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be dates (YYYY-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if date_from > date_to or (date_to - date_from).days >= self.MAX_DAYS:
+            return Response(
+                {'error': f'from must not be after to, and the range is limited to {self.MAX_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        filters = {
+            'blood_bank': user,
+            'date__gte': date_from,
+            'date__lte': date_to,
+        }
+        for param in ('blood_group', 'component_type'):
+            if request.query_params.get(param):
+                filters[param] = request.query_params[param]
+        
+        # Only indexed columns, in index order: an index-only range scan
+        rows = InventorySnapshot.objects.filter(**filters).order_by('date', 'blood_group', 'component_type').values_list(
+            'blood_group', 'component_type', 'date', 'available_units', 'expiring_units', 'wasted_units'
+        )
+        
+        series = {}
+        for blood_group, component_type, day, available, expiring, wasted in rows:
+            points = series.setdefault((blood_group, component_type), [])
+            points.append([day, available, expiring, wasted])
+        
+        return Response({
+            'from': date_from,
+            'to': date_to,
+            'columns': ['date', 'available_units', 'expiring_units', 'wasted_units'],
+            'series': [
+                {
+                    'blood_group': blood_group,
+                    'component_type': component_type,
+                    'points': points
+                }
+                for (blood_group, component_type), points in sorted(series.items())
+            ]
         })
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Stock alert engine.
+
+Low stock and expiry alerts are judged per (blood bank, blood group, component)
+from the stock summary. The last state of every alert is kept in AlertState and
+a notification is only sent when an alert crosses from clear to active, so
+inventory writes that leave the state unchanged cost no writes at all. Alerts
+that clear and fire again within ALERT_COALESCE_WINDOW are not sent again, and
+the alerts raised in one transaction are sent after it commits as one
+notification per bank and alert type.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from inventory.models import StockSummary
+from utils.constants import LOW_STOCK_THRESHOLD, EXPIRY_WARNING_DAYS
+from utils.commit_buffer import CommitBuffer
+from .models import AlertState, Notification
+from .services import create_notifications
+
+def _coalesce_window():
+    return timedelta(seconds=getattr(settings, 'ALERT_COALESCE_WINDOW', 60 * 60))
+
+def _active_alerts(available_units, earliest_expiry, today):
+    return {
+        'LOW_STOCK': available_units <= LOW_STOCK_THRESHOLD,
+        'EXPIRY_ALERT': earliest_expiry is not None
+                        and today < earliest_expiry <= today + timedelta(days=EXPIRY_WARNING_DAYS),
+    }
+
+def _transition(key, alert_type, active, now):
+    """
+    Move one alert to the given state. Returns the AlertState id when it
+    crossed from clear to active, else None.
+    """
+    state = AlertState.objects.filter(alert_type=alert_type, **key).values(
+        'id', 'is_active', 'last_notified_at'
+    ).first()
+    
+    if state is None:
+        if not active:
+            return None
+        try:
+            with transaction.atomic():
+                state = AlertState.objects.create(
+                    alert_type=alert_type, is_active=True, changed_at=now, **key
+                )
+            return state.id
+        except IntegrityError:
+            return None  # Raised concurrently, that writer sends the alert
+    
+    if state['is_active'] == active:
+        return None
+    
+    # Compare-and-set, a concurrent evaluation may have flipped it already
+    flipped = AlertState.objects.filter(id=state['id'], is_active=state['is_active']).update(
+        is_active=active, changed_at=now
+    )
+    if not flipped or not active:
+        return None
+    
+    # Flapping around the threshold: the bank heard about it recently
+    if state['last_notified_at'] and now - state['last_notified_at'] < _coalesce_window():
+        return None
+    return state['id']
+
+def evaluate_stock_alerts(blood_bank_id, blood_group, component_type, available_units, earliest_expiry, today=None):
+    """Update the alert states of one stock summary, queueing the alerts that fire"""
+    today = today or timezone.localdate()
+    now = timezone.now()
+    key = {
+        'blood_bank_id': blood_bank_id,
+        'blood_group': blood_group,
+        'component_type': component_type,
+    }
+    
+    for alert_type, active in _active_alerts(available_units, earliest_expiry, today).items():
+        state_id = _transition(key, alert_type, active, now)
+        if state_id:
+            _pending_alerts.append({
+                'state_id': state_id,
+                'alert_type': alert_type,
+                'available_units': available_units,
+                'earliest_expiry': earliest_expiry,
+                **key
+            })
+
+def stock_summaries_for(keys):
+    """Summary values of (blood_bank_id, blood_group, component_type) keys, as evaluate_stock_alerts kwargs"""
+    keys = set(keys)
+    if not keys:
+        return []
+    query = Q()
+    for blood_bank_id, blood_group, component_type in keys:
+        query |= Q(blood_bank_id=blood_bank_id, blood_group=blood_group, component_type=component_type)
+    return StockSummary.objects.filter(query).values(
+        'blood_bank_id', 'blood_group', 'component_type', 'available_units', 'earliest_expiry'
+    )
+
+def check_expiry_windows(today=None):
+    """
+    Re-evaluate expiry alerts whose state can change with the date alone: stock
+    entering the warning window and active alerts whose stock has left it.
+    Run daily (sweep_expired does).
+    """
+    today = today or timezone.localdate()
+    active_keys = AlertState.objects.filter(alert_type='EXPIRY_ALERT', is_active=True).values_list(
+        'blood_bank_id', 'blood_group', 'component_type'
+    )
+    entering = StockSummary.objects.filter(
+        available_units__gt=0,
+        earliest_expiry__gt=today,
+        earliest_expiry__lte=today + timedelta(days=EXPIRY_WARNING_DAYS)
+    ).values_list('blood_bank_id', 'blood_group', 'component_type')
+    
+    with transaction.atomic():
+        for summary in stock_summaries_for([*active_keys, *entering]):
+            evaluate_stock_alerts(today=today, **summary)
+
+def _describe(alert):
+    stock = f"{alert['blood_group']} {alert['component_type']}"
+    if alert['alert_type'] == 'LOW_STOCK':
+        return f"{stock}: {alert['available_units']} units remaining"
+    return f"{stock}: {alert['available_units']} units, earliest expiring on {alert['earliest_expiry']}"
+
+def _send_alerts(alerts):
+    """Send the alerts raised in one transaction, one notification per bank and alert type"""
+    grouped = defaultdict(list)
+    for alert in alerts:
+        grouped[(alert['blood_bank_id'], alert['alert_type'])].append(alert)
+    
+    notifications = []
+    for (blood_bank_id, alert_type), bank_alerts in grouped.items():
+        blood_groups = ', '.join(dict.fromkeys(alert['blood_group'] for alert in bank_alerts))
+        if alert_type == 'LOW_STOCK':
+            title = f'Low Stock Alert - {blood_groups}'
+            intro = 'Stock fell to the low stock threshold'
+        else:
+            title = f'Blood Expiring Soon - {blood_groups}'
+            intro = f'Stock will expire within {EXPIRY_WARNING_DAYS} days'
+        notifications.append(Notification(
+            user_id=blood_bank_id,
+            notification_type=alert_type,
+            title=title,
+            message=f"{intro}. " + '; '.join(_describe(alert) for alert in bank_alerts) + '.'
+        ))
+    
+    create_notifications(notifications)
+    AlertState.objects.filter(
+        id__in=[alert['state_id'] for alert in alerts]
+    ).update(last_notified_at=timezone.now())
+
+_pending_alerts = CommitBuffer(_send_alerts)
\ No newline at end of file
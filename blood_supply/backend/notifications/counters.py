@@ -0,0 +1,104 @@
+"""
+Denormalized per-user notification counters.
+
+Every write path adjusts NotificationCounter with F() expressions, so the
+stats endpoint and dashboard badges read one row instead of counting
+notifications. A counter that does not exist yet is seeded from a count of
+the user's notifications, and reconcile_notification_counters repairs drift.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from .models import Notification, NotificationCounter
+
+def _counted(user_ids):
+    """{user_id: (total, unread)} counted from the notifications table"""
+    counts = {user_id: (0, 0) for user_id in user_ids}
+    for row in Notification.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+        total=Count('id'),
+        unread=Count('id', filter=Q(is_read=False))
+    ).order_by():
+        counts[row['user_id']] = (row['total'], row['unread'])
+    return counts
+
+def _seed(user_ids):
+    # Counted after the triggering write, so the seed already includes it
+    NotificationCounter.objects.bulk_create([
+        NotificationCounter(user_id=user_id, total=total, unread=unread)
+        for user_id, (total, unread) in _counted(user_ids).items()
+    ], ignore_conflicts=True)
+
+def adjust_counters(changes):
+    """
+    Apply {user_id: (total_delta, unread_delta)} to the counters, one UPDATE
+    per distinct delta. Call after the notification rows are written.
+    """
+    by_delta = defaultdict(list)
+    for user_id, delta in changes.items():
+        if delta != (0, 0):
+            by_delta[delta].append(user_id)
+    
+    for (total, unread), user_ids in by_delta.items():
+        updated = NotificationCounter.objects.filter(user_id__in=user_ids).update(
+            total=F('total') + total,
+            unread=F('unread') + unread,
+            updated_at=timezone.now()
+        )
+        if updated < len(user_ids):
+            existing = set(NotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+            _seed([user_id for user_id in user_ids if user_id not in existing])
+
+def _counter(user_id, *fields):
+    counter = NotificationCounter.objects.filter(user_id=user_id).values_list(*fields).first()
+    if counter is None:
+        _seed([user_id])
+        counter = NotificationCounter.objects.filter(user_id=user_id).values_list(*fields).first()
+    return counter
+
+def notification_counts(user_id):
+    """(total, unread) for one user, from a single counter row"""
+    return _counter(user_id, 'total', 'unread')
+
+def counter_version(user_id):
+    """(total, unread, updated_at) of the user's counter, which changes with every adjustment"""
+    return _counter(user_id, 'total', 'unread', 'updated_at')
+
+# Users recounted per transaction by reconcile_counters
+RECONCILE_BATCH_SIZE = 500
+
+def reconcile_counters(user_ids=None, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Recount the counters of user_ids (every user with notifications or a
+    counter when None) and fix the ones that drifted. Returns the number of
+    counters repaired.
+    """
+    if user_ids is None:
+        user_ids = set(Notification.objects.values_list('user_id', flat=True).distinct())
+        user_ids |= set(NotificationCounter.objects.values_list('user_id', flat=True))
+    user_ids = sorted(user_ids)
+    
+    repaired = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            # Lock first: adjustments made meanwhile wait and apply on top of the recount
+            stored = {
+                user_id: (total, unread)
+                for user_id, total, unread in NotificationCounter.objects.select_for_update().filter(
+                    user_id__in=batch
+                ).values_list('user_id', 'total', 'unread')
+            }
+            missing = []
+            for user_id, (total, unread) in _counted(batch).items():
+                if user_id not in stored:
+                    missing.append(NotificationCounter(user_id=user_id, total=total, unread=unread))
+                elif stored[user_id] != (total, unread):
+                    NotificationCounter.objects.filter(user_id=user_id).update(
+                        total=total, unread=unread, updated_at=timezone.now()
+                    )
+                    repaired += 1
+            NotificationCounter.objects.bulk_create(missing, ignore_conflicts=True)
+            repaired += len(missing)
+    return repaired
\ No newline at end of file
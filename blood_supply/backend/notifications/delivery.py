@@ -0,0 +1,242 @@
+"""
+Outbound delivery of EMAIL and SMS notifications
+
+Notifications created with sent_via EMAIL or SMS are queued by is_sent=False.
+A Dispatcher claims due rows in batches (SKIP LOCKED where the database
+supports it, plus a lease so a crashed dispatcher's rows are retried) and
+sends them from a thread pool. Each thread keeps its own open connection per
+channel. Sends are throttled per channel and failures are retried with
+exponential backoff until NOTIFICATION_DELIVERY_MAX_ATTEMPTS.
+"""
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from taskqueue.queue import default_worker_id
+from .models import Notification
+from .sms import SMSMessage, get_sms_backend
+
+CHANNELS = ('EMAIL', 'SMS')
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+def _retry_delay(attempts):
+    base = _setting('NOTIFICATION_DELIVERY_RETRY_BACKOFF', 30)
+    return min(base * 2 ** (attempts - 1), 6 * 60 * 60)
+
+def _deliverable(now):
+    return (
+        Q(is_sent=False, sent_via__in=CHANNELS,
+          delivery_attempts__lt=_setting('NOTIFICATION_DELIVERY_MAX_ATTEMPTS', 5))
+        & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        & (Q(delivery_locked_until__isnull=True) | Q(delivery_locked_until__lt=now))
+    )
+
+def claim_batch(worker_id, batch_size=100, lease=None):
+    """Lease up to batch_size due notifications to worker_id and return them"""
+    lease = lease or _setting('NOTIFICATION_DELIVERY_LEASE', 120)
+    now = timezone.now()
+    
+    with transaction.atomic():
+        # Concurrent dispatchers skip each other's rows instead of waiting
+        ids = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(_deliverable(now)).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        Notification.objects.filter(_deliverable(now), id__in=ids).update(
+            delivery_locked_by=worker_id,
+            delivery_locked_until=now + timedelta(seconds=lease),
+            delivery_attempts=F('delivery_attempts') + 1
+        )
+    
+    return list(
+        Notification.objects.select_related('user').filter(id__in=ids, delivery_locked_by=worker_id)
+        .only('id', 'title', 'message', 'sent_via', 'delivery_attempts', 'user__email', 'user__phone')
+    )
+
+class RateLimiter:
+    """Token bucket shared by the sending threads, rate in sends per second"""
+    
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class DeliveryMetrics:
+    """Per-channel delivery counters of one dispatcher"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {'sent': 0, 'retried': 0, 'failed': 0, 'send_seconds': 0.0})
+    
+    def record(self, channel, outcome, seconds=0.0):
+        with self._lock:
+            self._counts[channel][outcome] += 1
+            self._counts[channel]['send_seconds'] += seconds
+    
+    def snapshot(self):
+        with self._lock:
+            stats = {}
+            for channel, counts in self._counts.items():
+                attempts = counts['sent'] + counts['retried'] + counts['failed']
+                stats[channel] = {
+                    'sent': counts['sent'],
+                    'retried': counts['retried'],
+                    'failed': counts['failed'],
+                    'avg_send_ms': round(counts['send_seconds'] * 1000 / attempts, 1) if attempts else 0,
+                }
+            return stats
+
+class Dispatcher:
+    """
+    Claims and sends batches of outbound notifications.
+    
+    Use run_once() per batch, or as a context manager to close the thread
+    pool and its connections.
+    """
+    
+    def __init__(self, worker_id=None, workers=8, batch_size=100, lease=None):
+        self.worker_id = worker_id or default_worker_id()
+        self.batch_size = batch_size
+        self.lease = lease
+        self.metrics = DeliveryMetrics()
+        rates = _setting('NOTIFICATION_DELIVERY_RATE_LIMITS', {})
+        self.limiters = {channel: RateLimiter(rates[channel]) for channel in CHANNELS if rates.get(channel)}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notification-delivery')
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for connection in self._connections:
+            try:
+                connection.close()
+            except Exception as e:
+                print(f"Error closing delivery connection: {e}")
+    
+    def _connection(self, channel):
+        # One connection per thread and channel, opened once and reused
+        connections = self._local.__dict__.setdefault('connections', {})
+        if channel not in connections:
+            connection = get_connection() if channel == 'EMAIL' else get_sms_backend()
+            connection.open()
+            connections[channel] = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connections[channel]
+    
+    def _drop_connection(self, channel):
+        connection = self._local.__dict__.get('connections', {}).pop(channel, None)
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+    
+    def _send(self, notification):
+        """Deliver one notification, returns (error message or None, whether to retry)"""
+        channel = notification.sent_via
+        if channel == 'EMAIL':
+            address = notification.user.email
+            message = EmailMessage(notification.title, notification.message, to=[address])
+        else:
+            address = notification.user.phone
+            message = SMSMessage(address, f'{notification.title}: {notification.message}')
+        if not address:
+            self.metrics.record(channel, 'failed')
+            return f'User has no {"email address" if channel == "EMAIL" else "phone number"}', False
+        
+        limiter = self.limiters.get(channel)
+        if limiter is not None:
+            limiter.acquire()
+        
+        started = time.monotonic()
+        try:
+            self._connection(channel).send_messages([message])
+        except Exception as e:
+            # The connection may be broken, open a fresh one for the next send
+            self._drop_connection(channel)
+            retry = not self._is_last_attempt(notification)
+            self.metrics.record(channel, 'retried' if retry else 'failed', time.monotonic() - started)
+            return f'{type(e).__name__}: {e}', retry
+        self.metrics.record(channel, 'sent', time.monotonic() - started)
+        return None, False
+    
+    def _is_last_attempt(self, notification):
+        return notification.delivery_attempts >= _setting('NOTIFICATION_DELIVERY_MAX_ATTEMPTS', 5)
+    
+    def run_once(self):
+        """Claim and deliver one batch, returns the number of notifications attempted"""
+        batch = claim_batch(self.worker_id, self.batch_size, self.lease)
+        if not batch:
+            return 0
+        
+        results = list(self._executor.map(self._send, batch))
+        now = timezone.now()
+        
+        sent = [notification.id for notification, (error, _) in zip(batch, results) if error is None]
+        # Only while the lease is ours, a reclaimed row belongs to its new dispatcher
+        leased = Notification.objects.filter(delivery_locked_by=self.worker_id)
+        leased.filter(id__in=sent).update(
+            is_sent=True, sent_at=now, delivery_error='', delivery_locked_until=None
+        )
+        
+        for notification, (error, retry) in zip(batch, results):
+            if error is None:
+                continue
+            if retry:
+                leased.filter(id=notification.id).update(
+                    delivery_error=error,
+                    next_attempt_at=now + timedelta(seconds=_retry_delay(notification.delivery_attempts)),
+                    delivery_locked_until=None
+                )
+            else:
+                print(f"Error delivering notification {notification.id} via {notification.sent_via}, giving up: {error}")
+                # Out of attempts: no longer matched by the outbound queue
+                leased.filter(id=notification.id).update(
+                    delivery_error=error,
+                    delivery_attempts=_setting('NOTIFICATION_DELIVERY_MAX_ATTEMPTS', 5),
+                    next_attempt_at=None,
+                    delivery_locked_until=None
+                )
+        return len(batch)
+    
+    def run_pending(self):
+        """Deliver until nothing is due, returns the number attempted"""
+        total = 0
+        while True:
+            attempted = self.run_once()
+            if not attempted:
+                return total
+            total += attempted
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+Pub/sub hub behind the notification stream.
+
+Publishers call publish(channel, event) from ordinary (sync) code after their
+transaction commits; every open stream subscribed to the channel receives the
+event. Channels are 'user:<id>' for a user's notifications and
+'emergency:<city>' for critical blood requests.
+
+The hub class is set by NOTIFICATION_HUB. PollingHub, the default, reads new
+rows from the database (one query per interval for the whole process), so
+notifications created by task workers or other server processes reach every
+stream. InProcessHub only reaches streams served by the publishing process. A hub
+backed by a message broker can replace either by implementing publish and
+subscribe.
+"""
+import asyncio
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+# Queued to a subscriber that fell too far behind; its stream ends and the
+# client resumes from its Last-Event-ID
+OVERFLOW = object()
+
+class Event:
+    """One server-sent event: id (None for ephemeral events), event name and JSON data"""
+    
+    def __init__(self, name, data, id=None):
+        self.name = name
+        self.data = data
+        self.id = id
+
+class Subscription:
+    def __init__(self, hub, channels, max_queue):
+        self.hub = hub
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.max_queue = max_queue
+        self.overflowed = False
+    
+    def deliver(self, event):
+        # Runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_queue:
+            self.overflowed = True
+            event = OVERFLOW
+        self.queue.put_nowait(event)
+    
+    async def get(self, timeout):
+        """Next event, or None when nothing arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    
+    def close(self):
+        self.hub.unsubscribe(self)
+
+class BaseHub:
+    def publish(self, channel, event):
+        raise NotImplementedError
+    
+    def is_subscribed(self, channel):
+        """False when publishing to channel would reach no one, lets publishers skip building events"""
+        return True
+    
+    def subscribe(self, channels):
+        """Subscribe the calling event loop to channels, returns a Subscription"""
+        raise NotImplementedError
+    
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+class InProcessHub(BaseHub):
+    def __init__(self, max_queue=None):
+        self.max_queue = max_queue or getattr(settings, 'SSE_MAX_QUEUE', 1000)
+        self._lock = threading.Lock()
+        self._subscribers = {}
+    
+    def publish(self, channel, event):
+        # Safe from any thread, delivery is handed to each subscriber's loop
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                pass  # Loop already closed, the stream is gone
+    
+    def is_subscribed(self, channel):
+        return channel in self._subscribers
+    
+    def subscribe(self, channels):
+        subscription = Subscription(self, list(channels), self.max_queue)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+    
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+class IdCursor:
+    """
+    Highest id seen so far, plus the ids skipped over on the way there.
+    
+    Ids are assigned at INSERT but become visible at COMMIT, so a row can show
+    up after rows with higher ids. Skipped ids are looked up again for
+    lookback seconds before they are given up as rolled back.
+    """
+    
+    def __init__(self, last_id, lookback, max_gaps):
+        self.last_id = last_id
+        self.lookback = lookback
+        self.max_gaps = max_gaps
+        self.gaps = {}
+    
+    def pending(self):
+        """Filter for rows not seen yet"""
+        now = time.monotonic()
+        self.gaps = {id: skipped_at for id, skipped_at in self.gaps.items() if now - skipped_at < self.lookback}
+        return Q(id__gt=self.last_id) | Q(id__in=list(self.gaps))
+    
+    def seen(self, id):
+        if id <= self.last_id:
+            self.gaps.pop(id, None)
+            return
+        now = time.monotonic()
+        for skipped in range(max(self.last_id + 1, id - self.max_gaps), id):
+            self.gaps[skipped] = now
+        while len(self.gaps) > self.max_gaps:
+            del self.gaps[next(iter(self.gaps))]
+        self.last_id = id
+
+class PollingHub(InProcessHub):
+    """
+    Delivers rows committed by any process: a single task per process polls
+    for notifications and critical requests it has not seen since it started.
+    """
+    
+    def __init__(self, max_queue=None, interval=None, lookback=None):
+        super().__init__(max_queue)
+        self.interval = interval or getattr(settings, 'SSE_POLL_INTERVAL', 2)
+        self.lookback = lookback or getattr(settings, 'SSE_POLL_LOOKBACK', 30)
+        self._poller = None
+        self._notifications = None
+        self._requests = None
+    
+    def publish(self, channel, event):
+        # Everything is picked up by the poller, publishing directly would duplicate it
+        pass
+    
+    def is_subscribed(self, channel):
+        return False
+    
+    def subscribe(self, channels):
+        subscription = super().subscribe(channels)
+        if self._poller is None or self._poller.done():
+            self._poller = subscription.loop.create_task(self._poll())
+        return subscription
+    
+    async def _poll(self):
+        # Restart from the latest rows every time: rows committed while nobody
+        # listened reach streams through their Last-Event-ID replay
+        await sync_to_async(self._start_from_latest)()
+        while self.has_subscribers():
+            await asyncio.sleep(self.interval)
+            for channel, event in await sync_to_async(self._fetch_new)():
+                InProcessHub.publish(self, channel, event)
+    
+    def _start_from_latest(self):
+        from inventory.models import BloodRequest
+        from .models import Notification
+        
+        self._notifications = IdCursor(
+            Notification.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+            self.lookback, self.max_queue
+        )
+        self._requests = IdCursor(
+            BloodRequest.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+            self.lookback, self.max_queue
+        )
+    
+    def _fetch_new(self):
+        from inventory.models import BloodRequest
+        from .models import Notification
+        from .streams import notification_event, emergency_event
+        
+        published = []
+        # Served by the primary key, cheap however many users are connected
+        for notification in Notification.objects.filter(self._notifications.pending()).order_by('id')[:self.max_queue]:
+            published.append((f'user:{notification.user_id}', notification_event(notification)))
+            self._notifications.seen(notification.id)
+        
+        for blood_request in BloodRequest.objects.select_related('hospital').filter(
+            self._requests.pending()
+        ).order_by('id')[:self.max_queue]:
+            if blood_request.urgency == 'CRITICAL':
+                published.append((f'emergency:{blood_request.hospital.city}', emergency_event(blood_request)))
+            self._requests.seen(blood_request.id)
+        return published
+
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_hub():
+    """Return the process-wide hub (class from NOTIFICATION_HUB)"""
+    global _hub
+    
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = import_string(getattr(settings, 'NOTIFICATION_HUB', 'notifications.hub.PollingHub'))()
+    return _hub
\ No newline at end of file
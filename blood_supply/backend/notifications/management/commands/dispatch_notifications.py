@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from notifications.delivery import Dispatcher
+
+class Command(BaseCommand):
+    help = 'Deliver queued EMAIL and SMS notifications'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Sending threads')
+        parser.add_argument('--batch-size', type=int, default=100, help='Notifications claimed per batch')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait when nothing is due')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once nothing is due')
+    
+    def handle(self, *args, **options):
+        with Dispatcher(workers=options['workers'], batch_size=options['batch_size']) as dispatcher:
+            try:
+                while True:
+                    close_old_connections()
+                    try:
+                        attempted = dispatcher.run_once()
+                    except Exception as e:
+                        print(f"Error in notification dispatcher {dispatcher.worker_id}: {e}")
+                        attempted = 0
+                    
+                    if options['burst'] and not attempted:
+                        break
+                    if not attempted:
+                        time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                pass
+            
+            for channel, stats in sorted(dispatcher.metrics.snapshot().items()):
+                self.stdout.write(
+                    f"{channel}: {stats['sent']} sent, {stats['retried']} retried, "
+                    f"{stats['failed']} failed, {stats['avg_send_ms']} ms per send"
+                )
+        self.stdout.write(self.style.SUCCESS('Notification dispatcher stopped'))
\ No newline at end of file
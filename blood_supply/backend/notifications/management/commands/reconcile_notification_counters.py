@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from notifications.counters import reconcile_counters
+
+class Command(BaseCommand):
+    help = 'Recount per-user notification counters and repair any drift'
+    
+    def handle(self, *args, **options):
+        repaired = reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(f'Notification counters reconciled: {repaired} repaired'))
\ No newline at end of file
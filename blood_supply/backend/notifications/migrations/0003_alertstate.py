@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_keyset_pagination_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(max_length=5)),
+                ('component_type', models.CharField(max_length=20)),
+                ('alert_type', models.CharField(choices=[('LOW_STOCK', 'Low Stock Alert'), ('EXPIRY_ALERT', 'Expiry Alert')], max_length=50)),
+                ('is_active', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField()),
+                ('last_notified_at', models.DateTimeField(blank=True, null=True)),
+                ('blood_bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('blood_bank', 'blood_group', 'component_type', 'alert_type'), name='unique_alert_state')],
+            },
+        ),
+    ]
@@ -28,11 +28,66 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     read_at = models.DateTimeField(null=True, blank=True)
     
+    # EMAIL / SMS delivery, run by the dispatch_notifications worker
+    sent_at = models.DateTimeField(null=True, blank=True)
+    delivery_attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True, help_text="Retry time after a failed attempt")
+    delivery_locked_by = models.CharField(max_length=255, blank=True)
+    delivery_locked_until = models.DateTimeField(null=True, blank=True)
+    delivery_error = models.TextField(blank=True)
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read']),
+            models.Index(fields=['user', '-created_at', 'id']),
+            # Outbound queue of undelivered EMAIL / SMS rows
+            models.Index(fields=['sent_via', 'is_sent', 'id'], name='notification_outbox'),
+        ]
+    
+    def __str__(self):
+        return f"{self.notification_type} - {self.user.username}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Read state as loaded, saves that flip it adjust the unread counter
+        instance._loaded_is_read = instance.__dict__.get('is_read')
+        return instance
+
+class AlertState(models.Model):
+    """Last known state of one stock alert, alerts are only sent when it flips to active"""
+    ALERT_TYPES = (
+        ('LOW_STOCK', 'Low Stock Alert'),
+        ('EXPIRY_ALERT', 'Expiry Alert'),
+    )
+    
+    blood_bank = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alert_states')
+    blood_group = models.CharField(max_length=5)
+    component_type = models.CharField(max_length=20)
+    alert_type = models.CharField(max_length=50, choices=ALERT_TYPES)
+    
+    is_active = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+    last_notified_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['blood_bank', 'blood_group', 'component_type', 'alert_type'],
+                name='unique_alert_state'
+            )
         ]
     
     def __str__(self):
-        return f"{self.notification_type} - {self.user.username}"
\ No newline at end of file
+        return f"{self.alert_type} - {self.blood_bank.username} {self.blood_group} {self.component_type}: {'active' if self.is_active else 'clear'}"
+
+class NotificationCounter(models.Model):
+    """Per-user notification totals, kept in step by notifications.counters"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    total = models.IntegerField(default=0)
+    unread = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.unread} unread of {self.total}"
\ No newline at end of file
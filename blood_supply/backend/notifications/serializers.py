@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from utils.fieldsets import SparseFieldsetsMixin
 from .models import Notification
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     notification_type_display = serializers.CharField(source='get_notification_type_display', read_only=True)
     created_at_formatted = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S', read_only=True)
     
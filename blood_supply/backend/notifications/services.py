@@ -0,0 +1,72 @@
+"""
+Notification fan-out
+"""
+from collections import defaultdict
+
+from django.db.models.query import QuerySet
+from .counters import adjust_counters
+from .models import Notification
+from .streams import publish_notifications
+
+# Rows per INSERT when fanning out
+FANOUT_BATCH_SIZE = 500
+
+def fan_out(recipients, notification_type, title, message, batch_size=FANOUT_BATCH_SIZE, **related):
+    """
+    Create one notification per recipient with bulk INSERTs.
+    
+    recipients is a User queryset (resolved to ids with a single query) or an
+    iterable of user ids. related holds the optional blood_inventory /
+    blood_request (or their *_id) set on every row. Returns the created
+    notifications.
+    """
+    if isinstance(recipients, QuerySet):
+        user_ids = list(recipients.values_list('id', flat=True))
+    else:
+        user_ids = list(dict.fromkeys(recipients))
+    
+    notifications = [
+        Notification(
+            user_id=user_id,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            **related
+        )
+        for user_id in user_ids
+    ]
+    return create_notifications(notifications, batch_size)
+
+def create_notifications(notifications, batch_size=FANOUT_BATCH_SIZE):
+    """
+    Bulk insert notifications, updating the recipients' counters that
+    post_save would otherwise maintain.
+    """
+    if not notifications:
+        return notifications
+    
+    Notification.objects.bulk_create(notifications, batch_size=batch_size)
+    
+    changes = defaultdict(lambda: (0, 0))
+    for notification in notifications:
+        total, unread = changes[notification.user_id]
+        changes[notification.user_id] = (total + 1, unread + (not notification.is_read))
+    adjust_counters(changes)
+    
+    publish_notifications(notifications)
+    return notifications
+
+def notify(user_id, notification_type, title, message, **related):
+    """Create a single notification for one user"""
+    return fan_out([user_id], notification_type, title, message, **related)[0]
+
+def notify_request_fulfilled(blood_request):
+    """Tell the hospital that its request was fulfilled"""
+    fulfilled_by = blood_request.fulfilled_by
+    return notify(
+        blood_request.hospital_id,
+        notification_type='REQUEST_UPDATE',
+        title='Request Fulfilled',
+        message=f'Your request for {blood_request.blood_group} has been fulfilled by {fulfilled_by.blood_bank_name or fulfilled_by.username}',
+        blood_request=blood_request
+    )
\ No newline at end of file
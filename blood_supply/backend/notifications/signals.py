@@ -1,42 +1,52 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from inventory.models import BloodType, BloodRequest
-from accounts.models import User
+from inventory.models import BloodRequest
+from inventory.services import stock_summary_refreshed, stock_summaries_rebuilt
+from .alerts import evaluate_stock_alerts, stock_summaries_for
+from .counters import adjust_counters
 from .models import Notification
-
-@receiver(post_save, sender=BloodType)
-def check_blood_expiry(sender, instance, **kwargs):
-    """Create expiry notification for blood nearing expiry"""
-    if instance.is_expiring_soon() and instance.days_until_expiry > 0:
-        Notification.objects.create(
-            user=instance.blood_bank,
-            notification_type='EXPIRY_ALERT',
-            title=f'Blood Expiring Soon - {instance.blood_group}',
-            message=f'{instance.quantity} units of {instance.blood_group} {instance.component_type} will expire in {instance.days_until_expiry} days.',
-            blood_inventory=instance
-        )
+from .services import notify_request_fulfilled
+from .streams import publish_notifications, publish_emergency_request
 
 @receiver(post_save, sender=BloodRequest)
 def notify_blood_request_update(sender, instance, **kwargs):
     """Create notification when blood request status changes"""
     if instance.status == 'FULFILLED' and instance.fulfilled_by:
-        Notification.objects.create(
-            user=instance.hospital,
-            notification_type='REQUEST_UPDATE',
-            title='Request Fulfilled',
-            message=f'Your request for {instance.blood_group} has been fulfilled by {instance.fulfilled_by.blood_bank_name}',
-            blood_request=instance
-        )
+        notify_request_fulfilled(instance)
+
+@receiver(post_save, sender=BloodRequest)
+def broadcast_emergency_request(sender, instance, created, **kwargs):
+    """Push critical requests to the live streams of blood banks in the city"""
+    if created and instance.urgency == 'CRITICAL':
+        publish_emergency_request(instance)
+
+@receiver(stock_summary_refreshed)
+def check_stock_alerts(sender, blood_bank_id, blood_group, component_type, available_units,
+                       earliest_expiry, changed, **kwargs):
+    """Raise low stock and expiry alerts when a stock summary crosses a threshold"""
+    if changed:
+        evaluate_stock_alerts(blood_bank_id, blood_group, component_type, available_units, earliest_expiry)
+
+@receiver(stock_summaries_rebuilt)
+def check_rebuilt_stock_alerts(sender, keys, **kwargs):
+    for summary in stock_summaries_for(keys):
+        evaluate_stock_alerts(**summary)
+
+@receiver(post_save, sender=Notification)
+def count_saved_notification(sender, instance, created, **kwargs):
+    if created:
+        adjust_counters({instance.user_id: (1, 0 if instance.is_read else 1)})
+        publish_notifications([instance])
+    else:
+        was_read = getattr(instance, '_loaded_is_read', None)
+        if was_read is not None and was_read != instance.is_read:
+            adjust_counters({instance.user_id: (0, 1 if was_read else -1)})
+    instance._loaded_is_read = instance.is_read
 
-@receiver(post_save, sender=BloodType)
-def check_low_stock(sender, instance, **kwargs):
-    """Create low stock notification"""
-    if instance.quantity <= 5:  # Threshold for low stock
-        Notification.objects.create(
-            user=instance.blood_bank,
-            notification_type='LOW_STOCK',
-            title=f'Low Stock Alert - {instance.blood_group}',
-            message=f'Only {instance.quantity} units of {instance.blood_group} {instance.component_type} remaining.',
-            blood_inventory=instance
-        )
\ No newline at end of file
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, origin=None, **kwargs):
+    # A deleted user takes its counter with it
+    if origin is not None and getattr(origin, 'model', type(origin)) is not Notification:
+        return
+    adjust_counters({instance.user_id: (-1, 0 if instance.is_read else -1)})
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""
+SMS backends, configured like Django's email backends with SMS_BACKEND
+
+A gateway integration subclasses BaseSMSBackend and implements
+send_messages, reusing one connection between open() and close().
+"""
+import sys
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+class SMSMessage:
+    def __init__(self, to, body):
+        self.to = to
+        self.body = body
+
+class BaseSMSBackend:
+    def __init__(self, fail_silently=False, **kwargs):
+        self.fail_silently = fail_silently
+    
+    def open(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    def send_messages(self, messages):
+        """Send SMSMessage objects, returns the number sent"""
+        raise NotImplementedError
+
+class ConsoleSMSBackend(BaseSMSBackend):
+    """Writes messages to stdout, for development"""
+    
+    def __init__(self, *args, stream=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+    
+    def send_messages(self, messages):
+        with self._lock:
+            for message in messages:
+                self.stream.write(f'SMS to {message.to}: {message.body}\n')
+            self.stream.flush()
+        return len(messages)
+
+# Messages sent through LocMemSMSBackend, like django.core.mail.outbox
+outbox = []
+_outbox_lock = threading.Lock()
+
+class LocMemSMSBackend(BaseSMSBackend):
+    """Keeps messages in notifications.sms.outbox, for tests"""
+    
+    def send_messages(self, messages):
+        with _outbox_lock:
+            outbox.extend(messages)
+        return len(messages)
+
+def get_sms_backend(backend=None, **kwargs):
+    return import_string(backend or getattr(settings, 'SMS_BACKEND', 'notifications.sms.ConsoleSMSBackend'))(**kwargs)
\ No newline at end of file
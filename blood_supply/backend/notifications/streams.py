@@ -0,0 +1,103 @@
+"""
+Server-sent event stream of a user's notifications and emergency requests
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from .hub import OVERFLOW, Event, get_hub
+from .models import Notification
+from .serializers import NotificationSerializer
+
+def notification_event(notification):
+    return Event('notification', NotificationSerializer(notification).data, id=notification.id)
+
+def emergency_event(blood_request):
+    # Broadcasts carry no id, they are not replayed on resume
+    hospital = blood_request.hospital
+    return Event('emergency_request', {
+        'request_id': blood_request.id,
+        'hospital': hospital.hospital_name or hospital.username,
+        'city': hospital.city,
+        'blood_group': blood_request.blood_group,
+        'component_type': blood_request.component_type,
+        'quantity_required': blood_request.quantity_required,
+        'urgency': blood_request.urgency,
+        'required_by': blood_request.required_by,
+    })
+
+def publish_notifications(notifications):
+    """Push new notifications to their users' streams once the transaction commits"""
+    def publish():
+        hub = get_hub()
+        for notification in notifications:
+            channel = f'user:{notification.user_id}'
+            if hub.is_subscribed(channel):
+                hub.publish(channel, notification_event(notification))
+    transaction.on_commit(publish)
+
+def publish_emergency_request(blood_request):
+    """Broadcast a critical request to the streams of its city once the transaction commits"""
+    def publish():
+        hub = get_hub()
+        channel = f'emergency:{blood_request.hospital.city}'
+        if hub.is_subscribed(channel):
+            hub.publish(channel, emergency_event(blood_request))
+    transaction.on_commit(publish)
+
+def stream_channels(user):
+    from ai_engine.spatial_index import is_blood_bank_site
+    
+    channels = [f'user:{user.pk}']
+    if is_blood_bank_site(user) and user.city:
+        channels.append(f'emergency:{user.city}')
+    return channels
+
+def format_event(event):
+    lines = []
+    if event.id is not None:
+        lines.append(f'id: {event.id}')
+    lines.append(f'event: {event.name}')
+    lines.append(f'data: {json.dumps(event.data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+def _missed_notifications(user_id, last_event_id):
+    limit = getattr(settings, 'SSE_REPLAY_LIMIT', 500)
+    return [
+        notification_event(notification)
+        for notification in Notification.objects.filter(user_id=user_id, id__gt=last_event_id).order_by('id')[:limit]
+    ]
+
+async def event_stream(user, last_event_id=None):
+    """
+    Yield the SSE stream: notifications missed since last_event_id, then live
+    events, with a comment line as heartbeat when nothing happens.
+    """
+    heartbeat = getattr(settings, 'SSE_HEARTBEAT_INTERVAL', 15)
+    # Subscribe before reading the backlog so nothing committed in between is lost
+    subscription = get_hub().subscribe(stream_channels(user))
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        
+        replayed = set()
+        if last_event_id is not None:
+            for event in await sync_to_async(_missed_notifications)(user.pk, last_event_id):
+                replayed.add(event.id)
+                yield format_event(event)
+        
+        while True:
+            event = await subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ': heartbeat\n\n'
+                continue
+            if event is OVERFLOW:
+                # Too slow to keep up, the client reconnects and resumes from the database
+                break
+            if event.id in replayed:
+                continue  # Already sent from the backlog
+            # Not compared with the highest id sent: a row committed late arrives with a lower id
+            yield format_event(event)
+    finally:
+        subscription.close()
\ No newline at end of file
@@ -1,3 +1,359 @@
-from django.test import TestCase
+import socketserver
+import threading
+import time
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import User
+from . import sms
+from .alerts import evaluate_stock_alerts
+from .delivery import Dispatcher, RateLimiter, claim_batch
+from .hub import PollingHub
+from .models import AlertState, Notification
+from .services import create_notifications
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: records each message's recipients and body"""
+    
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+    
+    def handle(self):
+        self.server.connections += 1
+        recipients = []
+        self.reply('220 stub ready')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip(' <>'))
+            if command == 'DATA':
+                self.reply('354 go ahead')
+                body = []
+                while (data := self.rfile.readline().decode()) not in ('.\r\n', ''):
+                    body.append(data)
+                self.server.messages.append((recipients, ''.join(body)))
+                recipients = []
+            self.reply('250 ok')
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPStubHandler)
+        self.messages = []
+        self.connections = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+class FailingSMSBackend(sms.BaseSMSBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('gateway unavailable')
+
+class FlakySMSBackend(sms.LocMemSMSBackend):
+    # Message bodies whose first send fails
+    failing = set()
+    
+    def send_messages(self, messages):
+        for message in messages:
+            if message.body in self.failing:
+                self.failing.discard(message.body)
+                raise ConnectionError('gateway timeout')
+        return super().send_messages(messages)
+
+class DispatcherTest(TestCase):
+    def setUp(self):
+        self.smtp = SMTPStub()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        sms.outbox.clear()
+        self.user = User.objects.create(
+            username='bank', phone='9000000001', user_type='BLOOD_BANK', city='Pune', email='bank@example.com'
+        )
+    
+    def notify(self, sent_via, count=1):
+        return Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='EMERGENCY_REQUEST',
+                         title='Emergency', message=f'Message {index}', sent_via=sent_via)
+            for index in range(count)
+        ])
+    
+    def smtp_settings(self, **extra):
+        return override_settings(**{
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1',
+            'EMAIL_PORT': self.smtp.server_address[1],
+            'SMS_BACKEND': 'notifications.sms.LocMemSMSBackend',
+            'NOTIFICATION_DELIVERY_RATE_LIMITS': {},
+            **extra
+        })
+    
+    def test_delivers_email_and_sms_over_reused_connections(self):
+        self.notify('EMAIL', count=5)
+        self.notify('SMS', count=3)
+        self.notify('IN_APP')
+        
+        with self.smtp_settings(), Dispatcher(workers=1, batch_size=4) as dispatcher:
+            self.assertEqual(dispatcher.run_pending(), 8)
+            metrics = dispatcher.metrics.snapshot()
+        
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertEqual(self.smtp.messages[0][0], ['bank@example.com'])
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual([message.to for message in sms.outbox], ['9000000001'] * 3)
+        self.assertEqual(metrics['EMAIL']['sent'], 5)
+        self.assertEqual(metrics['SMS']['sent'], 3)
+        self.assertEqual(Notification.objects.filter(is_sent=True, sent_at__isnull=False).count(), 8)
+        self.assertFalse(Notification.objects.get(sent_via='IN_APP').is_sent)
+    
+    def test_failures_back_off_then_give_up(self):
+        [notification] = self.notify('SMS')
+        
+        with self.smtp_settings(SMS_BACKEND='notifications.tests.FailingSMSBackend',
+                                NOTIFICATION_DELIVERY_MAX_ATTEMPTS=2), Dispatcher(workers=2) as dispatcher:
+            self.assertEqual(dispatcher.run_once(), 1)
+            notification.refresh_from_db()
+            self.assertEqual(notification.delivery_attempts, 1)
+            self.assertGreater(notification.next_attempt_at, timezone.now())
+            self.assertIn('gateway unavailable', notification.delivery_error)
+            
+            # Not due until its backoff has passed
+            self.assertEqual(dispatcher.run_once(), 0)
+            Notification.objects.filter(id=notification.id).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(dispatcher.run_once(), 1)
+            self.assertEqual(dispatcher.run_once(), 0)
+            metrics = dispatcher.metrics.snapshot()['SMS']
+        
+        notification.refresh_from_db()
+        self.assertFalse(notification.is_sent)
+        self.assertEqual(notification.delivery_attempts, 2)
+        self.assertEqual((metrics['retried'], metrics['failed']), (1, 1))
+    
+    def test_failed_send_is_retried_without_holding_back_the_batch(self):
+        self.notify('SMS', count=3)
+        FlakySMSBackend.failing = {'Emergency: Message 1'}
+        
+        with self.smtp_settings(SMS_BACKEND='notifications.tests.FlakySMSBackend'), Dispatcher(workers=2) as dispatcher:
+            self.assertEqual(dispatcher.run_once(), 3)
+            failed = Notification.objects.get(message='Message 1')
+            self.assertFalse(failed.is_sent)
+            self.assertEqual(failed.delivery_attempts, 1)
+            self.assertIsNone(failed.delivery_locked_until)
+            self.assertGreater(failed.next_attempt_at, timezone.now())
+            self.assertEqual(Notification.objects.filter(is_sent=True).count(), 2)
+            
+            Notification.objects.filter(id=failed.id).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(dispatcher.run_once(), 1)
+        
+        self.assertTrue(Notification.objects.get(id=failed.id).is_sent)
+        self.assertEqual(sorted(message.body for message in sms.outbox),
+                         [f'Emergency: Message {index}' for index in range(3)])
+    
+    def test_sends_over_the_rate_limit_wait_their_turn(self):
+        self.notify('SMS', count=25)
+        
+        with self.smtp_settings(NOTIFICATION_DELIVERY_RATE_LIMITS={'SMS': 20}), Dispatcher(workers=4) as dispatcher:
+            started = time.monotonic()
+            self.assertEqual(dispatcher.run_pending(), 25)
+            elapsed = time.monotonic() - started
+            metrics = dispatcher.metrics.snapshot()['SMS']
+        
+        # A burst of 20, then the last 5 at 20 per second
+        self.assertGreaterEqual(elapsed, 0.24)
+        self.assertEqual(len(sms.outbox), 25)
+        self.assertEqual((metrics['sent'], metrics['retried'], metrics['failed']), (25, 0, 0))
+    
+    def test_leased_rows_are_not_claimed_twice(self):
+        self.notify('EMAIL', count=6)
+        
+        first = claim_batch('dispatcher-1', batch_size=4)
+        second = claim_batch('dispatcher-2', batch_size=4)
+        
+        self.assertEqual(len(first), 4)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({n.id for n in first} & {n.id for n in second})
+        self.assertEqual(claim_batch('dispatcher-3'), [])
+        
+        # A dispatcher that died loses its lease
+        Notification.objects.filter(delivery_locked_by='dispatcher-1').update(
+            delivery_locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(len(claim_batch('dispatcher-3')), 4)
+    
+    def test_rate_limiter_spaces_sends(self):
+        limiter = RateLimiter(rate=50, burst=1)
+        started = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+class ConcurrentDispatcherTest(TransactionTestCase):
+    def setUp(self):
+        sms.outbox.clear()
+        user = User.objects.create(username='bank', phone='9000000001', user_type='BLOOD_BANK', city='Pune')
+        Notification.objects.bulk_create([
+            Notification(user=user, notification_type='EMERGENCY_REQUEST',
+                         title='Emergency', message=f'Message {index}', sent_via='SMS')
+            for index in range(40)
+        ])
+    
+    @override_settings(SMS_BACKEND='notifications.sms.LocMemSMSBackend', NOTIFICATION_DELIVERY_RATE_LIMITS={})
+    def test_two_dispatchers_never_send_twice(self):
+        barrier = threading.Barrier(2)
+        attempted = []
+        
+        def dispatch(worker_id):
+            try:
+                with Dispatcher(worker_id=worker_id, workers=2, batch_size=5) as dispatcher:
+                    barrier.wait()
+                    attempted.append(dispatcher.run_pending())
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=dispatch, args=(f'dispatcher-{index}',)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        bodies = [message.body for message in sms.outbox]
+        self.assertEqual(sum(attempted), 40)
+        self.assertEqual(len(bodies), 40)
+        self.assertEqual(len(set(bodies)), 40)
+        self.assertEqual(Notification.objects.filter(is_sent=True).count(), 40)
+
+class NotificationStreamTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune')
+        self.url = f'/api/notifications/stream/?token={AccessToken.for_user(user)}'
+    
+    def test_wsgi_requests_are_refused(self):
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, 501)
+    
+    async def test_asgi_requests_get_an_event_stream(self):
+        response = await AsyncClient().get(self.url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = response.streaming_content
+        self.assertEqual(await anext(chunks), b'retry: 5000\n\n')
+        await chunks.aclose()
+
+
+class PollingHubTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune')
+        self.hub = PollingHub()
+    
+    def notify(self, **fields):
+        return Notification.objects.create(
+            user=self.user, notification_type='EMERGENCY_REQUEST', title='Emergency', message='Message', **fields
+        )
+    
+    def fetched_ids(self):
+        return [event.id for _, event in self.hub._fetch_new()]
+    
+    def test_poller_restarts_from_the_latest_rows(self):
+        self.hub._start_from_latest()
+        self.notify()
+        
+        # Nobody is subscribed, so the poller starts and stops at once
+        async_to_sync(self.hub._poll)()
+        
+        self.assertEqual(self.fetched_ids(), [])
+    
+    def test_rows_committed_out_of_id_order_are_delivered(self):
+        self.hub._start_from_latest()
+        first, late, last = self.notify(), self.notify(), self.notify()
+        late_id = late.id
+        # The middle row got its id first but has not committed yet
+        late.delete()
+        
+        self.assertEqual(self.fetched_ids(), [first.id, last.id])
+        
+        self.notify(id=late_id)
+        
+        self.assertEqual(self.fetched_ids(), [late_id])
+        self.assertEqual(self.fetched_ids(), [])
+
+class StockAlertTest(TestCase):
+    def setUp(self):
+        self.bank = User.objects.create(username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune')
+    
+    def stock(self, units):
+        # A savepoint per write, as each inventory write runs in its own transaction
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            evaluate_stock_alerts(self.bank.pk, 'O+', 'RBC', units, None)
+    
+    def low_stock_alerts(self):
+        return Notification.objects.filter(user=self.bank, notification_type='LOW_STOCK').count()
+    
+    def test_crossing_the_threshold_fires_once(self):
+        self.stock(20)
+        self.assertEqual(self.low_stock_alerts(), 0)
+        
+        self.stock(3)
+        self.stock(2)
+        self.stock(1)
+        
+        self.assertEqual(self.low_stock_alerts(), 1)
+        self.assertTrue(AlertState.objects.get(blood_bank=self.bank, alert_type='LOW_STOCK').is_active)
+    
+    @override_settings(ALERT_COALESCE_WINDOW=0)
+    def test_recovering_and_crossing_again_fires_again(self):
+        self.stock(3)
+        self.stock(20)
+        self.assertFalse(AlertState.objects.get(blood_bank=self.bank, alert_type='LOW_STOCK').is_active)
+        
+        self.stock(3)
+        
+        self.assertEqual(self.low_stock_alerts(), 2)
+    
+    def test_flapping_within_the_coalesce_window_fires_once(self):
+        self.stock(3)
+        self.stock(20)
+        self.stock(3)
+        
+        self.assertEqual(self.low_stock_alerts(), 1)
+
+def process_cache(name):
+    """Settings giving this thread the private cache of one server process"""
+    return override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name}
+    })
+
+class NotificationStatsEtagTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='bank', phone='9000000000', user_type='BLOOD_BANK', city='Pune')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def stats(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/notifications/stats/', **headers)
+    
+    def test_writes_from_another_process_change_the_etag(self):
+        with process_cache('web'):
+            etag = self.stats()['ETag']
+            self.assertEqual(self.stats(etag).status_code, 304)
+        
+        # A worker process with its own cache fans out a notification
+        with process_cache('worker'), self.captureOnCommitCallbacks(execute=True):
+            create_notifications([Notification(
+                user=self.user, notification_type='EMERGENCY_REQUEST', title='Emergency', message='Message'
+            )])
+        
+        with process_cache('web'):
+            response = self.stats(etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['unread'], 1)
+            self.assertNotEqual(response['ETag'], etag)
\ No newline at end of file
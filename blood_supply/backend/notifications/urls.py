@@ -3,7 +3,8 @@ from .views import (
     NotificationListView,
     NotificationDetailView,
     MarkAllAsReadView,
-    NotificationStatsView
+    NotificationStatsView,
+    notification_stream
 )
 
 urlpatterns = [
@@ -11,4 +12,5 @@ urlpatterns = [
     path('<int:pk>/', NotificationDetailView.as_view(), name='notification-detail'),
     path('mark-all-read/', MarkAllAsReadView.as_view(), name='mark-all-read'),
     path('stats/', NotificationStatsView.as_view(), name='notification-stats'),
+    path('stream/', notification_stream, name='notification-stream'),
 ]
\ No newline at end of file
@@ -4,16 +4,28 @@ from django.shortcuts import render
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from .counters import adjust_counters, notification_counts
 from .models import Notification
+from .streams import event_stream
+from utils.fieldsets import SparseFieldsetsViewMixin
+from utils.pagination import KeysetPagination
+from utils.versioning import scoped_etag
 from .serializers import NotificationSerializer
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(SparseFieldsetsViewMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', 'id')
     
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(user=self.request.user)
 
 class NotificationDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = NotificationSerializer
@@ -24,26 +36,78 @@ class NotificationDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
+        # Conditional so that concurrent reads of one notification count once
+        if Notification.objects.filter(pk=instance.pk, is_read=False).update(is_read=True):
+            adjust_counters({request.user.pk: (0, -1)})
         instance.is_read = True
-        instance.save()
         return Response(NotificationSerializer(instance).data)
 
 class MarkAllAsReadView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        marked = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        adjust_counters({request.user.pk: (0, -marked)})
         return Response({'message': 'All notifications marked as read'})
 
+def notification_stats_etag(request, *args, **kwargs):
+    return scoped_etag(request, [f'notifications:{request.user.pk}'])
+
 class NotificationStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @method_decorator(condition(etag_func=notification_stats_etag))
     def get(self, request):
-        total = Notification.objects.filter(user=request.user).count()
-        unread = Notification.objects.filter(user=request.user, is_read=False).count()
+        # One counter row instead of counting the user's notifications
+        total, unread = notification_counts(request.user.pk)
         
         return Response({
             'total': total,
             'unread': unread,
             'read': total - unread
-        })
\ No newline at end of file
+        })
+
+def _stream_user(request):
+    """JWT from the Authorization header, or ?token= since EventSource cannot set headers"""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    
+    authentication = JWTAuthentication()
+    try:
+        token = request.GET.get('token')
+        if token:
+            return authentication.get_user(authentication.get_validated_token(token))
+        result = authentication.authenticate(request)
+    except Exception:
+        return None
+    return result[0] if result else None
+
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of the user's new notifications, plus critical
+    requests in their city for blood banks.
+    
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) and first
+    receive the notifications they missed. Only served by the ASGI
+    application: under WSGI the response would be buffered forever.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'The notification stream needs the ASGI server, poll /api/notifications/ instead'},
+            status=501
+        )
+    
+    user = await sync_to_async(_stream_user)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Last-Event-ID must be a notification id'}, status=400)
+    
+    response = StreamingHttpResponse(event_stream(user, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop proxies (nginx) from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
\ No newline at end of file
@@ -0,0 +1,65 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from taskqueue.queue import default_worker_id, run_pending
+
+def _worker(index, poll_interval, visibility_timeout, burst):
+    # Let the parent handle Ctrl+C and stop the children with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_id = f'{default_worker_id()}:{index}'
+    
+    while True:
+        close_old_connections()
+        try:
+            executed = run_pending(worker_id, visibility_timeout)
+        except Exception as e:
+            print(f"Error in task worker {worker_id}: {e}")
+            executed = 0
+        
+        if burst and not executed:
+            return
+        if not executed:
+            time.sleep(poll_interval)
+
+class Command(BaseCommand):
+    help = 'Run background task queue workers'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--visibility-timeout', type=int, default=None,
+                            help='Seconds a claimed task stays leased before another worker may retry it')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queue is empty')
+    
+    def handle(self, *args, **options):
+        args = (options['poll_interval'], options['visibility_timeout'], options['burst'])
+        
+        if options['workers'] <= 1:
+            _worker(0, *args)
+            return
+        
+        # Children must not share the parent's database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_worker, args=(index,) + args, daemon=True)
+            for index in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f'Started {len(processes)} task workers')
+        
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
+        
+        self.stdout.write(self.style.SUCCESS('Task workers stopped'))
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Database-backed task queue
+
+Functions decorated with @task are registered by name; enqueue() writes a
+Task row in the caller's transaction, so the task becomes visible to
+workers only once the data it refers to is committed. Workers claim tasks
+with a compare-and-set UPDATE that takes a lease (visibility timeout);
+a task whose worker dies is picked up again once its lease expires.
+"""
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Task
+
+_registry = {}
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+def task(func=None, name=None, max_attempts=None):
+    """Register a function as a task; adds func.enqueue(**kwargs)"""
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        _registry[task_name] = func
+        func.task_name = task_name
+        func.enqueue = lambda **kwargs: enqueue(task_name, max_attempts=max_attempts, **kwargs)
+        return func
+    
+    if func is not None:
+        return register(func)
+    return register
+
+def enqueue(name, max_attempts=None, run_after=None, **payload):
+    """Queue a registered task with JSON-serializable keyword arguments"""
+    if name not in _registry:
+        raise KeyError(f'Unknown task: {name}')
+    
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts or _setting('TASK_QUEUE_MAX_ATTEMPTS', 5),
+        run_after=run_after or timezone.now()
+    )
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def _claimable(now):
+    return Q(status='PENDING', run_after__lte=now) | Q(status='RUNNING', locked_until__lt=now)
+
+def claim_task(worker_id, visibility_timeout=None):
+    """Lease the next due task to worker_id, or return None"""
+    if visibility_timeout is None:
+        visibility_timeout = _setting('TASK_QUEUE_VISIBILITY_TIMEOUT', 300)
+    now = timezone.now()
+    
+    candidates = Task.objects.filter(_claimable(now)).order_by('run_after').values_list('id', flat=True)[:10]
+    for task_id in list(candidates):
+        # Only one worker can win the UPDATE; losers move on to the next candidate
+        claimed = Task.objects.filter(_claimable(now), id=task_id).update(
+            status='RUNNING',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F('attempts') + 1,
+            updated_at=now
+        )
+        if claimed:
+            return Task.objects.get(id=task_id)
+    return None
+
+def _retry_delay(attempts):
+    base = _setting('TASK_QUEUE_RETRY_BACKOFF', 10)
+    return min(base * 2 ** (attempts - 1), 3600)
+
+def _finish(task_obj, **fields):
+    # A worker whose lease expired must not overwrite the new owner's state
+    return Task.objects.filter(
+        id=task_obj.id, status='RUNNING', locked_by=task_obj.locked_by
+    ).update(locked_until=None, updated_at=timezone.now(), **fields)
+
+def run_task(task_obj):
+    """Execute a claimed task; returns its final or rescheduled status"""
+    func = _registry.get(task_obj.name)
+    
+    if func is None:
+        error = f'Unknown task: {task_obj.name}'
+    elif task_obj.attempts > task_obj.max_attempts:
+        # Reclaimed after its lease expired on the last attempt
+        error = task_obj.last_error or 'Visibility timeout exceeded on the last attempt'
+    else:
+        try:
+            with transaction.atomic():
+                func(**task_obj.payload)
+        except Exception as e:
+            print(f"Error running task {task_obj.name} ({task_obj.id}): {e}")
+            error = traceback.format_exc()
+        else:
+            _finish(task_obj, status='DONE', last_error='')
+            return 'DONE'
+    
+    if func is not None and task_obj.attempts < task_obj.max_attempts:
+        _finish(
+            task_obj,
+            status='PENDING',
+            last_error=error,
+            run_after=timezone.now() + timedelta(seconds=_retry_delay(task_obj.attempts))
+        )
+        return 'PENDING'
+    
+    _finish(task_obj, status='FAILED', last_error=error)
+    return 'FAILED'
+
+def run_pending(worker_id=None, visibility_timeout=None, limit=None):
+    """Run due tasks until the queue is empty; returns the number executed"""
+    worker_id = worker_id or default_worker_id()
+    count = 0
+    while limit is None or count < limit:
+        task_obj = claim_task(worker_id, visibility_timeout)
+        if task_obj is None:
+            break
+        run_task(task_obj)
+        count += 1
+    return count
\ No newline at end of file
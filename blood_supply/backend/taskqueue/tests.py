@@ -0,0 +1,111 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from .models import Task
+from .queue import claim_task, enqueue, run_task, task
+
+calls = []
+
+@task(name='taskqueue.tests.record')
+def record(value):
+    calls.append(value)
+
+@task(name='taskqueue.tests.fail')
+def fail():
+    raise RuntimeError('boom')
+
+class ClaimTest(TransactionTestCase):
+    def test_concurrent_workers_claim_each_task_once(self):
+        for value in range(5):
+            enqueue('taskqueue.tests.record', value=value)
+        barrier = threading.Barrier(10)
+        claimed = []
+        
+        def worker(index):
+            try:
+                barrier.wait()
+                while True:
+                    task_obj = claim_task(f'worker-{index}')
+                    if task_obj is None:
+                        break
+                    claimed.append(task_obj.id)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(sorted(claimed), sorted(Task.objects.values_list('id', flat=True)))
+        self.assertEqual(Task.objects.filter(status='RUNNING', attempts=1).count(), 5)
+
+@override_settings(TASK_QUEUE_RETRY_BACKOFF=10)
+class RunTaskTest(TestCase):
+    def setUp(self):
+        calls.clear()
+    
+    def expire_lease(self, task_obj):
+        Task.objects.filter(id=task_obj.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+    
+    def make_due(self, task_obj):
+        Task.objects.filter(id=task_obj.id).update(run_after=timezone.now() - timedelta(seconds=1))
+    
+    def test_leased_task_is_not_claimed_again(self):
+        enqueue('taskqueue.tests.record', value=1)
+        
+        self.assertIsNotNone(claim_task('worker-1'))
+        self.assertIsNone(claim_task('worker-2'))
+    
+    def test_expired_lease_is_reclaimed_and_the_old_worker_cannot_finish(self):
+        task_id = enqueue('taskqueue.tests.record', value=1).id
+        stale = claim_task('worker-1')
+        self.expire_lease(stale)
+        
+        reclaimed = claim_task('worker-2')
+        
+        self.assertEqual(reclaimed.id, task_id)
+        self.assertEqual(reclaimed.locked_by, 'worker-2')
+        self.assertEqual(reclaimed.attempts, 2)
+        run_task(stale)
+        self.assertEqual(Task.objects.get(id=task_id).status, 'RUNNING')
+        self.assertEqual(run_task(reclaimed), 'DONE')
+        self.assertEqual(Task.objects.get(id=task_id).status, 'DONE')
+    
+    def test_failure_is_retried_with_exponential_backoff(self):
+        task_id = enqueue('taskqueue.tests.fail').id
+        
+        delays = []
+        for attempt in range(2):
+            started = timezone.now()
+            self.assertEqual(run_task(claim_task('worker-1')), 'PENDING')
+            task_obj = Task.objects.get(id=task_id)
+            delays.append(round((task_obj.run_after - started).total_seconds()))
+            self.make_due(task_obj)
+        
+        self.assertEqual(delays, [10, 20])
+        self.assertIn('RuntimeError: boom', task_obj.last_error)
+        self.assertEqual(task_obj.attempts, 2)
+    
+    def test_last_failed_attempt_fails_the_task(self):
+        task_id = enqueue('taskqueue.tests.fail', max_attempts=2).id
+        
+        self.assertEqual(run_task(claim_task('worker-1')), 'PENDING')
+        self.make_due(Task.objects.get(id=task_id))
+        self.assertEqual(run_task(claim_task('worker-1')), 'FAILED')
+        
+        self.assertIsNone(claim_task('worker-1'))
+        self.assertEqual(Task.objects.get(id=task_id).status, 'FAILED')
+    
+    def test_lease_expiring_on_the_last_attempt_fails_without_running(self):
+        task_id = enqueue('taskqueue.tests.record', max_attempts=1, value=1).id
+        self.expire_lease(claim_task('worker-1'))
+        
+        self.assertEqual(run_task(claim_task('worker-2')), 'FAILED')
+        
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.get(id=task_id).status, 'FAILED')
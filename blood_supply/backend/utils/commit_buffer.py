@@ -0,0 +1,54 @@
+"""
+Per-transaction write buffers
+"""
+import threading
+import weakref
+
+from django.db import connection, transaction
+
+class CommitBuffer:
+    """
+    Collect items written during a transaction and hand them to flush(items)
+    after the outermost transaction commits, one call per savepoint that
+    wrote items.
+    
+    Each savepoint gets its own batch registered with on_commit while that
+    savepoint is active, so rolling back a savepoint (or the transaction)
+    drops exactly its items. Outside a transaction every item is flushed
+    straight away.
+    """
+    
+    def __init__(self, flush):
+        self.flush = flush
+        self._local = threading.local()
+    
+    def append(self, item):
+        if not connection.in_atomic_block:
+            self.flush([item])
+            return
+        self._batch().append(item)
+    
+    def _batch(self):
+        # Only the on_commit queue holds a batch strongly: once it is run or
+        # discarded by a rollback its entry disappears from this mapping too
+        batches = getattr(self._local, 'batches', None)
+        if batches is None:
+            batches = self._local.batches = weakref.WeakValueDictionary()
+        
+        # Savepoint ids are unique per connection, so a path is never reused
+        # while a batch registered under it is still pending
+        path = tuple(connection.savepoint_ids)
+        batch = batches.get(path)
+        if batch is None:
+            batch = batches[path] = _Batch(self.flush)
+            transaction.on_commit(batch)
+        return batch.items
+
+class _Batch:
+    def __init__(self, flush):
+        self.flush = flush
+        self.items = []
+    
+    def __call__(self):
+        if self.items:
+            self.flush(self.items)
\ No newline at end of file
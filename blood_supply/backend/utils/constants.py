@@ -38,4 +38,71 @@ PRIORITY_LEVELS = {
 # Inventory thresholds
 LOW_STOCK_THRESHOLD = 5
 CRITICAL_STOCK_THRESHOLD = 2
-EXPIRY_WARNING_DAYS = 7
\ No newline at end of file
+EXPIRY_WARNING_DAYS = 7
+
+# Expiry risk buckets: (max days until expiry, risk level, confidence), checked in order
+EXPIRY_RISK_LEVELS = [
+    (0, 'EXPIRED', 1.0),
+    (3, 'CRITICAL', 0.95),
+    (7, 'HIGH', 0.85),
+    (14, 'MEDIUM', 0.70),
+    (30, 'LOW', 0.50),
+]
+EXPIRY_RISK_DEFAULT = ('SAFE', 0.30)
+
+EXPIRY_RISK_ACTIONS = {
+    'EXPIRED': 'Immediate disposal required',
+    'CRITICAL': 'Use immediately or transfer to nearby facilities',
+    'HIGH': 'Prioritize usage in next 3 days',
+    'MEDIUM': 'Schedule for upcoming requests',
+    'LOW': 'Monitor regularly',
+    'SAFE': 'Standard inventory'
+}
+
+# Geo search
+DONOR_SEARCH_RADIUS_KM = 50
+
+# ABO/Rh compatibility
+# Donor groups each recipient group may receive, exact match first
+RED_CELL_DONORS = {
+    'A+': ['A+', 'A-', 'O+', 'O-'],
+    'A-': ['A-', 'O-'],
+    'B+': ['B+', 'B-', 'O+', 'O-'],
+    'B-': ['B-', 'O-'],
+    'O+': ['O+', 'O-'],
+    'O-': ['O-'],
+    'AB+': ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'],
+    'AB-': ['AB-', 'A-', 'B-', 'O-'],
+}
+
+# Plasma carries antibodies, so compatibility runs the other way (AB is universal); Rh does not matter
+PLASMA_DONORS = {
+    'A+': ['A+', 'A-', 'AB+', 'AB-'],
+    'A-': ['A-', 'A+', 'AB-', 'AB+'],
+    'B+': ['B+', 'B-', 'AB+', 'AB-'],
+    'B-': ['B-', 'B+', 'AB-', 'AB+'],
+    'O+': ['O+', 'O-', 'A+', 'A-', 'B+', 'B-', 'AB+', 'AB-'],
+    'O-': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
+    'AB+': ['AB+', 'AB-'],
+    'AB-': ['AB-', 'AB+'],
+}
+
+# Whole blood carries both red cells and plasma: ABO-identical, Rh as for red cells
+WHOLE_BLOOD_DONORS = {
+    recipient: [donor for donor in donors if donor.rstrip('+-') == recipient.rstrip('+-')]
+    for recipient, donors in RED_CELL_DONORS.items()
+}
+
+# Platelets: ABO plasma-compatible, Rh-negative recipients only from Rh-negative donors
+PLATELET_DONORS = {
+    recipient: [donor for donor in donors if recipient.endswith('+') or donor.endswith('-')]
+    for recipient, donors in PLASMA_DONORS.items()
+}
+
+COMPATIBLE_DONORS = {
+    'WHOLE_BLOOD': WHOLE_BLOOD_DONORS,
+    'RBC': RED_CELL_DONORS,
+    'PLASMA': PLASMA_DONORS,
+    'PLATELETS': PLATELET_DONORS,
+    'CRYOPRECIPITATE': {recipient: [recipient] + [g for g in BLOOD_GROUPS if g != recipient] for recipient in BLOOD_GROUPS},
+}
\ No newline at end of file
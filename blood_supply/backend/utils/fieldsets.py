@@ -0,0 +1,99 @@
+"""
+Sparse fieldsets: ?fields=a,b and ?exclude=c on list and detail GETs
+
+The serializer mixin prunes the output fields and the view mixin loads
+only the columns (and related rows) those fields read.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+def _split(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+def requested_fieldset(request):
+    """Return (fields, exclude) name sets from the query string, empty when not requested"""
+    if request is None or request.method != 'GET':
+        return set(), set()
+    params = getattr(request, 'query_params', request.GET)
+    return _split(params.get('fields')), _split(params.get('exclude'))
+
+class SparseFieldsetsMixin:
+    """
+    ModelSerializer mixin that honours ?fields= and ?exclude= on the
+    top-level serializer of a GET. Meta.field_dependencies maps fields that
+    read model properties to the columns they need.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if parent is not None and not (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            return fields
+        
+        include, exclude = requested_fieldset(self.context.get('request'))
+        if not include and not exclude:
+            return fields
+        
+        unknown = (include | exclude) - set(fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}"})
+        
+        for name in list(fields):
+            if (include and name not in include) or name in exclude:
+                del fields[name]
+        return fields
+
+def sparse_queryset(queryset, fields, dependencies=None, always=()):
+    """
+    Restrict queryset to the columns read by serializer fields.
+    
+    Relations rendered as objects (not as primary keys) are select_related,
+    every other join is dropped. Returns the queryset unchanged when a field
+    reads the whole instance.
+    """
+    meta = queryset.model._meta
+    dependencies = dependencies or {}
+    columns = {meta.pk.name, *always}
+    related = set()
+    
+    for name, field in fields.items():
+        if name in dependencies:
+            columns.update(dependencies[name])
+            continue
+        if field.source == '*':
+            return queryset
+        
+        attr = field.source.split('.')[0]
+        if attr.startswith('get_') and attr.endswith('_display'):
+            attr = attr[len('get_'):-len('_display')]
+        try:
+            model_field = meta.get_field(attr)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.concrete or model_field.many_to_many:
+            return queryset
+        
+        columns.add(attr)
+        if model_field.is_relation and not isinstance(field, serializers.RelatedField):
+            related.add(attr)
+    
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+class SparseFieldsetsViewMixin:
+    """Generic view mixin that loads only what a sparse fieldset serializes"""
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        include, exclude = requested_fieldset(self.request)
+        if not include and not exclude:
+            return queryset
+        
+        serializer = self.get_serializer()
+        return sparse_queryset(
+            queryset,
+            serializer.fields,
+            dependencies=getattr(serializer.Meta, 'field_dependencies', None),
+            always=[name.lstrip('-') for name in getattr(self, 'keyset_ordering', ())]
+        )
\ No newline at end of file
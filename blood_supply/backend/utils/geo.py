@@ -0,0 +1,80 @@
+"""
+Vectorized great-circle distance helpers.
+
+All functions accept scalars or NumPy-broadcastable arrays. Coordinates in
+degrees may be floats, Decimals or None (treated as NaN); distances are
+returned in kilometres.
+"""
+from math import floor, cos, radians
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LATITUDE = 111.195
+
+# Grid cells are GEOCELL_SIZE_DEGREES square (about 28 km north-south)
+GEOCELL_SIZE_DEGREES = 0.25
+
+def to_radians(degrees):
+    """Convert degrees (scalar, list or array, None allowed) to a float radian array"""
+    return np.radians(np.asarray(degrees, dtype=float))
+
+def haversine_radians(lat1, lon1, lat2, lon2):
+    """
+    Central angle between points whose coordinates are already in radians
+    """
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometres between points given in degrees
+    """
+    return EARTH_RADIUS_KM * haversine_radians(
+        to_radians(lat1), to_radians(lon1), to_radians(lat2), to_radians(lon2)
+    )
+
+def distances_from(latitude, longitude, latitudes, longitudes):
+    """
+    Distance in kilometres from one point to every point of the given arrays
+    """
+    return haversine_km(float(latitude), float(longitude), latitudes, longitudes)
+
+def geocell(latitude, longitude, size=GEOCELL_SIZE_DEGREES):
+    """
+    Grid cell id ("row:col") containing a point, or None without coordinates
+    """
+    if latitude is None or longitude is None:
+        return None
+    return f"{floor(float(latitude) / size)}:{floor(float(longitude) / size)}"
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    (min_lat, max_lat, min_lon, max_lon) in degrees enclosing a circle
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = radius_km / KM_PER_DEGREE_LATITUDE
+    # Longitude degrees shrink towards the poles
+    lon_delta = min(180.0, radius_km / (KM_PER_DEGREE_LATITUDE * max(cos(radians(latitude)), 0.01)))
+    
+    return (
+        max(-90.0, latitude - lat_delta),
+        min(90.0, latitude + lat_delta),
+        longitude - lon_delta,
+        longitude + lon_delta
+    )
+
+def geocells_around(latitude, longitude, radius_km, size=GEOCELL_SIZE_DEGREES):
+    """
+    Every grid cell that intersects the bounding box of a circle
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    
+    return [
+        f"{row}:{col}"
+        for row in range(floor(min_lat / size), floor(max_lat / size) + 1)
+        for col in range(floor(min_lon / size), floor(max_lon / size) + 1)
+    ]
\ No newline at end of file
@@ -1,23 +1,13 @@
 from datetime import datetime, timedelta
 from django.utils import timezone
-from math import radians, sin, cos, sqrt, atan2
+from utils.geo import haversine_km
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
     Calculate distance between two coordinates in kilometers
     using Haversine formula
     """
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1-a))
-    
-    return R * c
+    return float(haversine_km(lat1, lon1, lat2, lon2))
 
 def get_expiry_date(collection_date, component_type):
     """
@@ -53,4 +43,26 @@ def generate_batch_number(blood_bank_id, collection_date):
     date_str = collection_date.strftime('%Y%m%d')
     random_str = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
     
-    return f"BB{blood_bank_id:04d}-{date_str}-{random_str}"
\ No newline at end of file
+    return f"BB{blood_bank_id:04d}-{date_str}-{random_str}"
+
+def compatible_blood_groups(recipient_group, component_type='RBC', exact_only=False):
+    """
+    Donor blood groups usable for a recipient, exact match first
+    """
+    from utils.constants import COMPATIBLE_DONORS
+    
+    if exact_only:
+        return [recipient_group]
+    
+    table = COMPATIBLE_DONORS.get(component_type, COMPATIBLE_DONORS['RBC'])
+    return table.get(recipient_group, [recipient_group])
+
+def parse_bool(value, default=False):
+    """
+    Interpret a request parameter ("true", "0", True, ...) as a boolean
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+Keyset (cursor) pagination
+"""
+import base64
+import json
+from collections import OrderedDict
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on a stable composite ordering instead of OFFSET.
+    
+    Set as pagination_class on the high-volume lists, which also set
+    keyset_ordering, e.g. ('expiry_date', 'id') or ('-created_at', 'id');
+    the last field must be unique and none may be null. The cursor holds the
+    ordering values of the last row served and the next page is fetched with
+    a lexicographic "after this row" filter, so with a matching index every
+    page costs the same as the first.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    default_ordering = ('-id',)
+    
+    @property
+    def page_size(self):
+        return getattr(settings, 'PAGINATION_PAGE_SIZE', 50)
+    
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 200)
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+    
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'keyset_ordering', None) or self.default_ordering)
+    
+    def encode_cursor(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+    
+    def decode_cursor(self, cursor, fields):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError(cursor)
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except Exception:
+            raise NotFound('Invalid cursor')
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(view)
+        page_size = self.get_page_size(request)
+        
+        names = [name.lstrip('-') for name in self.ordering]
+        fields = [queryset.model._meta.get_field(name) for name in names]
+        queryset = queryset.order_by(*self.ordering)
+        
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(cursor, fields)
+            queryset = queryset.filter(self._after(names, values))
+        
+        rows = list(queryset[:page_size + 1])
+        self.has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        
+        self.next_cursor = None
+        if self.has_more:
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor([
+                field.value_to_string(last) for field in fields
+            ])
+        return rows
+    
+    def _after(self, names, values):
+        """(a, b, c) after (x, y, z): a > x, or a = x and b > y, or a = x, b = y and c > z"""
+        clauses = []
+        for position, ordering in enumerate(self.ordering):
+            lookup = 'lt' if ordering.startswith('-') else 'gt'
+            equal = {name: value for name, value in zip(names[:position], values[:position])}
+            clauses.append(Q(**equal, **{f'{names[position]}__{lookup}': values[position]}))
+        return reduce(lambda left, right: left | right, clauses)
+    
+    def get_next_link(self):
+        if not self.has_more:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+    
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+    
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('next_cursor', self.next_cursor),
+            ('has_more', self.has_more),
+            ('results', data),
+        ]))
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results', 'has_more'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'has_more': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Per-scope versions for cheap conditional GETs
+
+A scope names a slice of data (e.g. 'inventory:<bank_id>') and its version is
+read from the rows themselves: the latest updated_at and a row count, or the
+user's notification counter. One indexed aggregate per scope replaces the
+page's own queries, and every process sees the same version whichever process
+made the write, so nothing has to be shared through the cache.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+
+def _notification_version(user_id):
+    from notifications.counters import counter_version
+    return counter_version(user_id)
+
+def _inventory_version(blood_bank_id):
+    from inventory.models import BloodType, StockSummary
+    # Batches that never reach a summary row (quarantined, expired) only show in BloodType
+    batches = BloodType.objects.filter(blood_bank_id=blood_bank_id).aggregate(latest=Max('updated_at'), rows=Count('id'))
+    summaries = StockSummary.objects.filter(blood_bank_id=blood_bank_id).aggregate(latest=Max('updated_at'), rows=Count('id'))
+    return batches['latest'], batches['rows'], summaries['latest'], summaries['rows']
+
+def _donation_version(donor_id):
+    from inventory.models import BloodType
+    donations = BloodType.objects.filter(donor_id=donor_id).aggregate(latest=Max('updated_at'), rows=Count('id'))
+    return donations['latest'], donations['rows']
+
+def _request_version():
+    from inventory.models import BloodRequest
+    requests = BloodRequest.objects.aggregate(latest=Max('updated_at'), rows=Count('id'))
+    return requests['latest'], requests['rows']
+
+_RESOLVERS = {
+    'notifications': _notification_version,
+    'inventory': _inventory_version,
+    'donations': _donation_version,
+    'requests': _request_version,
+}
+
+def get_versions(*scopes):
+    """Current version of each scope, read from the database"""
+    versions = []
+    for scope in scopes:
+        name, _, arg = scope.partition(':')
+        resolver = _RESOLVERS[name]
+        versions.append(resolver(int(arg)) if arg else resolver())
+    return tuple(versions)
+
+def scoped_etag(request, scopes, *extra):
+    """
+    ETag for a per-user GET: the full path (filters, cursor, fields), the
+    user, the versions of scopes and any extra values (e.g. today's date for
+    data that ages).
+    """
+    user = request.user
+    raw = repr((
+        request.get_full_path(),
+        user.pk,
+        user.updated_at.isoformat() if getattr(user, 'updated_at', None) else None,
+        get_versions(*scopes),
+        extra
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
\ No newline at end of file
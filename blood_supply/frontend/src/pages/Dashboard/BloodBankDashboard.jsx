@@ -87,7 +87,7 @@ const BloodBankDashboard = () => {
   const fetchInventory = async () => {
     try {
       const response = await inventoryAPI.getInventory();
-      setInventory(response.data);
+      setInventory(response.data.results);
     } catch (error) {
       console.error('Error fetching inventory:', error);
     }
@@ -96,7 +96,7 @@ const BloodBankDashboard = () => {
   const fetchRequests = async () => {
     try {
       const response = await inventoryAPI.getRequests();
-      setRequests(response.data);
+      setRequests(response.data.results);
     } catch (error) {
       console.error('Error fetching requests:', error);
     }
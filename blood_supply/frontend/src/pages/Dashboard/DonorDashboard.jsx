@@ -71,7 +71,7 @@ const DonorDashboard = () => {
   const fetchDonations = async () => {
     try {
       const response = await inventoryAPI.getInventory({ donor: user?.id });
-      setDonations(response.data);
+      setDonations(response.data.results);
     } catch (error) {
       console.error('Error fetching donations:', error);
     }
@@ -89,7 +89,7 @@ const DonorDashboard = () => {
   const fetchUpcomingRequests = async () => {
     try {
       const response = await inventoryAPI.getRequests();
-      const filtered = response.data.filter(
+      const filtered = response.data.results.filter(
         request => request.blood_group === user?.blood_group && 
                    request.status === 'PENDING'
       );
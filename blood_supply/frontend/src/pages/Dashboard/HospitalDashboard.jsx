@@ -91,7 +91,7 @@ const HospitalDashboard = () => {
   const fetchRequests = async () => {
     try {
       const response = await inventoryAPI.getRequests();
-      setRequests(response.data);
+      setRequests(response.data.results);
     } catch (error) {
       console.error('Error fetching requests:', error);
     }
@@ -100,7 +100,7 @@ const HospitalDashboard = () => {
   const fetchInventory = async () => {
     try {
       const response = await inventoryAPI.getInventory();
-      setInventory(response.data);
+      setInventory(response.data.results);
     } catch (error) {
       console.error('Error fetching inventory:', error);
     }